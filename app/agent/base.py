@@ -29,7 +29,10 @@ class BaseAgent(BaseModel, ABC):
     )
 
     # Dependencies
-    llm: LLM = Field(default_factory=LLM, description="Language model instance")
+    llm: LLM = Field(
+        default_factory=lambda: LLM.for_role("executor"),
+        description="Language model instance",
+    )
     memory: Memory = Field(default_factory=Memory, description="Agent's memory store")
     state: AgentState = Field(
         default=AgentState.IDLE, description="Current agent state"
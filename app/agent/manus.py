@@ -9,6 +9,8 @@ from app.tool.browser_use_tool import BrowserUseTool
 from app.tool.file_saver import FileSaver
 from app.tool.google_search import GoogleSearch
 from app.tool.python_execute import PythonExecute
+from app.tool.web_fetch import WebFetch
+from app.tool.web_research import WebResearch
 
 
 class Manus(ToolCallAgent):
@@ -34,7 +36,13 @@ class Manus(ToolCallAgent):
     # Add general-purpose tools to the tool collection
     available_tools: ToolCollection = Field(
         default_factory=lambda: ToolCollection(
-            PythonExecute(), GoogleSearch(), BrowserUseTool(), FileSaver(), Terminate()
+            PythonExecute(),
+            GoogleSearch(),
+            WebFetch(),
+            WebResearch(),
+            BrowserUseTool(),
+            FileSaver(),
+            Terminate(),
         )
     )
 
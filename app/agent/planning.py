@@ -1,4 +1,3 @@
-import time
 from typing import Dict, List, Literal, Optional
 
 from pydantic import Field, model_validator
@@ -6,8 +5,9 @@ from pydantic import Field, model_validator
 from app.agent.toolcall import ToolCallAgent
 from app.logger import logger
 from app.prompt.planning import NEXT_STEP_PROMPT, PLANNING_SYSTEM_PROMPT
-from app.schema import Message, ToolCall
+from app.schema import Message, Plan, PlanStepStatus, ToolCall
 from app.tool import PlanningTool, Terminate, ToolCollection
+from app.tool.plan_store import new_plan_id
 
 
 class PlanningAgent(ToolCallAgent):
@@ -42,7 +42,7 @@ class PlanningAgent(ToolCallAgent):
     @model_validator(mode="after")
     def initialize_plan_and_verify_tools(self) -> "PlanningAgent":
         """Initialize the agent with a default plan ID and validate required tools."""
-        self.active_plan_id = f"plan_{int(time.time())}"
+        self.active_plan_id = new_plan_id()
 
         if "planning" not in self.available_tools.tool_map:
             self.available_tools.add_tool(PlanningTool())
@@ -51,6 +51,10 @@ class PlanningAgent(ToolCallAgent):
 
     async def think(self) -> bool:
         """Decide the next action based on plan status."""
+        # Get the current step index before thinking, so the plan shown to the
+        # model already has it in progress
+        self.current_step_index = await self._get_current_step_index()
+
         prompt = (
             f"CURRENT PLAN STATUS:\n{await self.get_plan()}\n\n{self.next_step_prompt}"
             if self.active_plan_id
@@ -58,9 +62,6 @@ class PlanningAgent(ToolCallAgent):
         )
         self.messages.append(Message.user_message(prompt))
 
-        # Get the current step index before thinking
-        self.current_step_index = await self._get_current_step_index()
-
         result = await super().think()
 
         # After thinking, if we decided to execute a tool and it's not a planning tool or special tool,
@@ -102,16 +103,29 @@ class PlanningAgent(ToolCallAgent):
 
         return result
 
+    @property
+    def planning_tool(self) -> PlanningTool:
+        return self.available_tools.get_tool("planning")
+
+    def _active_plan(self) -> Optional[Plan]:
+        """The structured state of the active plan, read without rendering it."""
+        if not self.active_plan_id:
+            return None
+        return self.planning_tool.get_plan(self.active_plan_id)
+
+    def _set_step_status(self, plan: Plan, step_index: int, status: str) -> None:
+        plan.set_status(step_index, status)
+        self.planning_tool.store.put(plan.plan_id, plan)
+
     async def get_plan(self) -> str:
         """Retrieve the current plan status."""
         if not self.active_plan_id:
             return "No active plan. Please create a plan first."
 
-        result = await self.available_tools.execute(
-            name="planning",
-            tool_input={"command": "get", "plan_id": self.active_plan_id},
-        )
-        return result.output if hasattr(result, "output") else str(result)
+        plan = self._active_plan()
+        if plan is None:
+            return f"Error: No plan found with ID: {self.active_plan_id}"
+        return plan.render()
 
     async def run(self, request: Optional[str] = None) -> str:
         """Run the agent with an optional initial request."""
@@ -137,66 +151,31 @@ class PlanningAgent(ToolCallAgent):
             return
 
         step_index = tracker["step_index"]
-
-        try:
-            # Mark the step as completed
-            await self.available_tools.execute(
-                name="planning",
-                tool_input={
-                    "command": "mark_step",
-                    "plan_id": self.active_plan_id,
-                    "step_index": step_index,
-                    "step_status": "completed",
-                },
+        plan = self._active_plan()
+        if plan is None or not 0 <= step_index < len(plan.steps):
+            logger.warning(
+                f"Failed to update plan status: no step {step_index} in plan {self.active_plan_id}"
             )
-            logger.info(
-                f"Marked step {step_index} as completed in plan {self.active_plan_id}"
-            )
-        except Exception as e:
-            logger.warning(f"Failed to update plan status: {e}")
+            return
+
+        self._set_step_status(plan, step_index, PlanStepStatus.COMPLETED.value)
+        logger.info(
+            f"Marked step {step_index} as completed in plan {self.active_plan_id}"
+        )
 
     async def _get_current_step_index(self) -> Optional[int]:
         """
-        Parse the current plan to identify the first non-completed step's index.
-        Returns None if no active step is found.
+        Index of the first not started or in progress step of the plan, which is
+        marked in progress. Returns None if no active step is found.
         """
-        if not self.active_plan_id:
+        plan = self._active_plan()
+        if plan is None:
             return None
 
-        plan = await self.get_plan()
-
-        try:
-            plan_lines = plan.splitlines()
-            steps_index = -1
-
-            # Find the index of the "Steps:" line
-            for i, line in enumerate(plan_lines):
-                if line.strip() == "Steps:":
-                    steps_index = i
-                    break
-
-            if steps_index == -1:
-                return None
-
-            # Find the first non-completed step
-            for i, line in enumerate(plan_lines[steps_index + 1 :], start=0):
-                if "[ ]" in line or "[→]" in line:  # not_started or in_progress
-                    # Mark current step as in_progress
-                    await self.available_tools.execute(
-                        name="planning",
-                        tool_input={
-                            "command": "mark_step",
-                            "plan_id": self.active_plan_id,
-                            "step_index": i,
-                            "step_status": "in_progress",
-                        },
-                    )
-                    return i
-
-            return None  # No active step found
-        except Exception as e:
-            logger.warning(f"Error finding current step index: {e}")
-            return None
+        step_index = plan.next_active_step()
+        if step_index is not None:
+            self._set_step_status(plan, step_index, PlanStepStatus.IN_PROGRESS.value)
+        return step_index
 
     async def create_initial_plan(self, request: str) -> None:
         """Create an initial plan based on the request."""
@@ -19,7 +19,7 @@ class ReActAgent(BaseAgent, ABC):
     system_prompt: Optional[str] = None
     next_step_prompt: Optional[str] = None
 
-    llm: Optional[LLM] = Field(default_factory=LLM)
+    llm: Optional[LLM] = Field(default_factory=lambda: LLM.for_role("executor"))
     memory: Memory = Field(default_factory=Memory)
     state: AgentState = AgentState.IDLE
 
@@ -4,7 +4,14 @@ from pydantic import Field
 
 from app.agent.toolcall import ToolCallAgent
 from app.prompt.swe import NEXT_STEP_TEMPLATE, SYSTEM_PROMPT
-from app.tool import Bash, StrReplaceEditor, Terminate, ToolCollection
+from app.tool import (
+    Bash,
+    CodeSearch,
+    PythonSymbols,
+    StrReplaceEditor,
+    Terminate,
+    ToolCollection,
+)
 
 
 class SWEAgent(ToolCallAgent):
@@ -16,8 +23,14 @@ class SWEAgent(ToolCallAgent):
     system_prompt: str = SYSTEM_PROMPT
     next_step_prompt: str = NEXT_STEP_TEMPLATE
 
-    available_tools: ToolCollection = ToolCollection(
-        Bash(), StrReplaceEditor(), Terminate()
+    available_tools: ToolCollection = Field(
+        default_factory=lambda: ToolCollection(
+            Bash(),
+            StrReplaceEditor(),
+            CodeSearch(),
+            PythonSymbols(),
+            Terminate(),
+        )
     )
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
 
@@ -29,6 +29,8 @@ class ToolCallAgent(ReActAgent):
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
+    # Images returned by the tools of the current step, sent after their results
+    _pending_images: List[str] = []
 
     max_steps: int = 30
 
@@ -142,6 +144,16 @@ class ToolCallAgent(ReActAgent):
             self.memory.add_message(tool_msg)
             results.append(result)
 
+        # Tool messages cannot carry images, so they follow as a user message
+        # once every tool call of the step has been answered.
+        images, self._pending_images = self._pending_images, []
+        for image in images:
+            self.memory.add_message(
+                Message.user_message(
+                    "Image returned by the previous tool call:", base64_image=image
+                )
+            )
+
         return "\n\n".join(results)
 
     async def execute_tool(self, command: ToolCall) -> str:
@@ -160,6 +172,8 @@ class ToolCallAgent(ReActAgent):
             # Execute the tool
             logger.info(f"🔧 Activating tool: '{name}'...")
             result = await self.available_tools.execute(name=name, tool_input=args)
+            if getattr(result, "base64_image", None):
+                self._pending_images.append(result.base64_image)
 
             # Format result for display
             observation = (
@@ -21,8 +21,32 @@ class LLMSettings(BaseModel):
     api_key: str = Field(..., description="API key")
     max_tokens: int = Field(4096, description="Maximum number of tokens per request")
     temperature: float = Field(1.0, description="Sampling temperature")
-    api_type: str = Field(..., description="AzureOpenai or Openai")
+    api_type: str = Field(..., description="azure, openai or anthropic")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    hedge_percentile: Optional[float] = Field(
+        None,
+        description="Send a duplicate of requests slower than this percentile of "
+        "recent latencies (e.g. 95); no hedging if unset",
+    )
+    hedge_max_rate: float = Field(
+        0.05, description="Maximum fraction of requests that may be hedged"
+    )
+    hedge_llm: Optional[str] = Field(
+        None, description="[llm.*] config receiving the duplicates (default: same)"
+    )
+
+
+class LLMRoleSettings(BaseModel):
+    llm: List[str] = Field(
+        default_factory=lambda: ["default"],
+        description="[llm.*] configs to use, in order of preference",
+    )
+    max_tokens: Optional[int] = Field(
+        None, description="Overrides the max_tokens of the LLM config"
+    )
+    temperature: Optional[float] = Field(
+        None, description="Overrides the temperature of the LLM config"
+    )
 
 
 class ProxySettings(BaseModel):
@@ -31,6 +55,34 @@ class ProxySettings(BaseModel):
     password: Optional[str] = Field(None, description="Proxy password")
 
 
+class ResourcePolicySettings(BaseModel):
+    block_resource_types: List[str] = Field(
+        default_factory=lambda: ["image", "media", "font"],
+        description="Playwright resource types to block (e.g. image, media, font)",
+    )
+    allow_resource_types: List[str] = Field(
+        default_factory=list,
+        description="If set, only these resource types (and documents) are loaded",
+    )
+    block_domains: List[str] = Field(
+        default_factory=lambda: [
+            "doubleclick.net",
+            "googlesyndication.com",
+            "google-analytics.com",
+            "googletagmanager.com",
+            "facebook.net",
+            "hotjar.com",
+            "segment.io",
+            "scorecardresearch.com",
+        ],
+        description="Domains (and their subdomains) whose requests are always blocked",
+    )
+    allow_domains: List[str] = Field(
+        default_factory=list,
+        description="Domains (and their subdomains) exempt from resource type blocking",
+    )
+
+
 class BrowserSettings(BaseModel):
     headless: bool = Field(False, description="Whether to run browser in headless mode")
     disable_security: bool = Field(
@@ -51,13 +103,111 @@ class BrowserSettings(BaseModel):
     proxy: Optional[ProxySettings] = Field(
         None, description="Proxy settings for the browser"
     )
+    max_browsers: int = Field(
+        1, description="Maximum number of browser processes shared by all sessions"
+    )
+    max_contexts_per_browser: int = Field(
+        10,
+        description="Contexts leased from one browser before launching another "
+        "(once max_browsers run, the least loaded one takes more)",
+    )
+    context_idle_timeout: int = Field(
+        600, description="Seconds after which an unused browser context is closed"
+    )
+    resource_policy: Optional[ResourcePolicySettings] = Field(
+        None, description="Block heavy resources through request interception"
+    )
+    screenshot_max_width: int = Field(
+        1280, description="Screenshots wider than this are downscaled"
+    )
+    screenshot_max_height: int = Field(
+        4096, description="Screenshots are cut off below this height (after scaling)"
+    )
+    screenshot_quality: int = Field(
+        70, description="JPEG quality used to recompress screenshots"
+    )
+    screenshot_keep: int = Field(
+        20, description="Screenshots kept in a session's artifact directory"
+    )
+    screenshot_inline_budget_kb: int = Field(
+        0,
+        description="Base64 KB of screenshots a session may send to a multimodal "
+        "model; 0 only stores them on disk",
+    )
+
+
+class PythonSettings(BaseModel):
+    stateful: bool = Field(
+        False, description="Keep one long-lived namespace per session in a worker"
+    )
+    memory_limit_mb: int = Field(
+        1024, description="Address space limit for the stateful worker in MB"
+    )
+    max_output_chars: int = Field(
+        16000, description="Maximum number of output characters returned per call"
+    )
+
+
+class SearchSettings(BaseModel):
+    backend: str = Field(
+        "google", description="Search backend: 'google' or 'local' (offline)"
+    )
+    documents_dir: Optional[str] = Field(
+        None, description="Directory of documents indexed by the local backend"
+    )
+    cache_ttl: int = Field(600, description="Seconds a search result stays cached")
+    cache_size: int = Field(512, description="Maximum number of cached searches")
+    max_workers: int = Field(
+        4, description="Size of the thread pool running blocking searches"
+    )
+
+
+class PlanningSettings(BaseModel):
+    backend: str = Field(
+        "memory", description="Plan store: 'memory' or 'sqlite' (persistent)"
+    )
+    sqlite_path: str = Field(
+        str(WORKSPACE_ROOT / "plans.sqlite3"),
+        description="Database file of the sqlite plan store",
+    )
+    max_plans: int = Field(50, description="Maximum number of plans per session")
+    retention_seconds: int = Field(
+        86400, description="Seconds a plan is kept after its last update"
+    )
+    max_concurrent_steps: int = Field(
+        3, description="Maximum number of independent plan steps run at once"
+    )
+
+
+class RouterSettings(BaseModel):
+    enabled: bool = Field(
+        True, description="Answer simple requests directly instead of planning"
+    )
+    max_classified_chars: int = Field(
+        1000, description="Longer requests are always planned, without classifying"
+    )
 
 
 class AppConfig(BaseModel):
     llm: Dict[str, LLMSettings]
+    llm_roles: Dict[str, LLMRoleSettings] = Field(
+        default_factory=dict, description="LLM configs of the call site roles"
+    )
     browser_config: Optional[BrowserSettings] = Field(
         None, description="Browser configuration"
     )
+    python_config: PythonSettings = Field(
+        default_factory=PythonSettings, description="Python execution configuration"
+    )
+    search_config: SearchSettings = Field(
+        default_factory=SearchSettings, description="Web search configuration"
+    )
+    planning_config: PlanningSettings = Field(
+        default_factory=PlanningSettings, description="Plan storage configuration"
+    )
+    router_config: RouterSettings = Field(
+        default_factory=RouterSettings, description="Request routing configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -114,8 +264,25 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "hedge_percentile": base_llm.get("hedge_percentile"),
+            "hedge_max_rate": base_llm.get("hedge_max_rate", 0.05),
+            "hedge_llm": base_llm.get("hedge_llm"),
         }
 
+        # handle call site roles, e.g. [llm_roles.planner] llm = ["fast", "default"].
+        llm_roles = {}
+        for role, role_config in raw_config.get("llm_roles", {}).items():
+            role_config = dict(role_config)
+            if isinstance(role_config.get("llm"), str):
+                role_config["llm"] = [role_config["llm"]]
+            llm_roles[role] = LLMRoleSettings(
+                **{
+                    k: v
+                    for k, v in role_config.items()
+                    if k in LLMRoleSettings.__annotations__ and v is not None
+                }
+            )
+
         # handle browser config.
         browser_config = raw_config.get("browser", {})
         browser_settings = None
@@ -149,6 +316,46 @@ class Config:
             if valid_browser_params:
                 browser_settings = BrowserSettings(**valid_browser_params)
 
+        # handle python execution config.
+        python_config = raw_config.get("python", {})
+        python_settings = PythonSettings(
+            **{
+                k: v
+                for k, v in python_config.items()
+                if k in PythonSettings.__annotations__ and v is not None
+            }
+        )
+
+        # handle web search config.
+        search_config = raw_config.get("search", {})
+        search_settings = SearchSettings(
+            **{
+                k: v
+                for k, v in search_config.items()
+                if k in SearchSettings.__annotations__ and v is not None
+            }
+        )
+
+        # handle plan storage config.
+        planning_config = raw_config.get("planning", {})
+        planning_settings = PlanningSettings(
+            **{
+                k: v
+                for k, v in planning_config.items()
+                if k in PlanningSettings.__annotations__ and v is not None
+            }
+        )
+
+        # handle request routing config.
+        router_config = raw_config.get("router", {})
+        router_settings = RouterSettings(
+            **{
+                k: v
+                for k, v in router_config.items()
+                if k in RouterSettings.__annotations__ and v is not None
+            }
+        )
+
         config_dict = {
             "llm": {
                 "default": default_settings,
@@ -157,7 +364,12 @@ class Config:
                     for name, override_config in llm_overrides.items()
                 },
             },
+            "llm_roles": llm_roles,
             "browser_config": browser_settings,
+            "python_config": python_settings,
+            "search_config": search_settings,
+            "planning_config": planning_settings,
+            "router_config": router_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -166,9 +378,29 @@ class Config:
     def llm(self) -> Dict[str, LLMSettings]:
         return self._config.llm
 
+    @property
+    def llm_roles(self) -> Dict[str, LLMRoleSettings]:
+        return self._config.llm_roles
+
     @property
     def browser_config(self) -> Optional[BrowserSettings]:
         return self._config.browser_config
 
+    @property
+    def python_config(self) -> PythonSettings:
+        return self._config.python_config
+
+    @property
+    def search_config(self) -> SearchSettings:
+        return self._config.search_config
+
+    @property
+    def planning_config(self) -> PlanningSettings:
+        return self._config.planning_config
+
+    @property
+    def router_config(self) -> RouterSettings:
+        return self._config.router_config
+
 
 config = Config()
\ No newline at end of file
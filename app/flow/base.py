@@ -5,10 +5,12 @@ from typing import Dict, List, Optional, Union
 from pydantic import BaseModel
 
 from app.agent.base import BaseAgent
+from app.schema import PlanStepStatus  # noqa: F401 (re-exported)
 
 
 class FlowType(str, Enum):
     PLANNING = "planning"
+    ROUTER = "router"
 
 
 class BaseFlow(BaseModel, ABC):
@@ -60,48 +62,3 @@ class BaseFlow(BaseModel, ABC):
     @abstractmethod
     async def execute(self, input_text: str) -> str:
         """Execute the flow with given input"""
-
-
-class PlanStepStatus(str, Enum):
-    """Enum class defining possible statuses of a plan step"""
-
-    NOT_STARTED = "not_started"
-    IN_PROGRESS = "in_progress"
-    COMPLETED = "completed"
-    BLOCKED = "blocked"
-    PARTIAL_SUCCESS = "partial_success"  # New status
-    FAILED = "failed"  # New status
-    SKIPPED = "skipped"  # New status
-
-    @classmethod
-    def get_all_statuses(cls) -> list[str]:
-        """Return a list of all possible step status values"""
-        return [status.value for status in cls]
-
-    @classmethod
-    def get_active_statuses(cls) -> list[str]:
-        """Return a list of values representing active statuses (not started or in progress)"""
-        return [cls.NOT_STARTED.value, cls.IN_PROGRESS.value]
-    
-    @classmethod
-    def get_completed_statuses(cls) -> list[str]:
-        """Return a list of statuses considered as completed (for progress calculation)"""
-        return [cls.COMPLETED.value, cls.PARTIAL_SUCCESS.value, cls.SKIPPED.value]
-    
-    @classmethod
-    def get_terminal_statuses(cls) -> list[str]:
-        """Return a list of terminal statuses (no further action needed)"""
-        return [cls.COMPLETED.value, cls.PARTIAL_SUCCESS.value, cls.SKIPPED.value, cls.FAILED.value]
-
-    @classmethod
-    def get_status_marks(cls) -> Dict[str, str]:
-        """Return a mapping of statuses to their marker symbols"""
-        return {
-            cls.COMPLETED.value: "[✓]",
-            cls.IN_PROGRESS.value: "[→]",
-            cls.BLOCKED.value: "[!]",
-            cls.NOT_STARTED.value: "[ ]",
-            cls.PARTIAL_SUCCESS.value: "[~]",  # Tilde for partial success
-            cls.FAILED.value: "[✗]",  # X for failed
-            cls.SKIPPED.value: "[↷]",  # Arrow for skipped
-        }
@@ -3,6 +3,7 @@ from typing import Dict, List, Union
 from app.agent.base import BaseAgent
 from app.flow.base import BaseFlow, FlowType
 from app.flow.planning import PlanningFlow
+from app.flow.router import RouterFlow
 
 
 class FlowFactory:
@@ -16,6 +17,7 @@ class FlowFactory:
     ) -> BaseFlow:
         flows = {
             FlowType.PLANNING: PlanningFlow,
+            FlowType.ROUTER: RouterFlow,
         }
 
         flow_class = flows.get(flow_type)
@@ -1,25 +1,39 @@
+import asyncio
+import copy
 import json
-import time
-from typing import Dict, List, Optional, Union
+import re
+from typing import Dict, List, Optional, Set, Tuple, Union
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 
 from app.agent.base import BaseAgent
+from app.config import config
 from app.flow.base import BaseFlow, PlanStepStatus
 from app.llm import LLM
 from app.logger import logger
-from app.schema import AgentState, Message
-from app.tool import PlanningTool
+from app.schema import AgentState, Memory, Message
+from app.tool import PlanningTool, ToolCollection
+from app.tool.base import BaseTool
+from app.tool.plan_store import new_plan_id
 
 
 class PlanningFlow(BaseFlow):
     """A flow that manages planning and execution of tasks using agents."""
 
-    llm: LLM = Field(default_factory=lambda: LLM())
+    llm: LLM = Field(default_factory=lambda: LLM.for_role("planner"))
+    summary_llm: LLM = Field(default_factory=lambda: LLM.for_role("summarizer"))
     planning_tool: PlanningTool = Field(default_factory=PlanningTool)
     executor_keys: List[str] = Field(default_factory=list)
-    active_plan_id: str = Field(default_factory=lambda: f"plan_{int(time.time())}")
-    current_step_index: Optional[int] = None
+    active_plan_id: str = Field(default_factory=new_plan_id)
+    max_concurrent_steps: int = Field(
+        default_factory=lambda: config.planning_config.max_concurrent_steps
+    )
+
+    # Guards read-modify-write cycles on the plan across concurrent steps
+    _plan_lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+    # Extra instances of executor agents, keyed by id() of the original
+    _executor_clones: Dict[int, List[BaseAgent]] = PrivateAttr(default_factory=dict)
+    _busy_executors: Set[int] = PrivateAttr(default_factory=set)
 
     def __init__(
         self, agents: Union[BaseAgent, List[BaseAgent], Dict[str, BaseAgent]], **data
@@ -61,6 +75,64 @@ class PlanningFlow(BaseFlow):
         # Fallback to primary agent
         return self.primary_agent
 
+    def _acquire_executor(self, step_type: Optional[str]) -> Optional[BaseAgent]:
+        """
+        An idle instance of the executor for this step type. Concurrent steps
+        need separate agents (each has its own memory and state), so the
+        executor is cloned when all instances are busy. Returns None if that
+        is not possible; the step then waits for an idle one.
+        """
+        executor = self.get_executor(step_type)
+        clones = self._executor_clones.setdefault(id(executor), [])
+        for agent in [executor, *clones]:
+            if id(agent) not in self._busy_executors:
+                self._busy_executors.add(id(agent))
+                return agent
+        try:
+            clone = self._clone_executor(executor)
+        except Exception as e:
+            logger.warning(f"Cannot create another {type(executor).__name__}: {e}")
+            return None
+        clones.append(clone)
+        self._busy_executors.add(id(clone))
+        return clone
+
+    @staticmethod
+    def _clone_executor(executor: BaseAgent) -> BaseAgent:
+        """
+        A copy of a configured executor with the same LLM, prompts and limits,
+        its own copies of the tools and empty memory.
+        """
+        # Shared or replaced instead of deep-copied
+        memo = {id(executor.memory): Memory()}
+        if getattr(executor, "llm", None) is not None:
+            memo[id(executor.llm)] = executor.llm
+        for name in type(executor).model_fields:
+            value = getattr(executor, name)
+            if isinstance(value, ToolCollection):
+                memo[id(value)] = ToolCollection(*(tool.clone() for tool in value))
+            elif isinstance(value, BaseTool):
+                memo[id(value)] = value.clone()
+
+        clone = copy.deepcopy(executor, memo)
+        clone.state = AgentState.IDLE
+        clone.current_step = 0
+        return clone
+
+    def _release_executor(self, agent: BaseAgent) -> None:
+        self._busy_executors.discard(id(agent))
+
+    async def _cleanup_executor_clones(self) -> None:
+        for clones in self._executor_clones.values():
+            for clone in clones:
+                tools = getattr(clone, "available_tools", None)
+                if tools is not None:
+                    try:
+                        await tools.cleanup()
+                    except Exception as e:
+                        logger.warning(f"Error cleaning up executor tools: {e}")
+        self._executor_clones.clear()
+
     async def execute(self, input_text: str) -> str:
         """Execute the planning flow with agents."""
         try:
@@ -72,37 +144,68 @@ class PlanningFlow(BaseFlow):
                 await self._create_initial_plan(input_text)
 
                 # Verify plan was created successfully
-                if self.active_plan_id not in self.planning_tool.plans:
+                if self.active_plan_id not in self.planning_tool.store:
                     logger.error(
                         f"Plan creation failed. Plan ID {self.active_plan_id} not found in planning tool."
                     )
                     return f"Failed to create plan for: {input_text}"
 
-            result = ""
-            while True:
-                # Get current step to execute
-                self.current_step_index, step_info = await self._get_current_step_info()
-
-                # Exit if no more steps or plan completed
-                if self.current_step_index is None:
-                    result += await self._finalize_plan()
-                    break
-
-                # Execute current step with appropriate agent
-                step_type = step_info.get("type") if step_info else None
-                executor = self.get_executor(step_type)
-                step_result = await self._execute_step(executor, step_info)
-                result += step_result + "\n"
-
-                # Check if agent wants to terminate
-                if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
-                    break
-
+            results: Dict[int, str] = {}
+            running: Dict[asyncio.Task, Tuple[int, BaseAgent]] = {}
+            finished = False
+            try:
+                while True:
+                    if not finished:
+                        await self._start_ready_steps(running)
+                    if not running:
+                        break
+
+                    done, _ = await asyncio.wait(
+                        running, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        step_index, executor = running.pop(task)
+                        self._release_executor(executor)
+                        results[step_index] = task.result()
+                        # Check if agent wants to terminate
+                        if getattr(executor, "state", None) == AgentState.FINISHED:
+                            finished = True
+            finally:
+                for task in running:
+                    task.cancel()
+                await self._cleanup_executor_clones()
+
+            # Merge step results in plan (and so dependency) order
+            result = "".join(results[i] + "\n" for i in sorted(results))
+            if not finished:
+                result += await self._finalize_plan()
             return result
         except Exception as e:
             logger.error(f"Error in PlanningFlow: {str(e)}")
             return f"Execution failed: {str(e)}"
 
+    async def _start_ready_steps(
+        self, running: Dict[asyncio.Task, Tuple[int, BaseAgent]]
+    ) -> None:
+        """Start every ready step that is not running yet, up to the concurrency cap."""
+        running_steps = {step_index for step_index, _ in running.values()}
+        for step_index, step_info in await self._get_ready_steps_info(running_steps):
+            if len(running) >= max(1, self.max_concurrent_steps):
+                break
+            executor = self._acquire_executor(step_info.get("type"))
+            if executor is None:
+                break
+
+            # If step is blocked, run it again without changing status
+            if step_info["status"] != PlanStepStatus.BLOCKED.value:
+                await self._mark_step_status(
+                    step_index, PlanStepStatus.IN_PROGRESS.value
+                )
+            task = asyncio.create_task(
+                self._execute_step(executor, step_info, step_index)
+            )
+            running[task] = (step_index, executor)
+
     async def _create_initial_plan(self, request: str) -> None:
         """Create an initial plan based on the request using the flow's LLM and PlanningTool."""
         logger.info(f"Creating initial plan with ID: {self.active_plan_id}")
@@ -111,7 +214,9 @@ class PlanningFlow(BaseFlow):
         system_message = Message.system_message(
             "You are a planning assistant. Create a concise, actionable plan with clear steps. "
             "Focus on key milestones rather than detailed sub-steps. "
-            "Optimize for clarity and efficiency."
+            "Optimize for clarity and efficiency. "
+            "When some steps do not depend on each other, give each step's "
+            "prerequisites in step_dependencies so independent steps can run in parallel."
         )
 
         # Create a user message with the request
@@ -162,84 +267,38 @@ class PlanningFlow(BaseFlow):
             }
         )
 
-    async def _get_current_step_info(self) -> tuple[Optional[int], Optional[dict]]:
+    async def _get_ready_steps_info(
+        self, exclude: Optional[Set[int]] = None
+    ) -> List[Tuple[int, dict]]:
         """
-        Parse the current plan to identify the first non-completed step's index and info.
-        Returns (None, None) if no active step is found.
+        The unfinished steps whose dependencies have all finished, with their
+        text, status and type (e.g. [SEARCH] or [CODE] in the text).
         """
-        if (
-            not self.active_plan_id
-            or self.active_plan_id not in self.planning_tool.plans
-        ):
+        async with self._plan_lock:
+            plan = self.planning_tool.store.get(self.active_plan_id)
+        if plan is None:
             logger.error(f"Plan with ID {self.active_plan_id} not found")
-            return None, None
-
-        try:
-            # Direct access to plan data from planning tool storage
-            plan_data = self.planning_tool.plans[self.active_plan_id]
-            steps = plan_data.get("steps", [])
-            step_statuses = plan_data.get("step_statuses", [])
-
-            # Find first non-terminal step (not completed, partial_success, skipped, or failed)
-            for i, step in enumerate(steps):
-                if i >= len(step_statuses):
-                    status = PlanStepStatus.NOT_STARTED.value
-                else:
-                    status = step_statuses[i]
-
-                # Skip steps that are in terminal states
-                if status in PlanStepStatus.get_terminal_statuses():
-                    continue
-                
-                # Found an active or blocked step
-                if status in PlanStepStatus.get_active_statuses() or status == PlanStepStatus.BLOCKED.value:
-                    # Extract step type/category if available
-                    step_info = {"text": step, "status": status}
-
-                    # Try to extract step type from the text (e.g., [SEARCH] or [CODE])
-                    import re
-
-                    type_match = re.search(r"\[([A-Z_]+)\]", step)
-                    if type_match:
-                        step_info["type"] = type_match.group(1).lower()
-
-                    # If step is blocked, return it without changing status
-                    if status == PlanStepStatus.BLOCKED.value:
-                        return i, step_info
-                        
-                    # Mark current step as in_progress
-                    try:
-                        await self.planning_tool.execute(
-                            command="mark_step",
-                            plan_id=self.active_plan_id,
-                            step_index=i,
-                            step_status=PlanStepStatus.IN_PROGRESS.value,
-                        )
-                    except Exception as e:
-                        logger.warning(f"Error marking step as in_progress: {e}")
-                        # Update step status directly if needed
-                        if i < len(step_statuses):
-                            step_statuses[i] = PlanStepStatus.IN_PROGRESS.value
-                        else:
-                            while len(step_statuses) < i:
-                                step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-                            step_statuses.append(PlanStepStatus.IN_PROGRESS.value)
-
-                        plan_data["step_statuses"] = step_statuses
-
-                    return i, step_info
-
-            return None, None  # No active step found
-
-        except Exception as e:
-            logger.warning(f"Error finding current step index: {e}")
-            return None, None
-
-    async def _execute_step(self, executor: BaseAgent, step_info: dict) -> str:
-        """Execute the current step with the specified agent using agent.run()."""
+            return []
+
+        ready = []
+        for i in plan.ready_steps():
+            if exclude and i in exclude:
+                continue
+            step = plan.steps[i]
+            step_info = {"text": step, "status": plan.step_statuses[i]}
+            type_match = re.search(r"\[([A-Z_]+)\]", step)
+            if type_match:
+                step_info["type"] = type_match.group(1).lower()
+            ready.append((i, step_info))
+        return ready
+
+    async def _execute_step(
+        self, executor: BaseAgent, step_info: dict, step_index: int
+    ) -> str:
+        """Execute a step with the specified agent using agent.run()."""
         # Prepare context for the agent with current plan status
         plan_status = await self._get_plan_text()
-        step_text = step_info.get("text", f"Step {self.current_step_index}")
+        step_text = step_info.get("text", f"Step {step_index}")
         step_status = step_info.get("status", PlanStepStatus.IN_PROGRESS.value)
 
         # Create a prompt for the agent to execute the current step
@@ -248,7 +307,7 @@ class PlanningFlow(BaseFlow):
         {plan_status}
 
         YOUR CURRENT TASK:
-        You are now working on step {self.current_step_index}: "{step_text}"
+        You are now working on step {step_index}: "{step_text}"
 
         Please execute this step using the appropriate tools. When you're done, provide a summary of what you accomplished.
         
@@ -266,7 +325,6 @@ class PlanningFlow(BaseFlow):
             step_result = await executor.run(step_prompt)
             
             # Determine step status from result
-            import re
             status_match = re.search(r"\[STATUS:\s*(\w+)\]", step_result)
             
             if status_match:
@@ -287,60 +345,52 @@ class PlanningFlow(BaseFlow):
                 step_result = re.sub(r"\[STATUS:\s*\w+\]", "", step_result).strip()
                 
                 # Mark the step with the appropriate status
-                await self._mark_step_status(final_status, f"Agent reported: {reported_status}")
+                await self._mark_step_status(
+                    step_index, final_status, f"Agent reported: {reported_status}"
+                )
             else:
                 # Default to completed if no status reported
-                await self._mark_step_completed()
+                await self._mark_step_completed(step_index)
 
             return step_result
         except Exception as e:
-            logger.error(f"Error executing step {self.current_step_index}: {e}")
+            logger.error(f"Error executing step {step_index}: {e}")
             # Mark the step as failed
-            await self._mark_step_status(PlanStepStatus.FAILED.value, f"Error: {str(e)}")
-            return f"Error executing step {self.current_step_index}: {str(e)}"
-
-    async def _mark_step_status(self, status: str, notes: Optional[str] = None) -> None:
-        """Mark the current step with a specific status and optional notes."""
-        if self.current_step_index is None:
-            return
-
-        try:
-            # Mark the step with the specified status
-            await self.planning_tool.execute(
-                command="mark_step",
-                plan_id=self.active_plan_id,
-                step_index=self.current_step_index,
-                step_status=status,
-                step_notes=notes,
+            await self._mark_step_status(
+                step_index, PlanStepStatus.FAILED.value, f"Error: {str(e)}"
             )
-            logger.info(
-                f"Marked step {self.current_step_index} as {status} in plan {self.active_plan_id}"
-            )
-        except Exception as e:
-            logger.warning(f"Failed to update plan status: {e}")
-            # Update step status directly in planning tool storage
-            if self.active_plan_id in self.planning_tool.plans:
-                plan_data = self.planning_tool.plans[self.active_plan_id]
-                step_statuses = plan_data.get("step_statuses", [])
-                step_notes_list = plan_data.get("step_notes", [])
-
-                # Ensure the lists are long enough
-                while len(step_statuses) <= self.current_step_index:
-                    step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-                while len(step_notes_list) <= self.current_step_index:
-                    step_notes_list.append("")
-
-                # Update the status and notes
-                step_statuses[self.current_step_index] = status
-                if notes:
-                    step_notes_list[self.current_step_index] = notes
-                
-                plan_data["step_statuses"] = step_statuses
-                plan_data["step_notes"] = step_notes_list
+            return f"Error executing step {step_index}: {str(e)}"
 
-    async def _mark_step_completed(self) -> None:
-        """Mark the current step as completed."""
-        await self._mark_step_status(PlanStepStatus.COMPLETED.value)
+    async def _mark_step_status(
+        self, step_index: int, status: str, notes: Optional[str] = None
+    ) -> None:
+        """Mark a step with a specific status and optional notes."""
+        async with self._plan_lock:
+            try:
+                # Mark the step with the specified status
+                await self.planning_tool.execute(
+                    command="mark_step",
+                    plan_id=self.active_plan_id,
+                    step_index=step_index,
+                    step_status=status,
+                    step_notes=notes,
+                )
+                logger.info(
+                    f"Marked step {step_index} as {status} in plan {self.active_plan_id}"
+                )
+            except Exception as e:
+                logger.warning(f"Failed to update plan status: {e}")
+                # Update step status directly in planning tool storage
+                plan = self.planning_tool.store.get(self.active_plan_id)
+                if plan is not None and step_index < len(plan.steps):
+                    plan.set_status(step_index, status)
+                    if notes:
+                        plan.set_notes(step_index, notes)
+                    self.planning_tool.store.put(self.active_plan_id, plan)
+
+    async def _mark_step_completed(self, step_index: int) -> None:
+        """Mark a step as completed."""
+        await self._mark_step_status(step_index, PlanStepStatus.COMPLETED.value)
 
     async def _get_plan_text(self) -> str:
         """Get the current plan as formatted text."""
@@ -355,74 +405,16 @@ class PlanningFlow(BaseFlow):
 
     def _generate_plan_text_from_storage(self) -> str:
         """Generate plan text directly from storage if the planning tool fails."""
-        try:
-            if self.active_plan_id not in self.planning_tool.plans:
-                return f"Error: Plan with ID {self.active_plan_id} not found"
-
-            plan_data = self.planning_tool.plans[self.active_plan_id]
-            title = plan_data.get("title", "Untitled Plan")
-            steps = plan_data.get("steps", [])
-            step_statuses = plan_data.get("step_statuses", [])
-            step_notes = plan_data.get("step_notes", [])
-
-            # Ensure step_statuses and step_notes match the number of steps
-            while len(step_statuses) < len(steps):
-                step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-            while len(step_notes) < len(steps):
-                step_notes.append("")
-
-            # Count steps by status
-            status_counts = {status: 0 for status in PlanStepStatus.get_all_statuses()}
-
-            for status in step_statuses:
-                if status in status_counts:
-                    status_counts[status] += 1
-
-            # Calculate effective completions (completed + partial_success + skipped)
-            completed = status_counts[PlanStepStatus.COMPLETED.value]
-            partial_success = status_counts[PlanStepStatus.PARTIAL_SUCCESS.value]
-            skipped = status_counts[PlanStepStatus.SKIPPED.value]
-            failed = status_counts[PlanStepStatus.FAILED.value]
-            effective_completed = completed + partial_success + skipped
-            
-            total = len(steps)
-            progress = (effective_completed / total) * 100 if total > 0 else 0
-
-            plan_text = f"Plan: {title} (ID: {self.active_plan_id})\n"
-            plan_text += "=" * len(plan_text) + "\n\n"
-
-            plan_text += (
-                f"Progress: {effective_completed}/{total} steps effectively completed ({progress:.1f}%)\n"
-            )
-            plan_text += f"Status: {completed} completed, {partial_success} partial, {skipped} skipped, "
-            plan_text += f"{failed} failed, {status_counts[PlanStepStatus.IN_PROGRESS.value]} in progress, "
-            plan_text += f"{status_counts[PlanStepStatus.BLOCKED.value]} blocked, {status_counts[PlanStepStatus.NOT_STARTED.value]} not started\n\n"
-            plan_text += "Steps:\n"
-
-            status_marks = PlanStepStatus.get_status_marks()
-
-            for i, (step, status, notes) in enumerate(
-                zip(steps, step_statuses, step_notes)
-            ):
-                # Use status marks to indicate step status
-                status_mark = status_marks.get(
-                    status, status_marks[PlanStepStatus.NOT_STARTED.value]
-                )
-
-                plan_text += f"{i}. {status_mark} {step}\n"
-                if notes:
-                    plan_text += f"   Notes: {notes}\n"
-
-            return plan_text
-        except Exception as e:
-            logger.error(f"Error generating plan text from storage: {e}")
-            return f"Error: Unable to retrieve plan with ID {self.active_plan_id}"
+        plan = self.planning_tool.store.get(self.active_plan_id)
+        if plan is None:
+            return f"Error: Plan with ID {self.active_plan_id} not found"
+        return plan.render()
 
     async def _finalize_plan(self) -> str:
         """Finalize the plan and provide a summary using the flow's LLM directly."""
         plan_text = await self._get_plan_text()
 
-        # Create a summary using the flow's LLM directly
+        # Create a summary using the flow's summarizer LLM directly
         try:
             system_message = Message.system_message(
                 "You are a planning assistant. Your task is to summarize the completed plan."
@@ -432,7 +424,7 @@ class PlanningFlow(BaseFlow):
                 f"The plan has been completed. Here is the final plan status:\n\n{plan_text}\n\nPlease provide a summary of what was accomplished and any final thoughts."
             )
 
-            response = await self.llm.ask(
+            response = await self.summary_llm.ask(
                 messages=[user_message], system_msgs=[system_message]
             )
 
@@ -0,0 +1,113 @@
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from pydantic import Field, PrivateAttr
+
+from app.agent.base import BaseAgent
+from app.config import config
+from app.flow.base import BaseFlow
+from app.flow.planning import PlanningFlow
+from app.llm import LLM
+from app.logger import logger
+from app.schema import Message
+
+
+ROUTE_DIRECT = "direct"
+ROUTE_PLANNING = "planning"
+
+# The classifier's whole reply when a request needs the planning flow
+PLAN_MARKER = "[PLAN]"
+
+ROUTER_PROMPT = f"""You are the front desk of an assistant that can browse the web, run code and work with files.
+If the user's message is conversational or can be fully answered from your own knowledge in a single reply (greetings, thanks, questions about you, short factual or explanatory questions), answer it directly and concisely.
+If it needs tools, current information, files, code execution or several steps of work, reply with exactly {PLAN_MARKER} and nothing else."""
+
+
+class RouterFlow(BaseFlow):
+    """
+    A flow that answers trivial or conversational requests with a single LLM
+    call and hands everything else to a PlanningFlow.
+
+    The classifier call doubles as the direct answer, so the fast path costs
+    one round trip instead of plan creation, one agent run per step and a
+    summary. Requests longer than `max_classified_chars` skip the classifier.
+    """
+
+    llm: LLM = Field(default_factory=lambda: LLM.for_role("classifier"))
+    planning_flow: PlanningFlow
+    max_classified_chars: int = Field(
+        default_factory=lambda: config.router_config.max_classified_chars
+    )
+    last_route: Optional[str] = None
+
+    # route -> (number of requests, total seconds)
+    _latencies: Dict[str, Tuple[int, float]] = PrivateAttr(default_factory=dict)
+    _seconds_saved: float = PrivateAttr(default=0.0)
+
+    def __init__(
+        self, agents: Union[BaseAgent, List[BaseAgent], Dict[str, BaseAgent]], **data
+    ):
+        # Arguments that are not the router's own configure the planning flow
+        if "planning_flow" not in data:
+            own = set(RouterFlow.model_fields) - set(BaseFlow.model_fields)
+            planning_args = {k: v for k, v in data.items() if k not in own}
+            data = {k: v for k, v in data.items() if k in RouterFlow.model_fields}
+            data["planning_flow"] = PlanningFlow(agents, **planning_args)
+
+        super().__init__(agents, **data)
+
+    async def execute(self, input_text: str) -> str:
+        """Answer the request directly if it is simple, otherwise plan and execute it."""
+        start = time.perf_counter()
+        answer = None
+        if input_text and len(input_text) <= self.max_classified_chars:
+            answer = await self._answer_directly(input_text)
+
+        if answer is not None:
+            self._record(ROUTE_DIRECT, time.perf_counter() - start)
+            return answer
+
+        result = await self.planning_flow.execute(input_text)
+        self._record(ROUTE_PLANNING, time.perf_counter() - start)
+        return result
+
+    async def _answer_directly(self, request: str) -> Optional[str]:
+        """The direct answer to the request, or None if it needs planning."""
+        try:
+            response = await self.llm.ask(
+                messages=[Message.user_message(request)],
+                system_msgs=[Message.system_message(ROUTER_PROMPT)],
+                stream=False,
+            )
+        except Exception as e:
+            logger.warning(f"Router classification failed, planning instead: {e}")
+            return None
+
+        response = response.strip()
+        if not response or PLAN_MARKER in response:
+            return None
+        return response
+
+    def _record(self, route: str, elapsed: float) -> None:
+        """Remember the route taken and log how much time the fast path saved."""
+        self.last_route = route
+        count, total = self._latencies.get(route, (0, 0.0))
+        self._latencies[route] = (count + 1, total + elapsed)
+
+        message = f"Router: {route} path took {elapsed:.2f}s"
+        if route == ROUTE_DIRECT and ROUTE_PLANNING in self._latencies:
+            # Estimated against the planning runs of this flow so far
+            planning_count, planning_total = self._latencies[ROUTE_PLANNING]
+            saved = max(0.0, planning_total / planning_count - elapsed)
+            self._seconds_saved += saved
+            message += f", about {saved:.2f}s faster than planning"
+        logger.info(message)
+
+    def route_stats(self) -> Dict[str, object]:
+        """Requests and average latency per route, and the estimated time saved."""
+        stats: Dict[str, object] = {
+            route: {"count": count, "average_seconds": total / count}
+            for route, (count, total) in self._latencies.items()
+        }
+        stats["seconds_saved"] = self._seconds_saved
+        return stats
@@ -1,20 +1,381 @@
-from typing import Dict, List, Literal, Optional, Union
+import asyncio
+import json
+import time
+from collections import Counter, defaultdict, deque
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    TypeVar,
+    Union,
+)
 
+import httpx
 from openai import (
+    APIConnectionError,
     APIError,
+    APIStatusError,
+    APITimeoutError,
     AsyncAzureOpenAI,
     AsyncOpenAI,
     AuthenticationError,
+    BadRequestError,
+    InternalServerError,
+    NotFoundError,
     OpenAIError,
+    PermissionDeniedError,
     RateLimitError,
 )
-from tenacity import retry, stop_after_attempt, wait_random_exponential
+from openai.types.chat import ChatCompletionMessage
+from tenacity import (
+    RetryError,
+    retry,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
 from app.config import LLMSettings, config
 from app.logger import logger  # Assuming a logger is set up in your app
 from app.schema import Message
 
 
+# The model is unavailable to us: retrying it cannot help, a fallback might
+UNAVAILABLE_ERRORS = (AuthenticationError, NotFoundError, PermissionDeniedError)
+
+# The model cannot serve the request right now, so a fallback model might; other
+# errors (bad requests, bad credentials) would fail the same way on every model
+FALLBACK_ERRORS = (
+    APIConnectionError,
+    APITimeoutError,
+    RateLimitError,
+    InternalServerError,
+    NotFoundError,
+)
+
+ResultT = TypeVar("ResultT")
+
+# Hedging decisions look at this many recent requests of an LLM config
+HEDGE_WINDOW = 200
+# and wait for this many latency samples before hedging at all
+HEDGE_MIN_SAMPLES = 20
+
+
+def _should_fall_back(error: BaseException) -> bool:
+    """Whether a failed call should be sent to the next LLM of the chain."""
+    if isinstance(error, RetryError):
+        # Retries ran out: fall back if the last attempt failed for availability
+        error = error.last_attempt.exception()
+    return isinstance(error, FALLBACK_ERRORS)
+
+
+class _LatencyTracker:
+    """Rolling latencies and hedge decisions of one kind of request to an LLM."""
+
+    def __init__(self):
+        self.latencies: deque = deque(maxlen=HEDGE_WINDOW)
+        self.hedged: deque = deque(maxlen=HEDGE_WINDOW)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def hedge_rate(self) -> float:
+        return sum(self.hedged) / len(self.hedged) if self.hedged else 0.0
+
+    def record(self, latency: float, hedged: bool) -> None:
+        self.latencies.append(latency)
+        self.hedged.append(hedged)
+
+
+ANTHROPIC_BASE_URL = "https://api.anthropic.com/v1"
+ANTHROPIC_VERSION = "2023-06-01"
+
+# Errors of the Anthropic API, raised as their OpenAI SDK counterparts so that
+# retries, fallbacks and callers handle both backends alike
+_ANTHROPIC_STATUS_ERRORS = {
+    400: BadRequestError,
+    401: AuthenticationError,
+    403: PermissionDeniedError,
+    404: NotFoundError,
+    429: RateLimitError,
+}
+
+
+def _text_blocks(content) -> List[dict]:
+    """Anthropic content blocks of OpenAI message content (text or parts)."""
+    if content is None:
+        return []
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}] if content else []
+    blocks = []
+    for part in content:
+        if part.get("type") == "text" and part.get("text"):
+            blocks.append({"type": "text", "text": part["text"]})
+        elif part.get("type") == "image_url":
+            # data:<media type>;base64,<data>
+            header, _, data = part["image_url"]["url"].partition(",")
+            media_type = header.removeprefix("data:").split(";")[0]
+            blocks.append(
+                {
+                    "type": "image",
+                    "source": {
+                        "type": "base64",
+                        "media_type": media_type,
+                        "data": data,
+                    },
+                }
+            )
+    return blocks
+
+
+def to_anthropic_request(
+    messages: List[dict], tools: Optional[List[dict]] = None
+) -> dict:
+    """
+    Map formatted OpenAI messages and tools to the system, messages and tools
+    of an Anthropic Messages API request.
+
+    Cache breakpoints are placed on the system prompt, the tool definitions
+    and the last two user turns: the prefix up to the previous turn is then
+    read from the cache and the current turn is written to it for the next
+    call. Anthropic allows four breakpoints per request.
+    """
+    system: List[dict] = []
+    converted: List[dict] = []
+    for message in messages:
+        role = message["role"]
+        if role == "system":
+            system.extend(_text_blocks(message.get("content")))
+            continue
+        if role == "tool":
+            role = "user"
+            blocks = [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": message["tool_call_id"],
+                    "content": _text_blocks(message.get("content"))
+                    or [{"type": "text", "text": "(no output)"}],
+                }
+            ]
+        else:
+            blocks = _text_blocks(message.get("content"))
+            for tool_call in message.get("tool_calls") or []:
+                arguments = tool_call["function"].get("arguments") or "{}"
+                try:
+                    tool_input = json.loads(arguments)
+                except json.JSONDecodeError:
+                    tool_input = {"raw_arguments": arguments}
+                blocks.append(
+                    {
+                        "type": "tool_use",
+                        "id": tool_call["id"],
+                        "name": tool_call["function"]["name"],
+                        "input": tool_input,
+                    }
+                )
+        if not blocks:
+            continue
+        # Roles must alternate, e.g. several tool results form one user turn
+        if converted and converted[-1]["role"] == role:
+            converted[-1]["content"].extend(blocks)
+        else:
+            converted.append({"role": role, "content": blocks})
+
+    request: dict = {"messages": converted}
+    if system:
+        system[-1]["cache_control"] = {"type": "ephemeral"}
+        request["system"] = system
+    if tools:
+        request["tools"] = [
+            {
+                "name": tool["function"]["name"],
+                "description": tool["function"].get("description", ""),
+                "input_schema": tool["function"].get(
+                    "parameters", {"type": "object", "properties": {}}
+                ),
+            }
+            for tool in tools
+        ]
+        request["tools"][-1]["cache_control"] = {"type": "ephemeral"}
+    user_turns = [m for m in converted if m["role"] == "user"]
+    for turn in user_turns[-2:]:
+        turn["content"][-1]["cache_control"] = {"type": "ephemeral"}
+    return request
+
+
+class AnthropicClient:
+    """
+    Client of the Anthropic Messages API returning OpenAI SDK message objects,
+    so that agents work unchanged with either backend.
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        base_url = (base_url or ANTHROPIC_BASE_URL).rstrip("/")
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={
+                "x-api-key": api_key,
+                "anthropic-version": ANTHROPIC_VERSION,
+                "content-type": "application/json",
+            },
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+        # Token totals, including the cache reads and writes
+        self.usage: Counter = Counter()
+
+    @staticmethod
+    def _payload(
+        model: str,
+        messages: List[dict],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[dict]] = None,
+        tool_choice: Optional[str] = None,
+    ) -> dict:
+        payload = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            **to_anthropic_request(messages, tools),
+        }
+        if tools and tool_choice:
+            payload["tool_choice"] = {
+                "auto": {"type": "auto"},
+                "required": {"type": "any"},
+                "none": {"type": "none"},
+            }[tool_choice]
+        return payload
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        if response.status_code < 400:
+            return
+        try:
+            body = response.json()
+            message = body.get("error", {}).get("message") or response.text
+        except ValueError:
+            body, message = None, response.text
+        error_class = _ANTHROPIC_STATUS_ERRORS.get(response.status_code)
+        if error_class is None:
+            error_class = (
+                InternalServerError if response.status_code >= 500 else APIStatusError
+            )
+        raise error_class(message, response=response, body=body)
+
+    async def _post(self, payload: dict, timeout: Optional[float]) -> httpx.Response:
+        try:
+            return await self._http.post(
+                "/messages",
+                json=payload,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+        except httpx.TimeoutException as e:
+            raise APITimeoutError(request=e.request) from e
+        except httpx.HTTPError as e:
+            raise APIConnectionError(request=e.request) from e
+
+    def _record_usage(self, model: str, usage: dict) -> None:
+        usage = {k: v for k, v in usage.items() if isinstance(v, int)}
+        self.usage.update(usage)
+        logger.info(
+            f"Anthropic {model} tokens: {usage.get('input_tokens', 0)} input, "
+            f"{usage.get('cache_read_input_tokens', 0)} read from cache, "
+            f"{usage.get('cache_creation_input_tokens', 0)} written to cache, "
+            f"{usage.get('output_tokens', 0)} output"
+        )
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[dict],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[dict]] = None,
+        tool_choice: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> ChatCompletionMessage:
+        """Send one request and return the reply as an OpenAI message."""
+        payload = self._payload(
+            model, messages, max_tokens, temperature, tools, tool_choice
+        )
+        response = await self._post(payload, timeout)
+        self._raise_for_status(response)
+        data = response.json()
+        self._record_usage(model, data.get("usage", {}))
+
+        text, tool_calls = [], []
+        for block in data.get("content", []):
+            if block["type"] == "text":
+                text.append(block["text"])
+            elif block["type"] == "tool_use":
+                tool_calls.append(
+                    {
+                        "id": block["id"],
+                        "type": "function",
+                        "function": {
+                            "name": block["name"],
+                            "arguments": json.dumps(block["input"]),
+                        },
+                    }
+                )
+        return ChatCompletionMessage(
+            role="assistant",
+            content="".join(text) or None,
+            tool_calls=tool_calls or None,
+        )
+
+    async def stream_text(
+        self,
+        model: str,
+        messages: List[dict],
+        max_tokens: int,
+        temperature: float,
+    ) -> AsyncIterator[str]:
+        """Send one request and yield the text of the reply as it arrives."""
+        payload = self._payload(model, messages, max_tokens, temperature)
+        payload["stream"] = True
+        usage: Dict[str, int] = {}
+        try:
+            async with self._http.stream("POST", "/messages", json=payload) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self._raise_for_status(response)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    if event["type"] == "message_start":
+                        usage.update(event["message"].get("usage", {}))
+                    elif event["type"] == "message_delta":
+                        usage.update(event.get("usage", {}))
+                    elif event["type"] == "content_block_delta":
+                        delta = event["delta"]
+                        if delta.get("type") == "text_delta":
+                            yield delta["text"]
+                    elif event["type"] == "error":
+                        raise APIError(
+                            event["error"].get("message", "stream error"),
+                            request=response.request,
+                            body=event,
+                        )
+        except httpx.TimeoutException as e:
+            raise APITimeoutError(request=e.request) from e
+        except httpx.HTTPError as e:
+            raise APIConnectionError(request=e.request) from e
+        self._record_usage(model, usage)
+
+    async def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        await self._http.aclose()
+
+
 class LLM:
     _instances: Dict[str, "LLM"] = {}
 
@@ -32,7 +393,10 @@ class LLM:
     ):
         if not hasattr(self, "client"):  # Only initialize if not already initialized
             llm_config = llm_config or config.llm
-            llm_config = llm_config.get(config_name, llm_config["default"])
+            llm_config = llm_config.get(config_name) or llm_config["default"]
+            self.config_name = config_name
+            # Tried in order when this LLM's model is unavailable
+            self.fallbacks: List["LLM"] = []
             self.model = llm_config.model
             self.max_tokens = llm_config.max_tokens
             self.temperature = llm_config.temperature
@@ -40,15 +404,190 @@ class LLM:
             self.api_key = llm_config.api_key
             self.api_version = llm_config.api_version
             self.base_url = llm_config.base_url
+            self.hedge_percentile = llm_config.hedge_percentile
+            self.hedge_max_rate = llm_config.hedge_max_rate
+            self.hedge_llm = llm_config.hedge_llm
+            if self.hedge_llm is not None and self.hedge_llm not in config.llm:
+                logger.warning(
+                    f"LLM {config_name}: no [llm.{self.hedge_llm}] config for "
+                    "hedge_llm, hedging with the same config instead"
+                )
+                self.hedge_llm = None
+            # Plain completions and tool calls have very different latencies,
+            # so they are tracked (and hedged) separately
+            self._latency: Dict[str, _LatencyTracker] = defaultdict(_LatencyTracker)
             if self.api_type == "azure":
                 self.client = AsyncAzureOpenAI(
                     base_url=self.base_url,
                     api_key=self.api_key,
                     api_version=self.api_version,
                 )
+            elif self.api_type == "anthropic":
+                self.client = AnthropicClient(self.api_key, self.base_url)
             else:
                 self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
 
+    @classmethod
+    async def close_all(cls) -> None:
+        """Close the API clients of all LLM instances, e.g. on shutdown."""
+        instances, cls._instances = list(cls._instances.values()), {}
+        for llm in instances:
+            await llm.client.close()
+
+    @classmethod
+    def for_role(cls, role: str) -> "LLM":
+        """
+        The LLM of a call site role: "planner", "executor", "summarizer" or
+        "classifier".
+
+        `[llm_roles.<role>]` lists the [llm.*] configs to use in order of
+        preference (the later ones being fallbacks) and can override their
+        max_tokens and temperature. Roles without configuration use the
+        default LLM.
+        """
+        settings = config.llm_roles.get(role)
+        if settings is None:
+            return cls()
+
+        names = [name for name in settings.llm if name in config.llm]
+        for name in settings.llm:
+            if name not in config.llm:
+                logger.warning(f"LLM role {role}: no [llm.{name}] config, skipping")
+        overrides = {
+            k: v
+            for k, v in (
+                ("max_tokens", settings.max_tokens),
+                ("temperature", settings.temperature),
+            )
+            if v is not None
+        }
+        chain = []
+        for name in names or ["default"]:
+            key = f"{role}:{name}"
+            llm_settings = config.llm[name].model_copy(update=overrides)
+            chain.append(cls(key, llm_config={key: llm_settings}))
+        chain[0].fallbacks = chain[1:]
+        return chain[0]
+
+    async def _with_fallbacks(
+        self, call: Callable[["LLM"], Awaitable[ResultT]]
+    ) -> ResultT:
+        """Make the call with this LLM, then with each fallback while unavailable."""
+        chain = [self, *self.fallbacks]
+        for llm, fallback in zip(chain, chain[1:] + [None]):
+            try:
+                return await call(llm)
+            except (OpenAIError, RetryError) as e:
+                if fallback is None or not _should_fall_back(e):
+                    raise
+                logger.warning(
+                    f"LLM {llm.config_name} ({llm.model}) failed: {e}. "
+                    f"Falling back to {fallback.config_name} ({fallback.model})"
+                )
+
+    async def _hedged(
+        self, kind: str, request: Callable[["LLM"], Awaitable[ResultT]]
+    ) -> ResultT:
+        """
+        Send `request` with this LLM. If it takes longer than the configured
+        percentile of recent latencies of this `kind` of request, and the hedge
+        rate cap allows it, send a duplicate (with `hedge_llm` if set) and
+        return whichever succeeds first, cancelling the other.
+        """
+        latency = self._latency[kind]
+        delay = None
+        if (
+            self.hedge_percentile is not None
+            and latency.hedge_rate() < self.hedge_max_rate
+        ):
+            delay = latency.percentile(self.hedge_percentile)
+
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(request(self))
+        if delay is None:
+            result = await primary
+            latency.record(time.perf_counter() - start, hedged=False)
+            return result
+
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                pending = set()
+                result = primary.result()
+                latency.record(time.perf_counter() - start, hedged=False)
+                return result
+
+            hedge = LLM(self.hedge_llm) if self.hedge_llm else self
+            logger.info(
+                f"LLM {self.config_name} request slower than {delay:.1f}s, "
+                f"hedging with {hedge.config_name} ({hedge.model})"
+            )
+            pending.add(asyncio.ensure_future(request(hedge)))
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # A failed request only counts once the other one failed too
+                for task in sorted(done, key=lambda t: t.exception() is not None):
+                    if task.exception() is None or not pending:
+                        latency.record(time.perf_counter() - start, hedged=True)
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _complete(
+        self,
+        messages: List[dict],
+        max_tokens: int,
+        temperature: float,
+        **kwargs,
+    ) -> ChatCompletionMessage:
+        """One non-streaming completion request to this LLM's backend."""
+        if self.api_type == "anthropic":
+            return await self.client.complete(
+                self.model,
+                messages,
+                max_tokens,
+                temperature,
+                tools=kwargs.get("tools"),
+                tool_choice=kwargs.get("tool_choice"),
+                timeout=kwargs.get("timeout"),
+            )
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=False,
+            **kwargs,
+        )
+        if not response.choices or not response.choices[0].message:
+            print(response)
+            raise ValueError("Invalid or empty response from LLM")
+        return response.choices[0].message
+
+    async def _stream_text(
+        self, messages: List[dict], temperature: float
+    ) -> AsyncIterator[str]:
+        """The text of a streamed completion from this LLM's backend, in chunks."""
+        if self.api_type == "anthropic":
+            async for text in self.client.stream_text(
+                self.model, messages, self.max_tokens, temperature
+            ):
+                yield text
+            return
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=self.max_tokens,
+            temperature=temperature,
+            stream=True,
+        )
+        async for chunk in response:
+            yield chunk.choices[0].delta.content or ""
+
     @staticmethod
     def format_messages(messages: List[Union[dict, Message]]) -> List[dict]:
         """
@@ -97,11 +636,28 @@ class LLM:
 
         return formatted_messages
 
+    async def ask(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        stream: bool = True,
+        temperature: Optional[float] = None,
+    ) -> str:
+        """
+        Send a prompt to the LLM (or its fallbacks) and get the response.
+
+        See `_ask` for the arguments.
+        """
+        return await self._with_fallbacks(
+            lambda llm: llm._ask(messages, system_msgs, stream, temperature)
+        )
+
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
+        retry=retry_if_not_exception_type(UNAVAILABLE_ERRORS),
     )
-    async def ask(
+    async def _ask(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
@@ -134,30 +690,24 @@ class LLM:
                 messages = self.format_messages(messages)
 
             if not stream:
-                # Non-streaming request
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    max_tokens=self.max_tokens,
-                    temperature=temperature or self.temperature,
-                    stream=False,
+                # Non-streaming request, hedged if it is slow
+                response = await self._hedged(
+                    "ask",
+                    lambda llm: llm._complete(
+                        messages,
+                        max_tokens=self.max_tokens,
+                        temperature=temperature or self.temperature,
+                    ),
                 )
-                if not response.choices or not response.choices[0].message.content:
+                if not response.content:
                     raise ValueError("Empty or invalid response from LLM")
-                return response.choices[0].message.content
+                return response.content
 
             # Streaming request
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=self.max_tokens,
-                temperature=temperature or self.temperature,
-                stream=True,
-            )
-
             collected_messages = []
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
+            async for chunk_message in self._stream_text(
+                messages, temperature or self.temperature
+            ):
                 collected_messages.append(chunk_message)
                 print(chunk_message, end="", flush=True)
 
@@ -177,11 +727,39 @@ class LLM:
             logger.error(f"Unexpected error in ask: {e}")
             raise
 
+    async def ask_tool(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        timeout: int = 60,
+        tools: Optional[List[dict]] = None,
+        tool_choice: Literal["none", "auto", "required"] = "auto",
+        temperature: Optional[float] = None,
+        **kwargs,
+    ):
+        """
+        Ask the LLM (or its fallbacks) using functions/tools.
+
+        See `_ask_tool` for the arguments.
+        """
+        return await self._with_fallbacks(
+            lambda llm: llm._ask_tool(
+                messages,
+                system_msgs,
+                timeout,
+                tools,
+                tool_choice,
+                temperature,
+                **kwargs,
+            )
+        )
+
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
+        retry=retry_if_not_exception_type(UNAVAILABLE_ERRORS),
     )
-    async def ask_tool(
+    async def _ask_tool(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
@@ -229,25 +807,20 @@ class LLM:
                     if not isinstance(tool, dict) or "type" not in tool:
                         raise ValueError("Each tool must be a dict with 'type' field")
 
-            # Set up the completion request
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature or self.temperature,
-                max_tokens=self.max_tokens,
-                tools=tools,
-                tool_choice=tool_choice,
-                timeout=timeout,
-                **kwargs,
+            # Set up the completion request, hedged if it is slow
+            return await self._hedged(
+                "ask_tool",
+                lambda llm: llm._complete(
+                    messages,
+                    max_tokens=self.max_tokens,
+                    temperature=temperature or self.temperature,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    timeout=timeout,
+                    **kwargs,
+                ),
             )
 
-            # Check if response is valid
-            if not response.choices or not response.choices[0].message:
-                print(response)
-                raise ValueError("Invalid or empty response from LLM")
-
-            return response.choices[0].message
-
         except ValueError as ve:
             logger.error(f"Validation error in ask_tool: {ve}")
             raise
@@ -17,7 +17,7 @@ If you encounter errors or unexpected results:
 Your goal is to be resilient and adaptable, finding ways to accomplish tasks even when faced with challenges.
 """
 
-NEXT_STEP_PROMPT = """You can interact with the computer using PythonExecute, save important content and information files through FileSaver, open browsers with BrowserUseTool, and retrieve information using GoogleSearch.
+NEXT_STEP_PROMPT = """You can interact with the computer using PythonExecute, save important content and information files through FileSaver, read web pages quickly with WebFetch, research questions across several pages with WebResearch, open browsers with BrowserUseTool, and retrieve information using GoogleSearch.
 
 PythonExecute: Execute Python code to interact with the computer system, data processing, automation tasks, etc.
 - If code execution fails, diagnose the error and try a different approach
@@ -29,6 +29,14 @@ FileSaver: Save files locally, such as txt, py, html, etc.
 - Use appropriate file extensions and formats
 - Consider creating backup files when modifying existing content
 
+WebFetch: Read the content of a web page as markdown or text without opening a browser.
+- Prefer it over BrowserUseTool for reading articles, documentation and search results
+- Pages that need JavaScript are rendered in a browser automatically
+
+WebResearch: Answer a question from several web pages in one call.
+- Give it a question and a search query or a list of URLs; it returns a digest with numbered citations
+- Prefer it over repeated GoogleSearch and WebFetch calls when a question needs multiple sources
+
 BrowserUseTool: Open, browse, and use web browsers. If you open a local HTML file, you must provide the absolute path to the file.
 - Handle network errors and timeouts gracefully
 - Have fallback strategies if websites are unavailable
@@ -19,6 +19,8 @@ Then, for every response, you must include exactly _ONE_ tool call/function call
 Remember, you should always include a _SINGLE_ tool call/function call and then wait for a response from the shell before continuing with more discussion and commands. Everything you include in the DISCUSSION section will be saved for future reference.
 If you'd like to issue two commands at once, PLEASE DO NOT DO THAT! Please instead first submit just the first tool call, and then after receiving a response you'll be able to issue the second tool call.
 Note that the environment does NOT support interactive session commands (e.g. python, vim), so please do not invoke them.
+To search the contents of files, use the code_search tool with the current directory as `path` instead of running grep through bash; it is much faster on large repositories.
+To find where a Python name is defined, who calls it, or the outline of a Python file, use the python_symbols tool instead of viewing files one by one.
 """
 
 NEXT_STEP_TEMPLATE = """{{observation}}
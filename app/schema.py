@@ -1,7 +1,8 @@
+from collections import Counter
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class AgentState(str, Enum):
@@ -13,6 +14,251 @@ class AgentState(str, Enum):
     ERROR = "ERROR"
 
 
+class PlanStepStatus(str, Enum):
+    """Enum class defining possible statuses of a plan step"""
+
+    NOT_STARTED = "not_started"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    BLOCKED = "blocked"
+    PARTIAL_SUCCESS = "partial_success"  # New status
+    FAILED = "failed"  # New status
+    SKIPPED = "skipped"  # New status
+
+    @classmethod
+    def get_all_statuses(cls) -> list[str]:
+        """Return a list of all possible step status values"""
+        return [status.value for status in cls]
+
+    @classmethod
+    def get_active_statuses(cls) -> list[str]:
+        """Return a list of values representing active statuses (not started or in progress)"""
+        return [cls.NOT_STARTED.value, cls.IN_PROGRESS.value]
+
+    @classmethod
+    def get_completed_statuses(cls) -> list[str]:
+        """Return a list of statuses considered as completed (for progress calculation)"""
+        return [cls.COMPLETED.value, cls.PARTIAL_SUCCESS.value, cls.SKIPPED.value]
+
+    @classmethod
+    def get_terminal_statuses(cls) -> list[str]:
+        """Return a list of terminal statuses (no further action needed)"""
+        return [
+            cls.COMPLETED.value,
+            cls.PARTIAL_SUCCESS.value,
+            cls.SKIPPED.value,
+            cls.FAILED.value,
+        ]
+
+    @classmethod
+    def get_status_marks(cls) -> Dict[str, str]:
+        """Return a mapping of statuses to their marker symbols"""
+        return {
+            cls.COMPLETED.value: "[✓]",
+            cls.IN_PROGRESS.value: "[→]",
+            cls.BLOCKED.value: "[!]",
+            cls.NOT_STARTED.value: "[ ]",
+            cls.PARTIAL_SUCCESS.value: "[~]",  # Tilde for partial success
+            cls.FAILED.value: "[✗]",  # X for failed
+            cls.SKIPPED.value: "[↷]",  # Arrow for skipped
+        }
+
+
+# Order and wording of the per-status counts in a rendered plan header.
+_STATUS_LABELS: Dict[PlanStepStatus, str] = {
+    PlanStepStatus.COMPLETED: "completed",
+    PlanStepStatus.PARTIAL_SUCCESS: "partial",
+    PlanStepStatus.SKIPPED: "skipped",
+    PlanStepStatus.FAILED: "failed",
+    PlanStepStatus.IN_PROGRESS: "in progress",
+    PlanStepStatus.BLOCKED: "blocked",
+    PlanStepStatus.NOT_STARTED: "not started",
+}
+
+
+def _earlier_steps_only(dependencies: List[List[int]], n: int) -> List[List[int]]:
+    """One sorted dependency list per step, keeping only earlier steps."""
+    dependencies = (list(dependencies) + [[]] * n)[:n]
+    return [
+        sorted({d for d in deps if 0 <= d < i}) for i, deps in enumerate(dependencies)
+    ]
+
+
+class Plan(BaseModel):
+    """
+    A plan's steps with their statuses, notes and dependencies.
+
+    Without `step_dependencies` every step depends on the one before it, so
+    steps run in order. With them, each step lists the (earlier) steps it
+    needs and steps whose dependencies are all finished can run concurrently.
+
+    Change a plan through its methods only: they keep per-status counters and
+    the rendered step lines up to date, so changing a step's status re-renders
+    that line alone and the header never rescans the steps.
+    """
+
+    plan_id: str
+    title: str
+    steps: List[str]
+    step_statuses: List[str] = Field(default_factory=list)
+    step_notes: List[str] = Field(default_factory=list)
+    step_dependencies: Optional[List[List[int]]] = None
+
+    _counts: Counter = PrivateAttr(default_factory=Counter)
+    _lines: List[Optional[str]] = PrivateAttr(default_factory=list)
+    # Every step before this index is in a non-active status.
+    _next_active: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        n = len(self.steps)
+        not_started = PlanStepStatus.NOT_STARTED.value
+        self.step_statuses = (self.step_statuses + [not_started] * n)[:n]
+        self.step_notes = (self.step_notes + [""] * n)[:n]
+        if self.step_dependencies is not None:
+            self.step_dependencies = _earlier_steps_only(self.step_dependencies, n)
+        self._counts = Counter(self.step_statuses)
+        self._lines = [None] * n
+        self._next_active = 0
+        self._advance_next_active()
+
+    def count(self, *statuses: str) -> int:
+        """Number of steps in any of the given statuses."""
+        return sum(self._counts[status] for status in statuses)
+
+    @property
+    def effective_completed(self) -> int:
+        """Completed, partially successful and skipped steps."""
+        return self.count(*PlanStepStatus.get_completed_statuses())
+
+    def next_active_step(self) -> Optional[int]:
+        """Index of the first not started or in progress step, if any."""
+        return self._next_active if self._next_active < len(self.steps) else None
+
+    def _advance_next_active(self) -> None:
+        active = PlanStepStatus.get_active_statuses()
+        statuses, index = self.step_statuses, self._next_active
+        while index < len(statuses) and statuses[index] not in active:
+            index += 1
+        self._next_active = index
+
+    def set_status(self, index: int, status: str) -> None:
+        old = self.step_statuses[index]
+        if old != status:
+            self._counts[old] -= 1
+            self._counts[status] += 1
+            self.step_statuses[index] = status
+            self._lines[index] = None
+            if status in PlanStepStatus.get_active_statuses():
+                self._next_active = min(self._next_active, index)
+            elif index == self._next_active:
+                self._advance_next_active()
+
+    def set_notes(self, index: int, notes: str) -> None:
+        if self.step_notes[index] != notes:
+            self.step_notes[index] = notes
+            self._lines[index] = None
+
+    def dependencies(self, index: int) -> List[int]:
+        """The steps that must finish before step `index` can start."""
+        if self.step_dependencies is None:
+            return [index - 1] if index else []
+        return self.step_dependencies[index]
+
+    def ready_steps(self) -> List[int]:
+        """Unfinished steps whose dependencies have all finished, in order."""
+        terminal = PlanStepStatus.get_terminal_statuses()
+        statuses = self.step_statuses
+        return [
+            i
+            for i, status in enumerate(statuses)
+            if status not in terminal
+            and all(statuses[d] in terminal for d in self.dependencies(i))
+        ]
+
+    def set_steps(
+        self, steps: List[str], dependencies: Optional[List[List[int]]] = None
+    ) -> None:
+        """
+        Replace the steps, keeping the state of steps unchanged in place.
+
+        Without new `dependencies`, a plan with explicit dependencies keeps
+        them for unchanged steps and makes new steps depend on the previous one.
+        """
+        old_dependencies = self.step_dependencies
+        if dependencies is None and old_dependencies is not None:
+            dependencies = [
+                old_dependencies[i]
+                if i < len(self.steps) and step == self.steps[i]
+                else ([i - 1] if i else [])
+                for i, step in enumerate(steps)
+            ]
+        if dependencies is not None:
+            dependencies = _earlier_steps_only(dependencies, len(steps))
+
+        statuses, notes, lines = [], [], []
+        for i, step in enumerate(steps):
+            if i < len(self.steps) and step == self.steps[i]:
+                statuses.append(self.step_statuses[i])
+                notes.append(self.step_notes[i])
+                # The rendered line shows explicit dependencies only
+                shown = old_dependencies[i] if old_dependencies else []
+                new_shown = dependencies[i] if dependencies else []
+                lines.append(self._lines[i] if shown == new_shown else None)
+            else:
+                statuses.append(PlanStepStatus.NOT_STARTED.value)
+                notes.append("")
+                lines.append(None)
+        self.steps, self.step_statuses, self.step_notes = steps, statuses, notes
+        self.step_dependencies = dependencies
+        self._counts = Counter(statuses)
+        self._lines = lines
+        self._next_active = 0
+        self._advance_next_active()
+
+    def progress(self) -> str:
+        total = len(self.steps)
+        done = self.effective_completed
+        percentage = f"{done / total * 100:.1f}%" if total else "0%"
+        return f"{done}/{total} steps effectively completed ({percentage})"
+
+    def render_header(self) -> str:
+        title = f"Plan: {self.title} (ID: {self.plan_id})\n"
+        counts = ", ".join(
+            f"{self._counts[status.value]} {label}"
+            for status, label in _STATUS_LABELS.items()
+        )
+        return (
+            f"{title}{'=' * len(title)}\n\n"
+            f"Progress: {self.progress()}\n"
+            f"Status: {counts}\n\n"
+            "Steps:\n"
+        )
+
+    def render_step(self, index: int) -> str:
+        line = self._lines[index]
+        if line is None:
+            line = self._lines[index] = self._render_line(index)
+        return line
+
+    def _render_line(self, index: int) -> str:
+        mark = PlanStepStatus.get_status_marks().get(self.step_statuses[index], "[ ]")
+        line = f"{index}. {mark} {self.steps[index]}"
+        if self.step_dependencies and self.step_dependencies[index]:
+            line += f" (after {', '.join(map(str, self.step_dependencies[index]))})"
+        line += "\n"
+        if self.step_notes[index]:
+            line += f"   Notes: {self.step_notes[index]}\n"
+        return line
+
+    def render(self) -> str:
+        """The plan as text: header, progress, status counts and steps."""
+        lines = self._lines
+        for i, line in enumerate(lines):
+            if line is None:
+                lines[i] = self._render_line(i)
+        return self.render_header() + "".join(lines)
+
+
 class Function(BaseModel):
     name: str
     arguments: str
@@ -34,6 +280,7 @@ class Message(BaseModel):
     tool_calls: Optional[List[ToolCall]] = Field(default=None)
     name: Optional[str] = Field(default=None)
     tool_call_id: Optional[str] = Field(default=None)
+    base64_image: Optional[str] = Field(default=None)
 
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
@@ -58,7 +305,15 @@ class Message(BaseModel):
     def to_dict(self) -> dict:
         """Convert message to dictionary format"""
         message = {"role": self.role}
-        if self.content is not None:
+        if self.base64_image is not None:
+            message["content"] = [
+                {"type": "text", "text": self.content or ""},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/jpeg;base64,{self.base64_image}"},
+                },
+            ]
+        elif self.content is not None:
             message["content"] = self.content
         if self.tool_calls is not None:
             message["tool_calls"] = [tool_call.dict() for tool_call in self.tool_calls]
@@ -69,9 +324,11 @@ class Message(BaseModel):
         return message
 
     @classmethod
-    def user_message(cls, content: str) -> "Message":
-        """Create a user message"""
-        return cls(role="user", content=content)
+    def user_message(
+        cls, content: str, base64_image: Optional[str] = None
+    ) -> "Message":
+        """Create a user message, optionally carrying a JPEG image"""
+        return cls(role="user", content=content, base64_image=base64_image)
 
     @classmethod
     def system_message(cls, content: str) -> "Message":
@@ -133,7 +390,7 @@ class Memory(BaseModel):
     def to_dict_list(self) -> List[dict]:
         """Convert messages to list of dicts"""
         return [msg.to_dict() for msg in self.messages]
-        
+
     def get_last_user_message(self) -> Optional[str]:
         """Get the content of the last user message"""
         for msg in reversed(self.messages):
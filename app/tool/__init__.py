@@ -1,8 +1,11 @@
 from app.tool.base import BaseTool
 from app.tool.bash import Bash
+from app.tool.code_search import CodeSearch
 from app.tool.create_chat_completion import CreateChatCompletion
 from app.tool.planning import PlanningTool
 from app.tool.str_replace_editor import StrReplaceEditor
+from app.tool.symbol_index import PythonSymbols
+from app.tool.terminal import Terminal
 from app.tool.terminate import Terminate
 from app.tool.tool_collection import ToolCollection
 
@@ -10,8 +13,11 @@ from app.tool.tool_collection import ToolCollection
 __all__ = [
     "BaseTool",
     "Bash",
+    "Terminal",
     "Terminate",
     "StrReplaceEditor",
+    "CodeSearch",
+    "PythonSymbols",
     "ToolCollection",
     "CreateChatCompletion",
     "PlanningTool",
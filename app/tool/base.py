@@ -20,6 +20,19 @@ class BaseTool(ABC, BaseModel):
     async def execute(self, **kwargs) -> Any:
         """Execute the tool with given parameters."""
 
+    async def cleanup(self) -> None:
+        """Release any resources (processes, browsers, ...) held by the tool."""
+
+    def clone(self) -> "BaseTool":
+        """
+        A copy with the same configuration but none of the runtime state kept
+        in private attributes, for another agent using the tool concurrently.
+        """
+        clone = self.model_copy()
+        for name, private in self.__private_attributes__.items():
+            setattr(clone, name, private.get_default())
+        return clone
+
     def to_param(self) -> Dict:
         """Convert tool to function call format."""
         return {
@@ -38,6 +51,7 @@ class ToolResult(BaseModel):
     output: Any = Field(default=None)
     error: Optional[str] = Field(default=None)
     system: Optional[str] = Field(default=None)
+    base64_image: Optional[str] = Field(default=None)
 
     class Config:
         arbitrary_types_allowed = True
@@ -59,6 +73,7 @@ class ToolResult(BaseModel):
             output=combine_fields(self.output, other.output),
             error=combine_fields(self.error, other.error),
             system=combine_fields(self.system, other.system),
+            base64_image=combine_fields(self.base64_image, other.base64_image, False),
         )
 
     def __str__(self):
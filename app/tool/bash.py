@@ -1,6 +1,9 @@
 import asyncio
 import os
-from typing import Optional
+import shlex
+import signal
+from collections import deque
+from typing import Deque, Dict, Optional
 
 from app.exceptions import ToolError
 from app.tool.base import BaseTool, CLIResult, ToolResult
@@ -23,10 +26,14 @@ class _BashSession:
     _output_delay: float = 0.2  # seconds
     _timeout: float = 120.0  # seconds
     _sentinel: str = "<<exit>>"
+    _health_check_timeout: float = 5.0  # seconds
 
-    def __init__(self):
+    def __init__(self, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None):
         self._started = False
         self._timed_out = False
+        self._cwd = cwd
+        self._env = env
+        self.uses = 0
 
     async def start(self):
         if self._started:
@@ -40,10 +47,61 @@ class _BashSession:
             stdin=asyncio.subprocess.PIPE,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
+            cwd=self._cwd,
+            env=self._env,
         )
 
         self._started = True
 
+    @property
+    def healthy(self) -> bool:
+        return (
+            self._started and not self._timed_out and self._process.returncode is None
+        )
+
+    async def reset(self) -> bool:
+        """
+        Return the shell to a clean state: kill its jobs, then replace it in place
+        with a fresh bash in the initial working directory and environment.
+        Returns whether the fresh shell answers a health check.
+        """
+        if not self.healthy:
+            return False
+
+        env = " ".join(shlex.quote(f"{k}={v}") for k, v in (self._env or {}).items())
+        cwd = shlex.quote(self._cwd or os.getcwd())
+        self._process.stdout._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
+        self._process.stderr._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
+        reset_command = (
+            f"kill -9 $(jobs -p) 2>/dev/null; "
+            f"cd {cwd} || exit 1; exec env -i {env} {self.command}\n"
+        )
+        self._process.stdin.write(reset_command.encode())
+        await self._process.stdin.drain()
+
+        try:
+            async with asyncio.timeout(self._health_check_timeout):
+                result = await self.run("echo ok")
+        except (ToolError, TimeoutError):
+            return False
+        return isinstance(result, CLIResult) and result.output == "ok"
+
+    def kill(self):
+        """Kill the shell and everything in its process group, without reaping it."""
+        if not self._started or self._process.returncode is not None:
+            return
+        try:
+            os.killpg(self._process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def close(self):
+        """Kill the shell and everything in its process group, and reap it."""
+        if not self._started:
+            return
+        self.kill()
+        await self._process.wait()
+
     def stop(self):
         """Terminate the bash shell."""
         if not self._started:
@@ -113,6 +171,109 @@ class _BashSession:
         return CLIResult(output=output, error=error)
 
 
+class _BashSessionPool:
+    """
+    A process-wide pool of started bash shells.
+
+    Sessions are claimed on first use, reset to the initial working directory and
+    environment when released, and recycled after `max_uses` claims. Shells that
+    fail their health check, time out or exceed the pool size are killed and
+    reaped right away, so churn never leaves zombie shells behind.
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 20):
+        self.size = size
+        self.max_uses = max_uses
+        self._cwd = os.getcwd()
+        self._env = dict(os.environ)
+        self._idle: Deque[_BashSession] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refill_task: Optional[asyncio.Task] = None
+
+    def _check_loop(self):
+        """Drop idle shells created under a different (possibly closed) event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # They cannot be awaited (nor reaped) from this loop, only killed.
+            for session in self._idle:
+                session.kill()
+            self._idle.clear()
+            if self._refill_task is not None and not self._refill_task.done():
+                try:
+                    self._refill_task.cancel()
+                except RuntimeError:  # its loop is already closed
+                    pass
+            self._refill_task = None
+            self._loop = loop
+
+    async def _new_session(self) -> _BashSession:
+        session = _BashSession(cwd=self._cwd, env=self._env)
+        await session.start()
+        return session
+
+    async def _refill(self):
+        while len(self._idle) < self.size:
+            session = await self._new_session()
+            if len(self._idle) < self.size:
+                self._idle.append(session)
+            else:
+                await session.close()
+
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def acquire(self) -> _BashSession:
+        """Claim a ready shell, starting one only if the pool is empty."""
+        self._check_loop()
+        session = None
+        while self._idle:
+            candidate = self._idle.popleft()
+            if candidate.healthy:
+                session = candidate
+                break
+            await candidate.close()
+        if session is None:
+            session = await self._new_session()
+        session.uses += 1
+        self._schedule_refill()
+        return session
+
+    async def release(self, session: _BashSession):
+        """Return a shell to the pool, or kill it if it cannot be reused."""
+        reusable = (
+            self._loop is asyncio.get_running_loop()
+            and session.uses < self.max_uses
+            and len(self._idle) < self.size
+            and await session.reset()
+        )
+        if reusable:
+            self._idle.append(session)
+        else:
+            await session.close()
+
+    async def close(self):
+        """Stop refilling and kill all idle shells."""
+        self._check_loop()
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        self._refill_task = None
+        while self._idle:
+            await self._idle.popleft().close()
+
+
+_session_pool = _BashSessionPool()
+
+
+async def close_session_pool() -> None:
+    """Kill the pre-warmed shells of the process-wide pool."""
+    await _session_pool.close()
+
+
 class Bash(BaseTool):
     """A tool for executing bash commands"""
 
@@ -136,21 +297,25 @@ class Bash(BaseTool):
     ) -> CLIResult:
         if restart:
             if self._session:
-                self._session.stop()
-            self._session = _BashSession()
-            await self._session.start()
+                await _session_pool.release(self._session)
+            self._session = await _session_pool.acquire()
 
             return ToolResult(system="tool has been restarted.")
 
         if self._session is None:
-            self._session = _BashSession()
-            await self._session.start()
+            self._session = await _session_pool.acquire()
 
         if command is not None:
             return await self._session.run(command)
 
         raise ToolError("no command provided.")
 
+    async def cleanup(self):
+        """Hand the shell back to the pool."""
+        if self._session is not None:
+            session, self._session = self._session, None
+            await _session_pool.release(session)
+
 
 if __name__ == "__main__":
     bash = Bash()
@@ -0,0 +1,320 @@
+"""Process-wide pool of browsers shared by all BrowserUseTool instances."""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from browser_use import Browser as BrowserUseBrowser
+from browser_use import BrowserConfig
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+
+from app.config import BrowserSettings, ResourcePolicySettings, config
+from app.logger import logger
+
+
+def _browser_config_kwargs(settings: Optional[BrowserSettings]) -> dict:
+    """Translate our browser settings into browser_use BrowserConfig arguments."""
+    browser_config_kwargs = {"headless": False}
+    if not settings:
+        return browser_config_kwargs
+
+    from browser_use.browser.browser import ProxySettings
+
+    # handle proxy settings.
+    if settings.proxy and settings.proxy.server:
+        browser_config_kwargs["proxy"] = ProxySettings(
+            server=settings.proxy.server,
+            username=settings.proxy.username,
+            password=settings.proxy.password,
+        )
+
+    browser_attrs = [
+        "headless",
+        "disable_security",
+        "extra_chromium_args",
+        "chrome_instance_path",
+        "wss_url",
+        "cdp_url",
+    ]
+
+    for attr in browser_attrs:
+        value = getattr(settings, attr, None)
+        if value is not None:
+            if not isinstance(value, list) or value:
+                browser_config_kwargs[attr] = value
+
+    return browser_config_kwargs
+
+
+def _domain_matches(host: str, domains: List[str]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class ResourceFilter:
+    """Playwright route handler enforcing a resource policy on one context."""
+
+    def __init__(self, policy: ResourcePolicySettings):
+        self.policy = policy
+        self.active = True
+        self.blocked = 0
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        host = (urlparse(url).hostname or "").lower()
+        if _domain_matches(host, self.policy.block_domains):
+            return True
+        if resource_type == "document" or _domain_matches(
+            host, self.policy.allow_domains
+        ):
+            return False
+        if self.policy.allow_resource_types:
+            return resource_type not in self.policy.allow_resource_types
+        return resource_type in self.policy.block_resource_types
+
+    async def handle(self, route) -> None:
+        request = route.request
+        if self.active and self.should_block(request.resource_type, request.url):
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    @asynccontextmanager
+    async def suspended(self):
+        """Let every request through while the block is active."""
+        previous, self.active = self.active, False
+        try:
+            yield
+        finally:
+            self.active = previous
+
+
+class _PooledBrowser:
+    """One browser process and the leases currently using it."""
+
+    def __init__(self, browser: BrowserUseBrowser):
+        self.browser = browser
+        self.leases: set = set()
+        self.idle_since = time.monotonic()
+
+    @property
+    def connected(self) -> bool:
+        playwright_browser = self.browser.playwright_browser
+        # Chromium is launched lazily by the first context that needs it.
+        return playwright_browser is None or playwright_browser.is_connected()
+
+    def kill(self) -> None:
+        """
+        Kill the Playwright driver process without awaiting anything, for when
+        the browser's event loop is gone. Chromium talks to the driver over a
+        pipe and exits once the driver does.
+        """
+        playwright = getattr(self.browser, "playwright", None)
+        connection = getattr(playwright, "_connection", None)
+        process = getattr(getattr(connection, "_transport", None), "_proc", None)
+        if process is None or process.returncode is not None:
+            return
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+class BrowserLease:
+    """An isolated browser context leased to a single tool instance."""
+
+    def __init__(
+        self, pool: "BrowserPool", entry: _PooledBrowser, context: BrowserContext
+    ):
+        self.context = context
+        self.resource_filter: Optional[ResourceFilter] = None
+        self.closed = False
+        self.last_used = time.monotonic()
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def alive(self) -> bool:
+        return not self.closed and self._entry.connected
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    async def release(self) -> None:
+        await self._pool.release(self)
+
+    @asynccontextmanager
+    async def all_resources(self):
+        """Temporarily lift the resource policy, e.g. for a screenshot."""
+        if self.resource_filter is None:
+            yield
+        else:
+            async with self.resource_filter.suspended():
+                yield
+
+
+class BrowserPool:
+    """
+    A capped set of browser processes handing out per-session contexts.
+
+    Contexts are spread over at most `max_browsers` processes, a new process being
+    launched only once every existing one serves `max_contexts_per_browser`
+    contexts. That cap is a soft preference: once `max_browsers` processes run,
+    further contexts go to the least loaded one rather than waiting for a slot.
+    A background reaper closes contexts unused for `idle_timeout` seconds and
+    browsers left without contexts, and browsers that crashed or disconnected
+    are discarded so their sessions get a fresh context on next use.
+    When the settings carry a resource policy, every context routes its requests
+    through a ResourceFilter.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[BrowserSettings] = None,
+        max_browsers: int = 1,
+        max_contexts_per_browser: int = 10,
+        idle_timeout: float = 600,
+    ):
+        self.settings = settings
+        self.max_browsers = max(1, max_browsers)
+        self.max_contexts_per_browser = max(1, max_contexts_per_browser)
+        self.idle_timeout = idle_timeout
+        self._browsers: List[_PooledBrowser] = []
+        self._lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reaper: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls) -> "BrowserPool":
+        settings = config.browser_config or BrowserSettings()
+        return cls(
+            settings=config.browser_config,
+            max_browsers=settings.max_browsers,
+            max_contexts_per_browser=settings.max_contexts_per_browser,
+            idle_timeout=settings.context_idle_timeout,
+        )
+
+    def _check_loop(self) -> None:
+        """Kill and forget browsers created under another (maybe closed) event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # They cannot be closed from this loop, only killed.
+            for entry in self._browsers:
+                entry.kill()
+            self._browsers = []
+            if self._reaper is not None and not self._reaper.done():
+                try:
+                    self._reaper.cancel()
+                except RuntimeError:  # its loop is already closed
+                    pass
+            self._reaper = None
+            self._loop = loop
+
+    def _new_context_config(self) -> BrowserContextConfig:
+        # if there is context config in the config, use it.
+        if self.settings and getattr(self.settings, "new_context_config", None):
+            return self.settings.new_context_config
+        return BrowserContextConfig()
+
+    async def lease(self) -> BrowserLease:
+        """Lease a fresh context on the least loaded healthy browser."""
+        async with self._lock:
+            self._check_loop()
+            await self._discard_disconnected()
+
+            entry = min(self._browsers, key=lambda b: len(b.leases), default=None)
+            if entry is None or (
+                len(entry.leases) >= self.max_contexts_per_browser
+                and len(self._browsers) < self.max_browsers
+            ):
+                browser_config = BrowserConfig(**_browser_config_kwargs(self.settings))
+                entry = _PooledBrowser(BrowserUseBrowser(browser_config))
+                self._browsers.append(entry)
+                logger.info(f"Browser pool launched browser {len(self._browsers)}")
+
+            context = await entry.browser.new_context(self._new_context_config())
+            lease = BrowserLease(self, entry, context)
+            entry.leases.add(lease)
+
+            if self._reaper is None or self._reaper.done():
+                self._reaper = asyncio.create_task(self._reap_loop())
+
+        # Outside the lock: the session launches the browser if it is not running
+        if self.settings and self.settings.resource_policy:
+            lease.resource_filter = ResourceFilter(self.settings.resource_policy)
+            try:
+                session = await context.get_session()
+                await session.context.route("**/*", lease.resource_filter.handle)
+            except Exception:
+                await self.release(lease)
+                raise
+        return lease
+
+    async def release(self, lease: BrowserLease) -> None:
+        """Close a leased context and return its slot to the pool."""
+        if lease.closed:
+            return
+        lease.closed = True
+        entry = lease._entry
+        entry.leases.discard(lease)
+        if not entry.leases:
+            entry.idle_since = time.monotonic()
+        try:
+            await lease.context.close()
+        except Exception as e:
+            logger.debug(f"Error closing browser context: {e}")
+
+    async def _close_browser(self, entry: _PooledBrowser) -> None:
+        for lease in list(entry.leases):
+            lease.closed = True
+        entry.leases.clear()
+        try:
+            await entry.browser.close()
+        except Exception as e:
+            logger.debug(f"Error closing browser: {e}")
+
+    async def _discard_disconnected(self) -> None:
+        for entry in [b for b in self._browsers if not b.connected]:
+            logger.warning("Browser pool discarding a crashed or disconnected browser")
+            self._browsers.remove(entry)
+            await self._close_browser(entry)
+
+    async def _reap_loop(self) -> None:
+        while self._browsers:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            await self.reap()
+
+    async def reap(self) -> None:
+        """Close idle contexts, browsers without contexts and crashed browsers."""
+        now = time.monotonic()
+        async with self._lock:
+            await self._discard_disconnected()
+            for entry in list(self._browsers):
+                for lease in list(entry.leases):
+                    if now - lease.last_used > self.idle_timeout:
+                        await self.release(lease)
+                if not entry.leases and now - entry.idle_since > self.idle_timeout:
+                    self._browsers.remove(entry)
+                    await self._close_browser(entry)
+
+    async def close(self) -> None:
+        """Close every browser in the pool."""
+        async with self._lock:
+            browsers, self._browsers = self._browsers, []
+            for entry in browsers:
+                await self._close_browser(entry)
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+
+
+_browser_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the process-wide browser pool, creating it from config on first use."""
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool.from_config()
+    return _browser_pool
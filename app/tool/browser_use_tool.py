@@ -1,16 +1,23 @@
 import asyncio
+import base64
+import io
 import json
-from typing import Optional
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
 
-from browser_use import Browser as BrowserUseBrowser
-from browser_use import BrowserConfig
-from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from browser_use.browser.context import BrowserContext
 from browser_use.dom.service import DomService
+from PIL import Image
 from pydantic import Field, field_validator
 from pydantic_core.core_schema import ValidationInfo
 
-from app.config import config
+from app.config import WORKSPACE_ROOT, BrowserSettings, config
+from app.logger import logger
 from app.tool.base import BaseTool, ToolResult
+from app.tool.browser_pool import BrowserLease, get_browser_pool
+from app.tool.dom_snapshot import DomSnapshot, diff_snapshots
 
 
 MAX_LENGTH = 2000
@@ -21,7 +28,7 @@ content extraction, and tab management. Supported actions include:
 - 'navigate': Go to a specific URL
 - 'click': Click an element by index
 - 'input_text': Input text into an element
-- 'screenshot': Capture a screenshot
+- 'screenshot': Capture a screenshot and save it as an image file
 - 'get_html': Get page HTML content
 - 'get_text': Get text content of the page
 - 'read_links': Get all links on the page
@@ -31,9 +38,33 @@ content extraction, and tab management. Supported actions include:
 - 'new_tab': Open a new tab
 - 'close_tab': Close the current tab
 - 'refresh': Refresh the current page
+- 'get_state': Get the URL, tabs and interactive elements of the current tab; after the first call only the elements that changed are listed, unless 'full_refresh' is set
 """
 
 
+def compress_screenshot(
+    png: bytes, max_width: int, max_height: int, quality: int
+) -> Tuple[bytes, Tuple[int, int], bool]:
+    """
+    Downscale a PNG screenshot to `max_width`, cut it off at `max_height` and
+    recompress it as JPEG.
+
+    Returns:
+        The JPEG bytes, the final (width, height) and whether it was cut off.
+    """
+    with Image.open(io.BytesIO(png)) as image:
+        image = image.convert("RGB")
+        if image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+        cropped = image.height > max_height
+        if cropped:
+            image = image.crop((0, 0, image.width, max_height))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue(), image.size, cropped
+
+
 class BrowserUseTool(BaseTool):
     name: str = "browser_use"
     description: str = _BROWSER_DESCRIPTION
@@ -55,6 +86,7 @@ class BrowserUseTool(BaseTool):
                     "new_tab",
                     "close_tab",
                     "refresh",
+                    "get_state",
                 ],
                 "description": "The browser action to perform",
             },
@@ -79,6 +111,14 @@ class BrowserUseTool(BaseTool):
                 "type": "integer",
                 "description": "Tab ID for 'switch_tab' action",
             },
+            "load_all_resources": {
+                "type": "boolean",
+                "description": "Load images, fonts and media that are normally blocked for this action. Use with 'screenshot' (the page is reloaded first) or when a page needs them to work.",
+            },
+            "full_refresh": {
+                "type": "boolean",
+                "description": "Return the complete element list for 'get_state' instead of the changes since the last call",
+            },
         },
         "required": ["action"],
         "dependencies": {
@@ -93,9 +133,18 @@ class BrowserUseTool(BaseTool):
     }
 
     lock: asyncio.Lock = Field(default_factory=asyncio.Lock)
-    browser: Optional[BrowserUseBrowser] = Field(default=None, exclude=True)
     context: Optional[BrowserContext] = Field(default=None, exclude=True)
     dom_service: Optional[DomService] = Field(default=None, exclude=True)
+    # Screenshots of this tool instance (one per session) are written here.
+    artifact_dir: Path = Field(
+        default_factory=lambda: WORKSPACE_ROOT / "artifacts" / uuid.uuid4().hex
+    )
+
+    _lease: Optional[BrowserLease] = None
+    _screenshot_count: int = 0
+    _inline_image_bytes: int = 0
+    # Last element-tree snapshot of each open tab, keyed by page identity.
+    _dom_snapshots: Dict[int, DomSnapshot] = {}
 
     @field_validator("parameters", mode="before")
     def validate_parameters(cls, v: dict, info: ValidationInfo) -> dict:
@@ -104,52 +153,21 @@ class BrowserUseTool(BaseTool):
         return v
 
     async def _ensure_browser_initialized(self) -> BrowserContext:
-        """Ensure browser and context are initialized."""
-        if self.browser is None:
-            browser_config_kwargs = {"headless": False}
-
-            if config.browser_config:
-                from browser_use.browser.browser import ProxySettings
-
-                # handle proxy settings.
-                if config.browser_config.proxy and config.browser_config.proxy.server:
-                    browser_config_kwargs["proxy"] = ProxySettings(
-                        server=config.browser_config.proxy.server,
-                        username=config.browser_config.proxy.username,
-                        password=config.browser_config.proxy.password,
-                    )
-
-                browser_attrs = [
-                    "headless",
-                    "disable_security",
-                    "extra_chromium_args",
-                    "chrome_instance_path",
-                    "wss_url",
-                    "cdp_url",
-                ]
-
-                for attr in browser_attrs:
-                    value = getattr(config.browser_config, attr, None)
-                    if value is not None:
-                        if not isinstance(value, list) or value:
-                            browser_config_kwargs[attr] = value
-
-            self.browser = BrowserUseBrowser(BrowserConfig(**browser_config_kwargs))
-
-        if self.context is None:
-            context_config = BrowserContextConfig()
-
-            # if there is context config in the config, use it.
-            if (
-                config.browser_config
-                and hasattr(config.browser_config, "new_context_config")
-                and config.browser_config.new_context_config
-            ):
-                context_config = config.browser_config.new_context_config
-
-            self.context = await self.browser.new_context(context_config)
+        """Ensure this tool holds a live context leased from the browser pool."""
+        if self._lease is not None and not self._lease.alive:
+            # The context was reaped for idleness or its browser crashed.
+            await self._lease.release()
+            self._lease = None
+            self.context = None
+            self.dom_service = None
+            self._dom_snapshots = {}
+
+        if self._lease is None:
+            self._lease = await get_browser_pool().lease()
+            self.context = self._lease.context
             self.dom_service = DomService(await self.context.get_current_page())
 
+        self._lease.touch()
         return self.context
 
     async def execute(
@@ -161,6 +179,8 @@ class BrowserUseTool(BaseTool):
         script: Optional[str] = None,
         scroll_amount: Optional[int] = None,
         tab_id: Optional[int] = None,
+        load_all_resources: bool = False,
+        full_refresh: bool = False,
         **kwargs,
     ) -> ToolResult:
         """
@@ -174,6 +194,8 @@ class BrowserUseTool(BaseTool):
             script: JavaScript code for execution
             scroll_amount: Pixels to scroll for scroll action
             tab_id: Tab ID for switch_tab action
+            load_all_resources: Lift the resource policy for this action
+            full_refresh: Return the full element list for get_state
             **kwargs: Additional arguments
 
         Returns:
@@ -182,144 +204,259 @@ class BrowserUseTool(BaseTool):
         async with self.lock:
             try:
                 context = await self._ensure_browser_initialized()
+                action_args = dict(
+                    url=url,
+                    index=index,
+                    text=text,
+                    script=script,
+                    scroll_amount=scroll_amount,
+                    tab_id=tab_id,
+                    full_refresh=full_refresh,
+                )
+
+                if load_all_resources:
+                    async with self._lease.all_resources():
+                        if action == "screenshot":
+                            # Reload so the previously blocked resources are drawn.
+                            await context.refresh_page()
+                        return await self._run_action(context, action, **action_args)
+                return await self._run_action(context, action, **action_args)
 
-                if action == "navigate":
-                    if not url:
-                        return ToolResult(error="URL is required for 'navigate' action")
-                    await context.navigate_to(url)
-                    return ToolResult(output=f"Navigated to {url}")
-
-                elif action == "click":
-                    if index is None:
-                        return ToolResult(error="Index is required for 'click' action")
-                    element = await context.get_dom_element_by_index(index)
-                    if not element:
-                        return ToolResult(error=f"Element with index {index} not found")
-                    download_path = await context._click_element_node(element)
-                    output = f"Clicked element at index {index}"
-                    if download_path:
-                        output += f" - Downloaded file to {download_path}"
-                    return ToolResult(output=output)
-
-                elif action == "input_text":
-                    if index is None or not text:
-                        return ToolResult(
-                            error="Index and text are required for 'input_text' action"
-                        )
-                    element = await context.get_dom_element_by_index(index)
-                    if not element:
-                        return ToolResult(error=f"Element with index {index} not found")
-                    await context._input_text_element_node(element, text)
-                    return ToolResult(
-                        output=f"Input '{text}' into element at index {index}"
-                    )
-
-                elif action == "screenshot":
-                    screenshot = await context.take_screenshot(full_page=True)
-                    return ToolResult(
-                        output=f"Screenshot captured (base64 length: {len(screenshot)})",
-                        system=screenshot,
-                    )
-
-                elif action == "get_html":
-                    html = await context.get_page_html()
-                    truncated = (
-                        html[:MAX_LENGTH] + "..." if len(html) > MAX_LENGTH else html
-                    )
-                    return ToolResult(output=truncated)
-
-                elif action == "get_text":
-                    text = await context.execute_javascript("document.body.innerText")
-                    return ToolResult(output=text)
-
-                elif action == "read_links":
-                    links = await context.execute_javascript(
-                        "document.querySelectorAll('a[href]').forEach((elem) => {if (elem.innerText) {console.log(elem.innerText, elem.href)}})"
-                    )
-                    return ToolResult(output=links)
-
-                elif action == "execute_js":
-                    if not script:
-                        return ToolResult(
-                            error="Script is required for 'execute_js' action"
-                        )
-                    result = await context.execute_javascript(script)
-                    return ToolResult(output=str(result))
-
-                elif action == "scroll":
-                    if scroll_amount is None:
-                        return ToolResult(
-                            error="Scroll amount is required for 'scroll' action"
-                        )
-                    await context.execute_javascript(
-                        f"window.scrollBy(0, {scroll_amount});"
-                    )
-                    direction = "down" if scroll_amount > 0 else "up"
+            except Exception as e:
+                if self._lease is not None and not self._lease.alive:
                     return ToolResult(
-                        output=f"Scrolled {direction} by {abs(scroll_amount)} pixels"
+                        error=f"Browser action '{action}' failed because the browser crashed: {str(e)}. A fresh browser context will be used for the next action."
                     )
-
-                elif action == "switch_tab":
-                    if tab_id is None:
-                        return ToolResult(
-                            error="Tab ID is required for 'switch_tab' action"
-                        )
-                    await context.switch_to_tab(tab_id)
-                    return ToolResult(output=f"Switched to tab {tab_id}")
-
-                elif action == "new_tab":
-                    if not url:
-                        return ToolResult(error="URL is required for 'new_tab' action")
-                    await context.create_new_tab(url)
-                    return ToolResult(output=f"Opened new tab with URL {url}")
-
-                elif action == "close_tab":
-                    await context.close_current_tab()
-                    return ToolResult(output="Closed current tab")
-
-                elif action == "refresh":
-                    await context.refresh_page()
-                    return ToolResult(output="Refreshed current page")
-
-                else:
-                    return ToolResult(error=f"Unknown action: {action}")
-
-            except Exception as e:
                 return ToolResult(error=f"Browser action '{action}' failed: {str(e)}")
 
-    async def get_current_state(self) -> ToolResult:
+    async def _run_action(
+        self,
+        context: BrowserContext,
+        action: str,
+        url: Optional[str] = None,
+        index: Optional[int] = None,
+        text: Optional[str] = None,
+        script: Optional[str] = None,
+        scroll_amount: Optional[int] = None,
+        tab_id: Optional[int] = None,
+        full_refresh: bool = False,
+    ) -> ToolResult:
+        """Dispatch a single browser action on the given context."""
+        if action == "navigate":
+            if not url:
+                return ToolResult(error="URL is required for 'navigate' action")
+            await context.navigate_to(url)
+            return ToolResult(output=f"Navigated to {url}")
+
+        elif action == "click":
+            if index is None:
+                return ToolResult(error="Index is required for 'click' action")
+            element = await context.get_dom_element_by_index(index)
+            if not element:
+                return ToolResult(error=f"Element with index {index} not found")
+            download_path = await context._click_element_node(element)
+            output = f"Clicked element at index {index}"
+            if download_path:
+                output += f" - Downloaded file to {download_path}"
+            return ToolResult(output=output)
+
+        elif action == "input_text":
+            if index is None or not text:
+                return ToolResult(
+                    error="Index and text are required for 'input_text' action"
+                )
+            element = await context.get_dom_element_by_index(index)
+            if not element:
+                return ToolResult(error=f"Element with index {index} not found")
+            await context._input_text_element_node(element, text)
+            return ToolResult(
+                output=f"Input '{text}' into element at index {index}"
+            )
+
+        elif action == "screenshot":
+            page = await context.get_current_page()
+            await page.bring_to_front()
+            await page.wait_for_load_state()
+            png = await page.screenshot(full_page=True, animations="disabled")
+            return await self._save_screenshot(png)
+
+        elif action == "get_html":
+            html = await context.get_page_html()
+            truncated = (
+                html[:MAX_LENGTH] + "..." if len(html) > MAX_LENGTH else html
+            )
+            return ToolResult(output=truncated)
+
+        elif action == "get_text":
+            text = await context.execute_javascript("document.body.innerText")
+            return ToolResult(output=text)
+
+        elif action == "read_links":
+            links = await context.execute_javascript(
+                "document.querySelectorAll('a[href]').forEach((elem) => {if (elem.innerText) {console.log(elem.innerText, elem.href)}})"
+            )
+            return ToolResult(output=links)
+
+        elif action == "execute_js":
+            if not script:
+                return ToolResult(
+                    error="Script is required for 'execute_js' action"
+                )
+            result = await context.execute_javascript(script)
+            return ToolResult(output=str(result))
+
+        elif action == "scroll":
+            if scroll_amount is None:
+                return ToolResult(
+                    error="Scroll amount is required for 'scroll' action"
+                )
+            await context.execute_javascript(
+                f"window.scrollBy(0, {scroll_amount});"
+            )
+            direction = "down" if scroll_amount > 0 else "up"
+            return ToolResult(
+                output=f"Scrolled {direction} by {abs(scroll_amount)} pixels"
+            )
+
+        elif action == "switch_tab":
+            if tab_id is None:
+                return ToolResult(
+                    error="Tab ID is required for 'switch_tab' action"
+                )
+            await context.switch_to_tab(tab_id)
+            return ToolResult(output=f"Switched to tab {tab_id}")
+
+        elif action == "new_tab":
+            if not url:
+                return ToolResult(error="URL is required for 'new_tab' action")
+            await context.create_new_tab(url)
+            return ToolResult(output=f"Opened new tab with URL {url}")
+
+        elif action == "close_tab":
+            await context.close_current_tab()
+            return ToolResult(output="Closed current tab")
+
+        elif action == "refresh":
+            await context.refresh_page()
+            return ToolResult(output="Refreshed current page")
+
+        elif action == "get_state":
+            return await self._get_state(context, full_refresh)
+
+        else:
+            return ToolResult(error=f"Unknown action: {action}")
+
+    async def _save_screenshot(self, png: bytes) -> ToolResult:
+        """
+        Compress a screenshot into the artifact directory and reference it by
+        id and path; the image itself is attached only within the inline budget.
+        """
+        settings = config.browser_config or BrowserSettings()
+        data, (width, height), cropped = await asyncio.to_thread(
+            compress_screenshot,
+            png,
+            settings.screenshot_max_width,
+            settings.screenshot_max_height,
+            settings.screenshot_quality,
+        )
+
+        self._screenshot_count += 1
+        screenshot_id = f"screenshot-{self._screenshot_count:04d}"
+        path = self.artifact_dir / f"{screenshot_id}.jpg"
+        self.artifact_dir.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(path.write_bytes, data)
+        self._prune_screenshots(settings.screenshot_keep)
+
+        output = (
+            f"Screenshot {screenshot_id} saved to {path} "
+            f"({width}x{height}, {len(data) // 1024} KB)"
+        )
+        if cropped:
+            output += ", cut off below the height limit"
+
+        base64_image = None
+        encoded_size = (len(data) + 2) // 3 * 4
+        budget = settings.screenshot_inline_budget_kb * 1024
+        if self._inline_image_bytes + encoded_size <= budget:
+            base64_image = base64.b64encode(data).decode("ascii")
+            self._inline_image_bytes += encoded_size
+            output += ", attached for viewing"
+        return ToolResult(output=output, base64_image=base64_image)
+
+    def _prune_screenshots(self, keep: int) -> None:
+        """Delete the oldest screenshots beyond the `keep` most recent ones."""
+        screenshots = sorted(self.artifact_dir.glob("screenshot-*.jpg"))
+        for path in screenshots[: max(0, len(screenshots) - keep)]:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.debug(f"Could not delete old screenshot {path}: {e}")
+
+    async def get_current_state(self, full_refresh: bool = False) -> ToolResult:
         """Get the current browser state as a ToolResult."""
         async with self.lock:
             try:
                 context = await self._ensure_browser_initialized()
-                state = await context.get_state()
-                state_info = {
-                    "url": state.url,
-                    "title": state.title,
-                    "tabs": [tab.model_dump() for tab in state.tabs],
-                    "interactive_elements": state.element_tree.clickable_elements_to_string(),
-                }
-                return ToolResult(output=json.dumps(state_info))
+                return await self._get_state(context, full_refresh)
             except Exception as e:
                 return ToolResult(error=f"Failed to get browser state: {str(e)}")
 
+    async def _get_state(
+        self, context: BrowserContext, full_refresh: bool = False
+    ) -> ToolResult:
+        """
+        Describe the current tab, listing only the interactive elements and text
+        that changed since the tab's previous snapshot when that is shorter.
+        """
+        state = await context.get_state()
+        snapshot = DomSnapshot(
+            state.url,
+            state.element_tree.clickable_elements_to_string(),
+            getattr(state, "selector_map", None),
+        )
+
+        page = await context.get_current_page()
+        session = await context.get_session()
+        open_pages = {id(p) for p in session.context.pages}
+        self._dom_snapshots = {
+            k: v for k, v in self._dom_snapshots.items() if k in open_pages
+        }
+        previous = self._dom_snapshots.get(id(page))
+        self._dom_snapshots[id(page)] = snapshot
+
+        state_info = {
+            "url": state.url,
+            "title": state.title,
+            "tabs": [tab.model_dump() for tab in state.tabs],
+        }
+        diff = None
+        if not full_refresh and previous is not None and previous.url == state.url:
+            diff = diff_snapshots(previous, snapshot)
+        if diff is not None and len(diff) < len(snapshot.tree):
+            state_info["interactive_elements_changes"] = diff
+        else:
+            state_info["interactive_elements"] = snapshot.tree
+        return ToolResult(output=json.dumps(state_info))
+
     async def cleanup(self):
-        """Clean up browser resources."""
+        """Return the leased browser context to the pool."""
         async with self.lock:
-            if self.context is not None:
-                await self.context.close()
-                self.context = None
-                self.dom_service = None
-            if self.browser is not None:
-                await self.browser.close()
-                self.browser = None
-
-    def __del__(self):
-        """Ensure cleanup when object is destroyed."""
-        if self.browser is not None or self.context is not None:
-            try:
-                asyncio.run(self.cleanup())
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                loop.run_until_complete(self.cleanup())
-                loop.close()
\ No newline at end of file
+            if self._lease is not None:
+                await self._lease.release()
+                self._lease = None
+            self.context = None
+            self.dom_service = None
+            self._dom_snapshots = {}
+
+    def clone(self) -> "BrowserUseTool":
+        clone = super().clone()
+        clone.lock = asyncio.Lock()
+        clone.context = None
+        clone.dom_service = None
+        # Under this tool's directory, so they are removed along with it
+        clone.artifact_dir = self.artifact_dir / uuid.uuid4().hex
+        return clone
+
+    def remove_artifacts(self) -> None:
+        """Delete the screenshots of this tool, e.g. when its session ends."""
+        shutil.rmtree(self.artifact_dir, ignore_errors=True)
@@ -0,0 +1,353 @@
+"""Workspace code search backed by an incrementally maintained trigram index."""
+
+import asyncio
+import fnmatch
+import os
+import re
+from array import array
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.exceptions import ToolError
+from app.logger import logger
+from app.tool.base import BaseTool, CLIResult
+from app.tool.workspace import WorkspaceIndex, get_workspace_index
+
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+
+# Larger files are not indexed; they are scanned on every search instead.
+MAX_INDEXED_FILE_BYTES = 2 * 1024 * 1024
+# Beyond these totals an index drops its trigrams and every search scans the
+# files instead, so that huge trees (or "/") cannot exhaust memory.
+MAX_INDEXED_FILES = 50_000
+MAX_INDEXED_BYTES = 256 * 1024 * 1024
+MAX_LINE_CHARS = 300
+
+
+def _trigrams(data: bytes) -> Set[bytes]:
+    return {data[i : i + 3] for i in range(len(data) - 2)}
+
+
+def _required_literals(pattern: str, flags: int) -> List[str]:
+    """
+    Literal runs every match of `pattern` must contain, used to prefilter
+    candidate files; empty when nothing can be required (e.g. alternations).
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return []
+    literals, run = [], []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value))
+            continue
+        if op is sre_parse.BRANCH:
+            return []
+        if run:
+            literals.append("".join(run))
+            run = []
+    if run:
+        literals.append("".join(run))
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+class _FileEntry(NamedTuple):
+    # None when the file is not indexed (too large, or the index is over
+    # budget) and must always be scanned.
+    trigram_ids: Optional[array]
+    binary: bool = False
+    size: int = 0
+
+
+class _TrigramIndex(WorkspaceIndex):
+    """
+    Trigram postings of the text files under one root directory.
+
+    Trigrams are taken from the lowercased bytes so that one index serves both
+    case-sensitive and case-insensitive searches. Postings are arrays of file
+    ids; the ids of removed or changed files are left in them until stale
+    entries outnumber live ones, then the postings are rebuilt.
+    """
+
+    def __init__(self, root: Path):
+        super().__init__(root)
+        self._trigram_ids: Dict[bytes, int] = {}
+        self._postings: List[array] = []
+        self._file_ids: Dict[str, int] = {}
+        self._paths: List[Optional[str]] = []
+        self._files: Dict[int, _FileEntry] = {}
+        self._live_postings = 0
+        self._stale_postings = 0
+        self._indexed_bytes = 0
+        self.over_budget = False
+
+    def _remove(self, file_id: int) -> None:
+        entry = self._files.pop(file_id)
+        if entry.trigram_ids:
+            self._live_postings -= len(entry.trigram_ids)
+            self._stale_postings += len(entry.trigram_ids)
+        self._indexed_bytes -= entry.size
+
+    def _compact(self) -> None:
+        """Rebuild the postings without the entries of removed files."""
+        self._postings = [array("I") for _ in self._postings]
+        for file_id, entry in self._files.items():
+            for trigram_id in entry.trigram_ids or ():
+                self._postings[trigram_id].append(file_id)
+        self._stale_postings = 0
+
+    def _drop_trigrams(self) -> None:
+        logger.info(
+            f"Code search index of {self.root} is over budget "
+            f"({MAX_INDEXED_FILES} files, {MAX_INDEXED_BYTES} bytes); "
+            "searches will scan the files"
+        )
+        self.over_budget = True
+        self._trigram_ids.clear()
+        self._postings = []
+        self._live_postings = self._stale_postings = self._indexed_bytes = 0
+        for file_id, entry in self._files.items():
+            self._files[file_id] = _FileEntry(None, entry.binary)
+
+    def update_file(self, path: str, stat: os.stat_result) -> None:
+        # A changed file gets a new id, so its stale postings cannot match it.
+        old_id = self._file_ids.get(path)
+        if old_id is not None:
+            if old_id in self._files:
+                self._remove(old_id)
+            self._paths[old_id] = None
+        file_id = self._file_ids[path] = len(self._paths)
+        self._paths.append(path)
+
+        if not self.over_budget and (
+            len(self._files) >= MAX_INDEXED_FILES
+            or self._indexed_bytes + stat.st_size > MAX_INDEXED_BYTES
+        ):
+            self._drop_trigrams()
+        if self.over_budget:
+            # Binary files are recognized when searched.
+            self._files[file_id] = _FileEntry(None)
+            return
+
+        if stat.st_size > MAX_INDEXED_FILE_BYTES:
+            with open(path, "rb") as f:
+                binary = b"\0" in f.read(8192)
+            self._files[file_id] = _FileEntry(None, binary)
+            return
+
+        with open(path, "rb") as f:
+            data = f.read()
+        if b"\0" in data[:8192]:
+            self._files[file_id] = _FileEntry(array("I"), True)
+            return
+        trigram_ids = array("I")
+        for trigram in _trigrams(data.lower()):
+            trigram_id = self._trigram_ids.get(trigram)
+            if trigram_id is None:
+                trigram_id = len(self._postings)
+                self._trigram_ids[trigram] = trigram_id
+                self._postings.append(array("I"))
+            self._postings[trigram_id].append(file_id)
+            trigram_ids.append(trigram_id)
+        self._files[file_id] = _FileEntry(trigram_ids, size=len(data))
+        self._indexed_bytes += len(data)
+        self._live_postings += len(trigram_ids)
+        if self._stale_postings > max(self._live_postings, 1 << 16):
+            self._compact()
+
+    def remove_file(self, path: str) -> None:
+        file_id = self._file_ids.pop(path)
+        if file_id in self._files:
+            self._remove(file_id)
+        self._paths[file_id] = None
+
+    def candidates(self, literals: List[str]) -> List[str]:
+        """Text files that may contain every literal, in path order."""
+        file_ids: Optional[Set[int]] = None
+        # The index folds ASCII case only, like bytes.lower().
+        trigrams = set().union(
+            *(_trigrams(literal.encode().lower()) for literal in literals)
+        )
+        if trigrams and not self.over_budget:
+            trigram_ids = [self._trigram_ids.get(trigram) for trigram in trigrams]
+            if None in trigram_ids:
+                file_ids = set()
+            else:
+                # Intersect starting from the shortest postings.
+                postings = sorted(
+                    (self._postings[trigram_id] for trigram_id in trigram_ids),
+                    key=len,
+                )
+                file_ids = set(postings[0])
+                for posting in postings[1:]:
+                    if not file_ids:
+                        break
+                    file_ids.intersection_update(posting)
+                # Postings may still list the ids of removed files.
+                file_ids = {fid for fid in file_ids if fid in self._files}
+        if file_ids is None:
+            file_ids = {fid for fid, e in self._files.items() if not e.binary}
+        else:
+            # Files too large to index can never be ruled out.
+            file_ids |= {
+                fid
+                for fid, e in self._files.items()
+                if e.trigram_ids is None and not e.binary
+            }
+        return sorted(self._paths[fid] for fid in file_ids)
+
+    def search(
+        self,
+        regex: "re.Pattern",
+        literals: List[str],
+        path_glob: Optional[str],
+        max_results: int,
+        scope: Optional[Path] = None,
+    ) -> Tuple[List[str], int, int]:
+        """
+        Search the files under `scope` (by default the whole root).
+
+        Returns:
+            The "path:line: text" matches (at most `max_results`, with paths
+            relative to `scope`), the total number of matching lines and the
+            number of files read.
+        """
+        scope = scope or self.root
+        prefix = os.path.join(scope, "")
+        with self.lock:
+            self.refresh()
+            candidates = self.candidates(literals)
+
+        matches, total, files_read = [], 0, 0
+        for path in candidates:
+            if not path.startswith(prefix):
+                continue
+            relative = os.path.relpath(path, scope)
+            if path_glob and not (
+                fnmatch.fnmatch(relative, path_glob)
+                or fnmatch.fnmatch(os.path.basename(path), path_glob)
+            ):
+                continue
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+            except OSError:
+                continue
+            files_read += 1
+            if "\0" in text[:8192]:
+                continue
+            # Match the whole text so patterns may span lines; a match is
+            # reported on the line it starts on, once per line.
+            lines, number, position, last_number = None, 1, 0, 0
+            for match in regex.finditer(text):
+                number += text.count("\n", position, match.start())
+                position = match.start()
+                if number == last_number:
+                    continue
+                last_number = number
+                total += 1
+                if len(matches) < max_results:
+                    lines = lines or text.split("\n")
+                    line = lines[number - 1]
+                    matches.append(f"{relative}:{number}: {line[:MAX_LINE_CHARS]}")
+        return matches, total, files_read
+
+
+class CodeSearch(BaseTool):
+    name: str = "code_search"
+    description: str = """Search the contents of the files of a workspace.
+Much faster than grep on large repositories: results come from an index that is kept up to date as files change.
+Returns matching lines as `path:line: text`, with paths relative to the searched directory.
+"""
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "(required) The text to search for, or a Python regular expression when `regex` is true.",
+            },
+            "path": {
+                "type": "string",
+                "description": "(optional) Absolute path of the directory to search. Defaults to the current working directory.",
+            },
+            "regex": {
+                "type": "boolean",
+                "description": "(optional) Treat `query` as a regular expression. Default is false.",
+            },
+            "case_sensitive": {
+                "type": "boolean",
+                "description": "(optional) Match case exactly. Default is true.",
+            },
+            "path_glob": {
+                "type": "string",
+                "description": "(optional) Only search files whose relative path or name matches this glob, e.g. `*.py` or `app/tool/*`.",
+            },
+            "max_results": {
+                "type": "integer",
+                "description": "(optional) Maximum number of matching lines to return. Default is 50.",
+            },
+        },
+        "required": ["query"],
+    }
+
+    async def execute(
+        self,
+        query: str,
+        path: Optional[str] = None,
+        regex: bool = False,
+        case_sensitive: bool = True,
+        path_glob: Optional[str] = None,
+        max_results: int = 50,
+        **kwargs,
+    ) -> CLIResult:
+        """
+        Search the files under `path` for `query`.
+
+        Args:
+            query (str): Literal text or regular expression to search for.
+            path (str, optional): Directory to search, defaults to the cwd.
+            regex (bool): Whether `query` is a regular expression.
+            case_sensitive (bool): Whether to match case exactly.
+            path_glob (str, optional): Glob restricting the searched files.
+            max_results (int): Maximum number of matching lines returned.
+
+        Returns:
+            CLIResult: The matching lines and a summary.
+        """
+        if not query:
+            raise ToolError("Parameter `query` must not be empty")
+        root = Path(path) if path else Path.cwd()
+        if not root.is_dir():
+            raise ToolError(f"The path {root} is not a directory")
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = query if regex else re.escape(query)
+        try:
+            compiled = re.compile(pattern, flags | re.MULTILINE)
+        except re.error as e:
+            raise ToolError(f"Invalid regular expression: {e}") from None
+        literals = _required_literals(pattern, flags) if regex else [query]
+        if not case_sensitive:
+            # Non-ASCII case variants are not folded together in the index.
+            literals = [literal for literal in literals if literal.isascii()]
+
+        matches, total, files_read = await asyncio.to_thread(
+            get_workspace_index(_TrigramIndex, root).search,
+            compiled,
+            literals,
+            path_glob,
+            max_results,
+            root.resolve(),
+        )
+        if not matches:
+            return CLIResult(output=f"No matches for `{query}` in {root}.")
+        summary = f"{total} matches in {root} ({files_read} candidate files read)"
+        if total > len(matches):
+            summary += f", showing the first {len(matches)}"
+        return CLIResult(output=summary + ":\n" + "\n".join(matches))
@@ -1,4 +1,14 @@
-from typing import Any, List, Optional, Type, Union, get_args, get_origin
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    List,
+    Optional,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+)
 
 from pydantic import BaseModel, Field
 
@@ -23,11 +33,21 @@ class CreateChatCompletion(BaseTool):
     response_type: Optional[Type] = None
     required: List[str] = Field(default_factory=lambda: ["response"])
 
+    # Parameters schema of each response type, shared by all instances
+    _schemas: ClassVar[Dict[Any, dict]] = {}
+
     def __init__(self, response_type: Optional[Type] = str):
         """Initialize with a specific response type."""
         super().__init__()
         self.response_type = response_type
-        self.parameters = self._build_parameters()
+        try:
+            schema = self._schemas.get(response_type)
+        except TypeError:  # unhashable type hint
+            schema = self._build_parameters()
+        else:
+            if schema is None:
+                schema = self._schemas[response_type] = self._build_parameters()
+        self.parameters = schema
 
     def _build_parameters(self) -> dict:
         """Build parameters schema based on response type."""
@@ -0,0 +1,93 @@
+"""Snapshots of a page's interactive element tree and the diffs between them."""
+
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+
+# A line of `clickable_elements_to_string()` describing an indexed element,
+# e.g. "\t[12]<button>Submit</button>"; every other line is page text.
+_ELEMENT_LINE = re.compile(r"^\s*\[(\d+)\](.*)$")
+
+
+class DomSnapshot:
+    """The interactive elements and text regions of a page at one point in time."""
+
+    def __init__(self, url: str, tree: str, selector_map: Optional[dict] = None):
+        self.url = url
+        self.tree = tree
+        # element key (xpath when known) -> (highlight index, description)
+        self.elements: Dict[str, Tuple[int, str]] = {}
+        self.texts: Counter = Counter()
+
+        for line in tree.splitlines():
+            match = _ELEMENT_LINE.match(line)
+            if not match:
+                if line.strip():
+                    self.texts[line.strip()] += 1
+                continue
+            index, description = int(match.group(1)), match.group(2).strip()
+            node = (selector_map or {}).get(index)
+            key = getattr(node, "xpath", None) or description
+            # Identical elements without an xpath still need distinct keys.
+            unique_key, n = key, 1
+            while unique_key in self.elements:
+                n += 1
+                unique_key = f"{key}#{n}"
+            self.elements[unique_key] = (index, description)
+
+
+def _describe_renumbering(pairs: List[Tuple[int, int]]) -> List[str]:
+    """Collapse (old, new) index pairs shifted by the same offset into ranges."""
+    runs: List[List[int]] = []  # [first old, last old, offset]
+    for old, new in sorted(pairs):
+        if runs and runs[-1][1] == old - 1 and runs[-1][2] == new - old:
+            runs[-1][1] = old
+        else:
+            runs.append([old, old, new - old])
+    return [
+        f"[{first}] is now [{first + offset}]"
+        if first == last
+        else f"[{first}]..[{last}] are now [{first + offset}]..[{last + offset}]"
+        for first, last, offset in runs
+    ]
+
+
+def diff_snapshots(old: DomSnapshot, new: DomSnapshot) -> str:
+    """
+    Describe what changed between two snapshots of the same page.
+
+    Elements are matched by xpath, so an element that only got a new highlight
+    index is reported as renumbered rather than removed and added again.
+    """
+    added, removed, changed, renumbered = [], [], [], []
+    for key, (index, description) in new.elements.items():
+        if key not in old.elements:
+            added.append(f"[{index}]{description}")
+            continue
+        old_index, old_description = old.elements[key]
+        if description != old_description:
+            changed.append(f"[{index}]{description} (was: {old_description})")
+        elif index != old_index:
+            renumbered.append((old_index, index))
+    for key, (index, description) in old.elements.items():
+        if key not in new.elements:
+            removed.append(f"[{index}]{description}")
+
+    added_text = list((new.texts - old.texts).elements())
+    removed_text = list((old.texts - new.texts).elements())
+
+    sections = [
+        ("Added elements", added),
+        ("Removed elements (old indexes)", removed),
+        ("Changed elements", changed),
+        ("Renumbered elements", _describe_renumbering(renumbered)),
+        ("Added text", added_text),
+        ("Removed text", removed_text),
+    ]
+    lines: List[str] = []
+    for title, entries in sections:
+        if entries:
+            lines.append(f"{title}:")
+            lines.extend(entries)
+    return "\n".join(lines) if lines else "No changes since the last state."
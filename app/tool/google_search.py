@@ -1,9 +1,86 @@
 import asyncio
-from typing import List
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 
-from googlesearch import search
+from pydantic import Field
 
+from app.config import config
+from app.exceptions import ToolError
+from app.logger import logger
 from app.tool.base import BaseTool
+from app.tool.search import SearchBackend, create_search_backend
+
+
+# (backend name, normalized query, number of results)
+_SearchKey = Tuple[str, str, int]
+
+
+class _SearchCache:
+    """An LRU cache of search results that expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[_SearchKey, Tuple[float, Tuple[str, ...]]]" = (
+            OrderedDict()
+        )
+
+    def get(self, key: _SearchKey) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, links = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return list(links)
+
+    def put(self, key: _SearchKey, links: List[str]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, tuple(links))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_cache = _SearchCache(config.search_config.cache_ttl, config.search_config.cache_size)
+_executor: Optional[ThreadPoolExecutor] = None
+_inflight: Dict[_SearchKey, asyncio.Future] = {}
+_inflight_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool dedicated to blocking searches."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=config.search_config.max_workers,
+            thread_name_prefix="google-search",
+        )
+    return _executor
+
+
+def _inflight_searches() -> Dict[_SearchKey, asyncio.Future]:
+    """Return the in-flight searches of the running loop, dropping stale ones."""
+    global _inflight, _inflight_loop
+    loop = asyncio.get_running_loop()
+    if _inflight_loop is not loop:
+        _inflight = {}
+        _inflight_loop = loop
+    return _inflight
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _finish_search(key: _SearchKey, future: asyncio.Future) -> None:
+    if _inflight.get(key) is future:
+        del _inflight[key]
+    if not future.cancelled() and future.exception() is None:
+        _cache.put(key, future.result())
 
 
 class GoogleSearch(BaseTool):
@@ -11,38 +88,86 @@ class GoogleSearch(BaseTool):
     description: str = """Perform a Google search and return a list of relevant links.
 Use this tool when you need to find information on the web, get up-to-date data, or research specific topics.
 The tool returns a list of URLs that match the search query.
+Pass several queries at once with `queries` to get the links of each query in a single call.
 """
     parameters: dict = {
         "type": "object",
         "properties": {
             "query": {
                 "type": "string",
-                "description": "(required) The search query to submit to Google.",
+                "description": "(optional) The search query to submit to Google. Required unless `queries` is given.",
+            },
+            "queries": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "(optional) Several search queries to run concurrently. Results are returned per query.",
             },
             "num_results": {
                 "type": "integer",
-                "description": "(optional) The number of search results to return. Default is 10.",
+                "description": "(optional) The number of search results to return per query. Default is 10.",
                 "default": 10,
             },
         },
-        "required": ["query"],
     }
 
-    async def execute(self, query: str, num_results: int = 10) -> List[str]:
+    backend: SearchBackend = Field(default_factory=create_search_backend)
+
+    async def execute(
+        self,
+        query: Optional[str] = None,
+        num_results: int = 10,
+        queries: Optional[List[str]] = None,
+    ) -> Union[List[str], Dict[str, List[str]]]:
         """
         Execute a Google search and return a list of URLs.
 
+        Results are cached for a while, and identical searches running at the
+        same time share a single request to Google.
+
         Args:
-            query (str): The search query to submit to Google.
+            query (str, optional): The search query to submit to Google.
             num_results (int, optional): The number of search results to return. Default is 10.
+            queries (List[str], optional): Several queries to run concurrently.
 
         Returns:
-            List[str]: A list of URLs matching the search query.
+            List[str]: A list of URLs matching the search query, or, in batch
+            mode, a mapping from each query to its list of URLs.
         """
-        # Run the search in a thread pool to prevent blocking
-        loop = asyncio.get_event_loop()
-        links = await loop.run_in_executor(
-            None, lambda: list(search(query, num_results=num_results))
-        )
+        if queries:
+            queries = list(dict.fromkeys(queries + ([query] if query else [])))
+            results = await asyncio.gather(
+                *(self.search(q, num_results) for q in queries),
+                return_exceptions=True,
+            )
+            links_by_query = {}
+            for q, links in zip(queries, results):
+                if isinstance(links, Exception):
+                    logger.warning(f"Search for '{q}' failed: {links}")
+                    links = []
+                links_by_query[q] = links
+            return links_by_query
+
+        if not query:
+            raise ToolError("Either `query` or `queries` is required")
+        return await self.search(query, num_results)
+
+    async def search(self, query: str, num_results: int = 10) -> List[str]:
+        """Search through the shared cache, coalescing identical in-flight searches."""
+        key = (self.backend.name, normalize_query(query), num_results)
+        links = _cache.get(key)
+        if links is not None:
+            return links
+
+        inflight = _inflight_searches()
+        future = inflight.get(key)
+        if future is None:
+            # Run the search in a dedicated thread pool to prevent blocking
+            future = asyncio.get_running_loop().run_in_executor(
+                _get_executor(), self.backend.search, key[1], num_results
+            )
+            inflight[key] = future
+            future.add_done_callback(lambda f: _finish_search(key, f))
 
-        return links
+        # Shield the shared search so one cancelled caller does not cancel it
+        # for everyone else waiting on it.
+        return list(await asyncio.shield(future))
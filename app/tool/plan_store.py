@@ -0,0 +1,228 @@
+"""Per-session storage of the plans managed by the planning tool."""
+
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import PlanningSettings, config
+from app.logger import logger
+from app.schema import Plan
+
+
+def new_plan_id() -> str:
+    """A plan id that cannot collide with another session's, even within a second."""
+    return f"plan_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+
+class PlanStore(ABC):
+    """
+    The plans of one session, keyed by plan id.
+
+    A plan read from the store may be a copy, depending on the backend, so
+    changes must be written back with `put`. At most `max_plans` plans are
+    kept, the least recently written ones being dropped first, and plans not
+    written for `retention_seconds` expire.
+    """
+
+    def __init__(self, max_plans: int = 50, retention_seconds: int = 86400):
+        self.max_plans = max_plans
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, plan_id: str) -> Optional[Plan]:
+        """The plan with this id, or None."""
+
+    @abstractmethod
+    def put(self, plan_id: str, plan: Plan) -> None:
+        """Create or replace a plan, then apply the retention limits."""
+
+    @abstractmethod
+    def delete(self, plan_id: str) -> bool:
+        """Delete a plan; returns whether it existed."""
+
+    @abstractmethod
+    def items(self) -> List[Tuple[str, Plan]]:
+        """The (plan id, plan) pairs, oldest first."""
+
+    def close(self) -> None:
+        """Release the backend's resources."""
+
+    def __contains__(self, plan_id: object) -> bool:
+        return isinstance(plan_id, str) and self.get(plan_id) is not None
+
+    def __getitem__(self, plan_id: str) -> Plan:
+        plan = self.get(plan_id)
+        if plan is None:
+            raise KeyError(plan_id)
+        return plan
+
+    def __setitem__(self, plan_id: str, plan: Plan) -> None:
+        self.put(plan_id, plan)
+
+    def __delitem__(self, plan_id: str) -> None:
+        if not self.delete(plan_id):
+            raise KeyError(plan_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([plan_id for plan_id, _ in self.items()])
+
+    def __len__(self) -> int:
+        return len(self.items())
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+
+class InMemoryPlanStore(PlanStore):
+    """Plans kept in the process, lost when the session ends."""
+
+    def __init__(self, max_plans: int = 50, retention_seconds: int = 86400):
+        super().__init__(max_plans, retention_seconds)
+        # plan id -> (last write time, plan), least recently written first
+        self._plans: "OrderedDict[str, Tuple[float, Plan]]" = OrderedDict()
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        while self._plans:
+            plan_id, (written_at, _) = next(iter(self._plans.items()))
+            if written_at >= cutoff and len(self._plans) <= self.max_plans:
+                break
+            del self._plans[plan_id]
+
+    def get(self, plan_id: str) -> Optional[Plan]:
+        with self._lock:
+            self._expire()
+            entry = self._plans.get(plan_id)
+            return entry[1] if entry else None
+
+    def put(self, plan_id: str, plan: Plan) -> None:
+        with self._lock:
+            self._plans.pop(plan_id, None)
+            self._plans[plan_id] = (time.time(), plan)
+            self._expire()
+
+    def delete(self, plan_id: str) -> bool:
+        with self._lock:
+            return self._plans.pop(plan_id, None) is not None
+
+    def items(self) -> List[Tuple[str, Plan]]:
+        with self._lock:
+            self._expire()
+            return [(plan_id, plan) for plan_id, (_, plan) in self._plans.items()]
+
+
+class SQLitePlanStore(PlanStore):
+    """
+    Plans persisted in a SQLite database shared by every session.
+
+    Each session only sees its own rows. Expired plans of every session are
+    purged on write, so abandoned sessions do not grow the database forever.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        session_id: str,
+        max_plans: int = 50,
+        retention_seconds: int = 86400,
+    ):
+        super().__init__(max_plans, retention_seconds)
+        self.path = Path(path).expanduser()
+        self.session_id = session_id
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Calls come from the event loop and from worker threads alike.
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False
+        )
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                " session_id TEXT NOT NULL,"
+                " plan_id TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " data TEXT NOT NULL,"
+                " PRIMARY KEY (session_id, plan_id))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS plans_updated_at ON plans (updated_at)"
+            )
+
+    def get(self, plan_id: str) -> Optional[Plan]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM plans"
+                " WHERE session_id = ? AND plan_id = ? AND updated_at >= ?",
+                (self.session_id, plan_id, time.time() - self.retention_seconds),
+            ).fetchone()
+        return Plan.model_validate_json(row[0]) if row else None
+
+    def put(self, plan_id: str, plan: Plan) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?)",
+                (self.session_id, plan_id, now, plan.model_dump_json()),
+            )
+            self._conn.execute(
+                "DELETE FROM plans WHERE updated_at < ?",
+                (now - self.retention_seconds,),
+            )
+            self._conn.execute(
+                "DELETE FROM plans WHERE session_id = ? AND plan_id NOT IN ("
+                " SELECT plan_id FROM plans WHERE session_id = ?"
+                " ORDER BY updated_at DESC LIMIT ?)",
+                (self.session_id, self.session_id, self.max_plans),
+            )
+
+    def delete(self, plan_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM plans WHERE session_id = ? AND plan_id = ?",
+                (self.session_id, plan_id),
+            )
+        return cursor.rowcount > 0
+
+    def items(self) -> List[Tuple[str, Plan]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT plan_id, data FROM plans"
+                " WHERE session_id = ? AND updated_at >= ? ORDER BY updated_at",
+                (self.session_id, time.time() - self.retention_seconds),
+            ).fetchall()
+        return [(plan_id, Plan.model_validate_json(data)) for plan_id, data in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_plan_store(
+    session_id: Optional[str] = None, settings: Optional[PlanningSettings] = None
+) -> PlanStore:
+    """
+    Create the plan store of a session from the `[planning]` configuration.
+
+    Without a session id the store is private to its caller and kept in memory
+    whatever the backend, since nobody could find persisted plans again.
+    """
+    settings = settings or config.planning_config
+    limits: Dict[str, int] = {
+        "max_plans": settings.max_plans,
+        "retention_seconds": settings.retention_seconds,
+    }
+    if session_id is None:
+        return InMemoryPlanStore(**limits)
+    if settings.backend == "sqlite":
+        return SQLitePlanStore(settings.sqlite_path, session_id, **limits)
+    if settings.backend != "memory":
+        logger.warning(
+            f"Unknown planning store backend {settings.backend!r}, using memory"
+        )
+    return InMemoryPlanStore(**limits)
@@ -1,8 +1,12 @@
 # tool/planning.py
-from typing import Dict, List, Literal, Optional
+from typing import List, Literal, Optional
+
+from pydantic import Field
 
 from app.exceptions import ToolError
+from app.schema import Plan, PlanStepStatus
 from app.tool.base import BaseTool, ToolResult
+from app.tool.plan_store import PlanStore, create_plan_store
 
 
 _PLANNING_TOOL_DESCRIPTION = """
@@ -48,6 +52,11 @@ class PlanningTool(BaseTool):
                 "type": "array",
                 "items": {"type": "string"},
             },
+            "step_dependencies": {
+                "description": "For create and update commands: for each step, the indices of the earlier steps it depends on (an empty list for none). Steps whose dependencies are all finished run in parallel. Omit to run the steps one after the other.",
+                "type": "array",
+                "items": {"type": "array", "items": {"type": "integer"}},
+            },
             "step_index": {
                 "description": "Index of the step to update (0-based). Required for mark_step command.",
                 "type": "integer",
@@ -69,12 +78,18 @@ class PlanningTool(BaseTool):
                 "description": "Additional notes for a step. Optional for mark_step command.",
                 "type": "string",
             },
+            "include_plan": {
+                "description": "Whether mark_step should return the whole updated plan rather than just the step and progress. Defaults to false.",
+                "type": "boolean",
+            },
         },
         "required": ["command"],
         "additionalProperties": False,
     }
 
-    plans: dict = {}  # Dictionary to store plans by plan_id
+    # Plans of this tool's session; without a store passed in, a private
+    # in-memory one. Only a store the tool created is closed on cleanup.
+    store: PlanStore = Field(default_factory=create_plan_store, exclude=True)
     _current_plan_id: Optional[str] = None  # Track the current active plan
 
     async def execute(
@@ -86,6 +101,7 @@ class PlanningTool(BaseTool):
         plan_id: Optional[str] = None,
         title: Optional[str] = None,
         steps: Optional[List[str]] = None,
+        step_dependencies: Optional[List[List[int]]] = None,
         step_index: Optional[int] = None,
         step_status: Optional[
             Literal[
@@ -99,6 +115,7 @@ class PlanningTool(BaseTool):
             ]
         ] = None,
         step_notes: Optional[str] = None,
+        include_plan: bool = False,
         **kwargs,
     ):
         """
@@ -109,15 +126,17 @@ class PlanningTool(BaseTool):
         - plan_id: Unique identifier for the plan
         - title: Title for the plan (used with create command)
         - steps: List of steps for the plan (used with create command)
+        - step_dependencies: Earlier steps each step depends on (create/update)
         - step_index: Index of the step to update (used with mark_step command)
         - step_status: Status to set for a step (used with mark_step command)
         - step_notes: Additional notes for a step (used with mark_step command)
+        - include_plan: Return the whole plan from mark_step
         """
 
         if command == "create":
-            return self._create_plan(plan_id, title, steps)
+            return self._create_plan(plan_id, title, steps, step_dependencies)
         elif command == "update":
-            return self._update_plan(plan_id, title, steps)
+            return self._update_plan(plan_id, title, steps, step_dependencies)
         elif command == "list":
             return self._list_plans()
         elif command == "get":
@@ -125,7 +144,9 @@ class PlanningTool(BaseTool):
         elif command == "set_active":
             return self._set_active_plan(plan_id)
         elif command == "mark_step":
-            return self._mark_step(plan_id, step_index, step_status, step_notes)
+            return self._mark_step(
+                plan_id, step_index, step_status, step_notes, include_plan
+            )
         elif command == "delete":
             return self._delete_plan(plan_id)
         else:
@@ -133,14 +154,56 @@ class PlanningTool(BaseTool):
                 f"Unrecognized command: {command}. Allowed commands are: create, update, list, get, set_active, mark_step, delete"
             )
 
+    def get_plan(self, plan_id: Optional[str] = None) -> Optional[Plan]:
+        """The plan with this ID (the active plan by default), or None."""
+        plan_id = plan_id or self._current_plan_id
+        return self.store.get(plan_id) if plan_id else None
+
+    def _require_plan(self, plan_id: Optional[str]) -> Plan:
+        """The plan with this ID, or the active plan when no ID is given."""
+        if not plan_id:
+            if not self._current_plan_id:
+                raise ToolError(
+                    "No active plan. Please specify a plan_id or set an active plan."
+                )
+            plan_id = self._current_plan_id
+
+        plan = self.store.get(plan_id)
+        if plan is None:
+            raise ToolError(f"No plan found with ID: {plan_id}")
+        return plan
+
+    @staticmethod
+    def _check_dependencies(
+        dependencies: Optional[List[List[int]]], n_steps: int, command: str
+    ) -> None:
+        if dependencies is None:
+            return
+        if len(dependencies) != n_steps or not all(
+            isinstance(deps, list) and all(isinstance(d, int) for d in deps)
+            for deps in dependencies
+        ):
+            raise ToolError(
+                f"Parameter `step_dependencies` must be a list of {n_steps} lists of step indices for command: {command}"
+            )
+        for i, deps in enumerate(dependencies):
+            if any(not 0 <= d < i for d in deps):
+                raise ToolError(
+                    f"Invalid `step_dependencies` of step {i}: {deps}. A step can only depend on earlier steps."
+                )
+
     def _create_plan(
-        self, plan_id: Optional[str], title: Optional[str], steps: Optional[List[str]]
+        self,
+        plan_id: Optional[str],
+        title: Optional[str],
+        steps: Optional[List[str]],
+        step_dependencies: Optional[List[List[int]]] = None,
     ) -> ToolResult:
         """Create a new plan with the given ID, title, and steps."""
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: create")
 
-        if plan_id in self.plans:
+        if plan_id in self.store:
             raise ToolError(
                 f"A plan with ID '{plan_id}' already exists. Use 'update' to modify existing plans."
             )
@@ -157,36 +220,35 @@ class PlanningTool(BaseTool):
                 "Parameter `steps` must be a non-empty list of strings for command: create"
             )
 
-        # Create a new plan with initialized step statuses
-        plan = {
-            "plan_id": plan_id,
-            "title": title,
-            "steps": steps,
-            "step_statuses": ["not_started"] * len(steps),
-            "step_notes": [""] * len(steps),
-        }
-
-        self.plans[plan_id] = plan
+        self._check_dependencies(step_dependencies, len(steps), "create")
+        plan = Plan(
+            plan_id=plan_id,
+            title=title,
+            steps=steps,
+            step_dependencies=step_dependencies,
+        )
+        self.store.put(plan_id, plan)
         self._current_plan_id = plan_id  # Set as active plan
 
         return ToolResult(
-            output=f"Plan created successfully with ID: {plan_id}\n\n{self._format_plan(plan)}"
+            output=f"Plan created successfully with ID: {plan_id}\n\n{plan.render()}"
         )
 
     def _update_plan(
-        self, plan_id: Optional[str], title: Optional[str], steps: Optional[List[str]]
+        self,
+        plan_id: Optional[str],
+        title: Optional[str],
+        steps: Optional[List[str]],
+        step_dependencies: Optional[List[List[int]]] = None,
     ) -> ToolResult:
         """Update an existing plan with new title or steps."""
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: update")
 
-        if plan_id not in self.plans:
-            raise ToolError(f"No plan found with ID: {plan_id}")
-
-        plan = self.plans[plan_id]
+        plan = self._require_plan(plan_id)
 
         if title:
-            plan["title"] = title
+            plan.title = title
 
         if steps:
             if not isinstance(steps, list) or not all(
@@ -195,83 +257,49 @@ class PlanningTool(BaseTool):
                 raise ToolError(
                     "Parameter `steps` must be a list of strings for command: update"
                 )
-
-            # Preserve existing step statuses for unchanged steps
-            old_steps = plan["steps"]
-            old_statuses = plan["step_statuses"]
-            old_notes = plan["step_notes"]
-
-            # Create new step statuses and notes
-            new_statuses = []
-            new_notes = []
-
-            for i, step in enumerate(steps):
-                # If the step exists at the same position in old steps, preserve status and notes
-                if i < len(old_steps) and step == old_steps[i]:
-                    new_statuses.append(old_statuses[i])
-                    new_notes.append(old_notes[i])
-                else:
-                    new_statuses.append("not_started")
-                    new_notes.append("")
-
-            plan["steps"] = steps
-            plan["step_statuses"] = new_statuses
-            plan["step_notes"] = new_notes
-
+            self._check_dependencies(step_dependencies, len(steps), "update")
+            # Steps unchanged at the same position keep their status and notes
+            plan.set_steps(steps, step_dependencies)
+        elif step_dependencies is not None:
+            self._check_dependencies(step_dependencies, len(plan.steps), "update")
+            plan.set_steps(plan.steps, step_dependencies)
+
+        self.store.put(plan_id, plan)
         return ToolResult(
-            output=f"Plan updated successfully: {plan_id}\n\n{self._format_plan(plan)}"
+            output=f"Plan updated successfully: {plan_id}\n\n{plan.render()}"
         )
 
     def _list_plans(self) -> ToolResult:
         """List all available plans."""
-        if not self.plans:
+        plans = self.store.items()
+        if not plans:
             return ToolResult(
                 output="No plans available. Create a plan with the 'create' command."
             )
 
         output = "Available plans:\n"
-        for plan_id, plan in self.plans.items():
+        for plan_id, plan in plans:
             current_marker = " (active)" if plan_id == self._current_plan_id else ""
-            completed = sum(1 for status in plan["step_statuses"] if status == "completed")
-            partial_success = sum(1 for status in plan["step_statuses"] if status == "partial_success")
-            skipped = sum(1 for status in plan["step_statuses"] if status == "skipped")
-            
-            # Count effective completions (completed + partial_success + skipped)
-            effective_completed = completed + partial_success + skipped
-            
-            total = len(plan["steps"])
-            progress = f"{effective_completed}/{total} steps effectively completed"
-            output += f"• {plan_id}{current_marker}: {plan['title']} - {progress}\n"
+            progress = (
+                f"{plan.effective_completed}/{len(plan.steps)} steps effectively completed"
+            )
+            output += f"• {plan_id}{current_marker}: {plan.title} - {progress}\n"
 
         return ToolResult(output=output)
 
     def _get_plan(self, plan_id: Optional[str]) -> ToolResult:
         """Get details of a specific plan."""
-        if not plan_id:
-            # If no plan_id is provided, use the current active plan
-            if not self._current_plan_id:
-                raise ToolError(
-                    "No active plan. Please specify a plan_id or set an active plan."
-                )
-            plan_id = self._current_plan_id
-
-        if plan_id not in self.plans:
-            raise ToolError(f"No plan found with ID: {plan_id}")
-
-        plan = self.plans[plan_id]
-        return ToolResult(output=self._format_plan(plan))
+        return ToolResult(output=self._require_plan(plan_id).render())
 
     def _set_active_plan(self, plan_id: Optional[str]) -> ToolResult:
         """Set a plan as the active plan."""
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: set_active")
 
-        if plan_id not in self.plans:
-            raise ToolError(f"No plan found with ID: {plan_id}")
-
+        plan = self._require_plan(plan_id)
         self._current_plan_id = plan_id
         return ToolResult(
-            output=f"Plan '{plan_id}' is now the active plan.\n\n{self._format_plan(self.plans[plan_id])}"
+            output=f"Plan '{plan_id}' is now the active plan.\n\n{plan.render()}"
         )
 
     def _mark_step(
@@ -280,50 +308,37 @@ class PlanningTool(BaseTool):
         step_index: Optional[int],
         step_status: Optional[str],
         step_notes: Optional[str],
+        include_plan: bool = False,
     ) -> ToolResult:
         """Mark a step with a specific status and optional notes."""
-        if not plan_id:
-            # If no plan_id is provided, use the current active plan
-            if not self._current_plan_id:
-                raise ToolError(
-                    "No active plan. Please specify a plan_id or set an active plan."
-                )
-            plan_id = self._current_plan_id
-
-        if plan_id not in self.plans:
-            raise ToolError(f"No plan found with ID: {plan_id}")
+        plan = self._require_plan(plan_id)
 
         if step_index is None:
             raise ToolError("Parameter `step_index` is required for command: mark_step")
 
-        plan = self.plans[plan_id]
-
-        if step_index < 0 or step_index >= len(plan["steps"]):
+        if step_index < 0 or step_index >= len(plan.steps):
             raise ToolError(
-                f"Invalid step_index: {step_index}. Valid indices range from 0 to {len(plan['steps'])-1}."
+                f"Invalid step_index: {step_index}. Valid indices range from 0 to {len(plan.steps)-1}."
             )
 
-        if step_status and step_status not in [
-            "not_started",
-            "in_progress",
-            "completed",
-            "blocked",
-            "partial_success",
-            "failed",
-            "skipped",
-        ]:
+        if step_status and step_status not in PlanStepStatus.get_all_statuses():
             raise ToolError(
                 f"Invalid step_status: {step_status}. Valid statuses are: not_started, in_progress, completed, blocked, partial_success, failed, skipped"
             )
 
         if step_status:
-            plan["step_statuses"][step_index] = step_status
+            plan.set_status(step_index, step_status)
 
         if step_notes:
-            plan["step_notes"][step_index] = step_notes
+            plan.set_notes(step_index, step_notes)
+        self.store.put(plan.plan_id, plan)
 
+        if include_plan:
+            return ToolResult(
+                output=f"Step {step_index} updated in plan '{plan.plan_id}'.\n\n{plan.render()}"
+            )
         return ToolResult(
-            output=f"Step {step_index} updated in plan '{plan_id}'.\n\n{self._format_plan(plan)}"
+            output=f"Step {step_index} updated in plan '{plan.plan_id}': {plan.render_step(step_index).rstrip()}\nProgress: {plan.progress()}"
         )
 
     def _delete_plan(self, plan_id: Optional[str]) -> ToolResult:
@@ -331,62 +346,16 @@ class PlanningTool(BaseTool):
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: delete")
 
-        if plan_id not in self.plans:
+        if not self.store.delete(plan_id):
             raise ToolError(f"No plan found with ID: {plan_id}")
 
-        del self.plans[plan_id]
-
         # If the deleted plan was the active plan, clear the active plan
         if self._current_plan_id == plan_id:
             self._current_plan_id = None
 
         return ToolResult(output=f"Plan '{plan_id}' has been deleted.")
 
-    def _format_plan(self, plan: Dict) -> str:
-        """Format a plan for display."""
-        output = f"Plan: {plan['title']} (ID: {plan['plan_id']})\n"
-        output += "=" * len(output) + "\n\n"
-
-        # Calculate progress statistics
-        total_steps = len(plan["steps"])
-        completed = sum(1 for status in plan["step_statuses"] if status == "completed")
-        partial_success = sum(1 for status in plan["step_statuses"] if status == "partial_success")
-        skipped = sum(1 for status in plan["step_statuses"] if status == "skipped")
-        failed = sum(1 for status in plan["step_statuses"] if status == "failed")
-        in_progress = sum(1 for status in plan["step_statuses"] if status == "in_progress")
-        blocked = sum(1 for status in plan["step_statuses"] if status == "blocked")
-        not_started = sum(1 for status in plan["step_statuses"] if status == "not_started")
-
-        # Count effective completions (completed + partial_success + skipped)
-        effective_completed = completed + partial_success + skipped
-        
-        output += f"Progress: {effective_completed}/{total_steps} steps effectively completed "
-        if total_steps > 0:
-            percentage = (effective_completed / total_steps) * 100
-            output += f"({percentage:.1f}%)\n"
-        else:
-            output += "(0%)\n"
-
-        output += f"Status: {completed} completed, {partial_success} partial, {skipped} skipped, "
-        output += f"{failed} failed, {in_progress} in progress, {blocked} blocked, {not_started} not started\n\n"
-        output += "Steps:\n"
-
-        # Add each step with its status and notes
-        for i, (step, status, notes) in enumerate(
-            zip(plan["steps"], plan["step_statuses"], plan["step_notes"])
-        ):
-            status_symbol = {
-                "not_started": "[ ]",
-                "in_progress": "[→]",
-                "completed": "[✓]",
-                "blocked": "[!]",
-                "partial_success": "[~]",
-                "failed": "[✗]",
-                "skipped": "[↷]",
-            }.get(status, "[ ]")
-
-            output += f"{i}. {status_symbol} {step}\n"
-            if notes:
-                output += f"   Notes: {notes}\n"
-
-        return output
+    async def cleanup(self) -> None:
+        """Close the plan store, unless it was passed in and is owned by its caller."""
+        if "store" not in self.model_fields_set:
+            self.store.close()
@@ -1,14 +1,142 @@
+import asyncio
+import json
+import os
+import signal
+import sys
 import threading
-from typing import Dict
+from pathlib import Path
+from typing import Dict, Optional
 
+from pydantic import Field
+
+from app.config import config
+from app.logger import logger
 from app.tool.base import BaseTool
 
 
+_KERNEL_SCRIPT = Path(__file__).with_name("python_kernel.py")
+# Largest response line read from the kernel; outputs are truncated well below
+_KERNEL_LINE_LIMIT = 16 * 1024 * 1024
+
+
+class _PythonKernel:
+    """A long-lived Python worker process holding one namespace."""
+
+    _process: Optional[asyncio.subprocess.Process]
+
+    _interrupt_grace: float = 2.0  # seconds
+
+    def __init__(self, memory_limit_mb: int):
+        self.memory_limit_mb = memory_limit_mb
+        self._process = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    def _limit_resources(self):
+        """Runs in the child before exec: new process group and memory cap."""
+        os.setsid()
+        if self.memory_limit_mb > 0:
+            import resource
+
+            limit = self.memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    async def start(self):
+        if self.alive:
+            return
+
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-u",
+            str(_KERNEL_SCRIPT),
+            preexec_fn=self._limit_resources,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=_KERNEL_LINE_LIMIT,
+        )
+        logger.debug(f"Started python kernel (pid {self._process.pid})")
+
+    async def _request(self, payload: dict, timeout: float) -> Dict:
+        assert self._process and self._process.stdin and self._process.stdout
+
+        self._process.stdin.write(json.dumps(payload).encode() + b"\n")
+        await self._process.stdin.drain()
+
+        try:
+            line = await asyncio.wait_for(self._process.stdout.readline(), timeout)
+        except asyncio.TimeoutError:
+            # Interrupt the running code but keep the namespace if possible.
+            self._process.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(
+                    self._process.stdout.readline(), self._interrupt_grace
+                )
+            except (asyncio.TimeoutError, ValueError, asyncio.LimitOverrunError):
+                await self.stop()
+                return {
+                    "observation": f"Execution timeout after {timeout} seconds; kernel state was lost",
+                    "success": False,
+                }
+            return {
+                "observation": f"Execution timeout after {timeout} seconds",
+                "success": False,
+            }
+        except (ValueError, asyncio.LimitOverrunError):
+            # readline() raises ValueError when the line exceeds the stream limit
+            await self.stop()
+            return {
+                "observation": "Kernel response was too large; kernel state was lost",
+                "success": False,
+            }
+
+        if not line:
+            await self.stop()
+            return {
+                "observation": "Kernel died (possibly exceeded its memory limit); state was lost",
+                "success": False,
+            }
+        return json.loads(line)
+
+    async def run(self, code: str, timeout: float, max_output_chars: int) -> Dict:
+        async with self._lock:
+            await self.start()
+            return await self._request(
+                {"op": "exec", "code": code, "max_output_chars": max_output_chars},
+                timeout,
+            )
+
+    async def reset(self) -> Dict:
+        async with self._lock:
+            if not self.alive:
+                return {"observation": "Namespace reset.", "success": True}
+            return await self._request({"op": "reset"}, self._interrupt_grace)
+
+    async def stop(self):
+        """Terminate the worker process group and reap it."""
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        if process.returncode is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        if process.stdout is not None:
+            # Reading may be paused on a full buffer, and wait() only returns
+            # once the pipe is closed.
+            await process.stdout.read()
+        await process.wait()
+
+
 class PythonExecute(BaseTool):
     """A tool for executing Python code with timeout and safety restrictions."""
 
     name: str = "python_execute"
-    description: str = "Executes Python code string. Note: Only print outputs are visible, function return values are not captured. Use print statements to see results."
+    description: str = "Executes Python code string. Note: Only print outputs are visible, function return values are not captured. Use print statements to see results. When stateful execution is enabled, variables, imports and loaded data persist between calls; pass `reset` to start from a clean namespace."
     parameters: dict = {
         "type": "object",
         "properties": {
@@ -16,14 +144,29 @@ class PythonExecute(BaseTool):
                 "type": "string",
                 "description": "The Python code to execute.",
             },
+            "reset": {
+                "type": "boolean",
+                "description": "(optional) Clear the persistent namespace before running `code`. Only meaningful in stateful mode.",
+            },
         },
         "required": ["code"],
     }
 
+    stateful: bool = Field(default_factory=lambda: config.python_config.stateful)
+    memory_limit_mb: int = Field(
+        default_factory=lambda: config.python_config.memory_limit_mb
+    )
+    max_output_chars: int = Field(
+        default_factory=lambda: config.python_config.max_output_chars
+    )
+
+    _kernel: Optional[_PythonKernel] = None
+
     async def execute(
         self,
         code: str,
         timeout: int = 5,
+        reset: bool = False,
     ) -> Dict:
         """
         Executes the provided Python code with a timeout.
@@ -31,10 +174,14 @@ class PythonExecute(BaseTool):
         Args:
             code (str): The Python code to execute.
             timeout (int): Execution timeout in seconds.
+            reset (bool): Clear the persistent namespace first (stateful mode only).
 
         Returns:
             Dict: Contains 'output' with execution output or error message and 'success' status.
         """
+        if self.stateful:
+            return await self._execute_stateful(code, timeout, reset)
+
         result = {"observation": ""}
 
         def run_code():
@@ -68,3 +215,21 @@ class PythonExecute(BaseTool):
             }
 
         return result
+
+    async def _execute_stateful(self, code: str, timeout: int, reset: bool) -> Dict:
+        """Run code in the session's persistent kernel."""
+        if self._kernel is None:
+            self._kernel = _PythonKernel(self.memory_limit_mb)
+
+        if reset:
+            await self._kernel.reset()
+            if not code.strip():
+                return {"observation": "Namespace reset.", "success": True}
+
+        return await self._kernel.run(code, timeout, self.max_output_chars)
+
+    async def cleanup(self):
+        """Stop the persistent kernel, if any."""
+        if self._kernel is not None:
+            await self._kernel.stop()
+            self._kernel = None
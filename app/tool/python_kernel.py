@@ -0,0 +1,80 @@
+"""Worker process backing the stateful mode of PythonExecute.
+
+This file is executed as a standalone script by `PythonExecute`, so it must not
+import anything from the `app` package. Requests and responses are exchanged as
+JSON lines: requests arrive on stdin, responses are written to a private
+duplicate of the original stdout, while fd 1 itself is pointed at stderr so that
+child processes spawned by user code cannot corrupt the protocol stream.
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import traceback
+
+
+# Running `python path/to/python_kernel.py` puts app/tool on sys.path, where
+# modules like `planning` or `base` would shadow user imports.
+if sys.path and sys.path[0] == os.path.dirname(os.path.abspath(__file__)):
+    sys.path.pop(0)
+
+
+def _new_namespace() -> dict:
+    return {"__name__": "__main__", "__builtins__": __builtins__}
+
+
+def _respond(channel, **payload) -> None:
+    channel.write(json.dumps(payload) + "\n")
+    channel.flush()
+
+
+def main() -> None:
+    channel = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+
+    namespace = _new_namespace()
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            _respond(channel, observation=f"Invalid request: {e}", success=False)
+            continue
+
+        if request.get("op") == "reset":
+            namespace = _new_namespace()
+            _respond(channel, observation="Namespace reset.", success=True)
+            continue
+
+        buffer = io.StringIO()
+        success = True
+        try:
+            with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+                exec(compile(request.get("code", ""), "<kernel>", "exec"), namespace)
+        except KeyboardInterrupt:
+            buffer.write("KeyboardInterrupt: execution interrupted\n")
+            success = False
+        except MemoryError:
+            buffer.write("MemoryError: kernel memory limit exceeded\n")
+            success = False
+        except BaseException:
+            # SystemExit included: user code must not be able to stop the kernel.
+            # Drop this module's own frame from the reported traceback.
+            etype, value, tb = sys.exc_info()
+            buffer.write("".join(traceback.format_exception(etype, value, tb.tb_next)))
+            success = False
+
+        # Truncate here so a huge output never has to cross the pipe.
+        observation = buffer.getvalue()
+        limit = request.get("max_output_chars")
+        if limit and len(observation) > limit:
+            observation = observation[:limit] + "\n<output truncated>"
+        _respond(channel, observation=observation, success=success)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,33 @@
+from functools import lru_cache
+from typing import Optional
+
+from app.config import SearchSettings, config
+from app.tool.search.base import SearchBackend
+from app.tool.search.google import GoogleBackend
+from app.tool.search.local_index import LocalIndexBackend
+
+
+@lru_cache(maxsize=None)
+def _local_backend(directory: str) -> LocalIndexBackend:
+    # One index per directory, shared by every session.
+    return LocalIndexBackend(directory)
+
+
+def create_search_backend(settings: Optional[SearchSettings] = None) -> SearchBackend:
+    """Build the search backend selected by the `[search]` config section."""
+    settings = settings or config.search_config
+    if settings.backend == "local":
+        if not settings.documents_dir:
+            raise ValueError("search.documents_dir is required for the local backend")
+        return _local_backend(settings.documents_dir)
+    if settings.backend == "google":
+        return GoogleBackend()
+    raise ValueError(f"Unknown search backend: {settings.backend}")
+
+
+__all__ = [
+    "SearchBackend",
+    "GoogleBackend",
+    "LocalIndexBackend",
+    "create_search_backend",
+]
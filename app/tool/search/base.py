@@ -0,0 +1,15 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+
+class SearchBackend(ABC):
+    """A source of search results for the `google_search` tool.
+
+    `search` is blocking; the tool runs it on its dedicated thread pool.
+    """
+
+    name: str = "base"
+
+    @abstractmethod
+    def search(self, query: str, num_results: int = 10) -> List[str]:
+        """Return up to `num_results` URLs matching the query, best first."""
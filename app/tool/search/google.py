@@ -0,0 +1,15 @@
+from typing import List
+
+from app.tool.search.base import SearchBackend
+
+
+class GoogleBackend(SearchBackend):
+    """Scrapes Google result pages through the `googlesearch` package."""
+
+    name: str = "google"
+
+    def search(self, query: str, num_results: int = 10) -> List[str]:
+        # Imported lazily so offline setups do not need the package.
+        from googlesearch import search
+
+        return list(search(query, num_results=num_results))
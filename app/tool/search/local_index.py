@@ -0,0 +1,104 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.logger import logger
+from app.tool.search.base import SearchBackend
+
+
+_TOKEN = re.compile(r"\w+")
+_TAG = re.compile(r"<(script|style)[^>]*>.*?</\1>|<[^>]+>", re.DOTALL | re.IGNORECASE)
+
+INDEXED_SUFFIXES = {".txt", ".md", ".markdown", ".rst", ".html", ".htm", ".json"}
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class LocalIndexBackend(SearchBackend):
+    """
+    BM25 search over the text documents of a local directory.
+
+    The inverted index is built on first use and rebuilt whenever a document is
+    added, removed or modified. Results are `file://` URLs that `web_fetch` can
+    read, so the search-then-read path works without network access.
+    """
+
+    name: str = "local"
+
+    def __init__(self, directory: str, k1: float = 1.5, b: float = 0.75):
+        self.directory = Path(directory).expanduser().resolve()
+        # Part of the search cache key, so distinct directories never collide.
+        self.name = f"local:{self.directory}"
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._signature: Tuple = ()
+        self._paths: List[Path] = []
+        self._lengths: List[int] = []
+        self._avg_length = 0.0
+        self._postings: Dict[str, Dict[int, int]] = {}
+
+    def _scan(self) -> List[Tuple[Path, float, int]]:
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = Path(root) / name
+                if path.suffix.lower() in INDEXED_SUFFIXES:
+                    stat = path.stat()
+                    files.append((path, stat.st_mtime, stat.st_size))
+        return sorted(files)
+
+    def _ensure_index(self) -> None:
+        signature = tuple(self._scan())
+        if signature == self._signature:
+            return
+
+        paths, lengths = [], []
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for path, _, _ in signature:
+            try:
+                text = path.read_text(encoding="utf-8", errors="ignore")
+            except OSError as e:
+                logger.warning(f"Skipping unreadable document {path}: {e}")
+                continue
+            if path.suffix.lower() in (".html", ".htm"):
+                text = _TAG.sub(" ", text)
+            doc_id = len(paths)
+            tokens = tokenize(text)
+            for term, count in Counter(tokens).items():
+                postings[term][doc_id] = count
+            paths.append(path)
+            lengths.append(len(tokens))
+
+        self._paths = paths
+        self._lengths = lengths
+        self._avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        self._postings = dict(postings)
+        self._signature = signature
+        logger.info(f"Indexed {len(paths)} local documents in {self.directory}")
+
+    def search(self, query: str, num_results: int = 10) -> List[str]:
+        with self._lock:
+            self._ensure_index()
+            total = len(self._paths)
+            scores: Dict[int, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                for doc_id, tf in postings.items():
+                    length_ratio = self._lengths[doc_id] / self._avg_length
+                    norm = 1 - self.b + self.b * length_ratio
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+            # Ties are broken by path so results are deterministic.
+            ranked = sorted(scores, key=lambda d: (-scores[d], self._paths[d]))
+            return [self._paths[d].as_uri() for d in ranked[:num_results]]
@@ -1,11 +1,23 @@
-from collections import defaultdict
+import locale
+import mmap
+import os
+import shutil
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
 from pathlib import Path
-from typing import Literal, get_args
+from typing import Dict, List, Literal, NamedTuple, Optional, Tuple, get_args
+
+from pydantic import PrivateAttr
+from unidiff import PatchSet
+from unidiff.errors import UnidiffParseError
 
 from app.exceptions import ToolError
 from app.tool import BaseTool
 from app.tool.base import CLIResult, ToolResult
-from app.tool.run import run
+from app.tool.workspace import notify_file_changed
 
 
 Command = Literal[
@@ -14,11 +26,23 @@ Command = Literal[
     "str_replace",
     "insert",
     "undo_edit",
+    "multi_edit",
+    "apply_patch",
 ]
 SNIPPET_LINES: int = 4
+# Context lines around each change in the combined multi-file snippet.
+BATCH_SNIPPET_LINES: int = 2
 
 MAX_RESPONSE_LEN: int = 16000
 
+MAX_HISTORY_EDITS_PER_FILE: int = 50
+MAX_HISTORY_BYTES: int = 32 * 1024 * 1024
+
+# Files at least this large are viewed and edited through a line index.
+LINE_INDEX_MIN_BYTES: int = 1024 * 1024
+LINE_INDEX_BLOCK: int = 64 * 1024
+MAX_LINE_INDEXES: int = 8
+
 TRUNCATED_MESSAGE: str = "<response clipped><NOTE>To save on context only part of this file has been shown to you. You should retry this tool after you have searched inside the file with `grep -n` in order to find the line numbers of what you are looking for.</NOTE>"
 
 _STR_REPLACE_EDITOR_DESCRIPTION = """Custom editing tool for viewing, creating and editing files
@@ -32,6 +56,12 @@ Notes for using the `str_replace` command:
 * The `old_str` parameter should match EXACTLY one or more consecutive lines from the original file. Be mindful of whitespaces!
 * If the `old_str` parameter is not unique in the file, the replacement will not be performed. Make sure to include enough context in `old_str` to make it unique
 * The `new_str` parameter should contain the edited lines that should replace the `old_str`
+
+Notes for using the `multi_edit` and `apply_patch` commands:
+* Use them to make many changes, possibly across several files, in a single call
+* `multi_edit` applies the `edits` list in order; every `old_str` must be unique in its file at the time it is applied. Edit paths may be relative to `path`, and edits without a path apply to `path` itself
+* `apply_patch` applies the unified diff `patch`; file names in the diff are relative to the directory `path`
+* All changes are validated first and then written atomically: either every file is changed or none is
 """
 
 
@@ -44,6 +74,359 @@ def maybe_truncate(content: str, truncate_after: int | None = MAX_RESPONSE_LEN):
     )
 
 
+def _list_directory(path: Path, max_depth: int) -> List[str]:
+    """List `path` and its non-hidden entries up to `max_depth` levels deep."""
+    lines = [str(path)]
+    entries = sorted(
+        (e for e in os.scandir(path) if not e.name.startswith(".")),
+        key=lambda e: e.name,
+    )
+    for entry in entries:
+        lines.append(entry.path)
+        if max_depth > 1 and entry.is_dir(follow_symlinks=False):
+            try:
+                lines.extend(_list_directory(Path(entry.path), max_depth - 1)[1:])
+            except OSError:
+                continue
+    return lines
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix of two strings, compared in C-speed blocks."""
+    n = min(len(a), len(b))
+    block = 1 << 16
+    start = 0
+    while start < n and a[start : start + block] == b[start : start + block]:
+        start += block
+    if start >= n:
+        return n
+    # The first difference lies within [start, start + block).
+    lo, hi = start, min(start + block, n)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[start:mid] == b[start:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _expand_to_lines(
+    text: str, start: int, end: int, before: int, after: int
+) -> Tuple[int, int]:
+    """
+    Widen text[start:end] to whole lines plus `before` lines above and `after`
+    lines below, walking newlines so the cost depends on the snippet only.
+
+    Returns:
+        The start and end offsets of the widened region.
+    """
+    region_start = text.rfind("\n", 0, start) + 1
+    for _ in range(before):
+        if region_start == 0:
+            break
+        region_start = text.rfind("\n", 0, region_start - 1) + 1
+
+    region_end = text.find("\n", end)
+    for _ in range(after):
+        if region_end == -1:
+            break
+        region_end = text.find("\n", region_end + 1)
+    return region_start, len(text) if region_end == -1 else region_end
+
+
+class _LineIndex:
+    """
+    Newline counts per fixed-size block of a file, read through mmap.
+
+    Locating a line costs one bisect plus a scan of a single block, so reading
+    a range of lines takes time proportional to the range, not the file. The
+    index is stale once the file's mtime or size changes. Files with carriage
+    returns are not `usable`, since text-mode reads translate those newlines.
+    """
+
+    def __init__(self, path: Path):
+        stat = path.stat()
+        self.path = path
+        self.mtime_ns, self.size = stat.st_mtime_ns, stat.st_size
+        self.encoding = locale.getpreferredencoding(False)
+        self.usable = True
+        # newlines before the start of each block
+        self.block_lines = array("q")
+        newlines = 0
+        with path.open("rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            for block_start in range(0, self.size, LINE_INDEX_BLOCK):
+                self.block_lines.append(newlines)
+                block = mm[block_start : block_start + LINE_INDEX_BLOCK]
+                newlines += block.count(b"\n")
+                if self.usable and b"\r" in block:
+                    self.usable = False
+        # Same count as len(text.split("\n")).
+        self.line_count = newlines + 1
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+    def _line_offset(self, mm: mmap.mmap, line: int) -> int:
+        """Byte offset of the start of 1-based `line`."""
+        if line <= 1:
+            return 0
+        newline = line - 1  # the line starts after this many newlines
+        block = bisect_left(self.block_lines, newline) - 1
+        offset = block * LINE_INDEX_BLOCK
+        for _ in range(newline - self.block_lines[block]):
+            offset = mm.find(b"\n", offset) + 1
+        return offset
+
+    def _decode(self, data: bytes) -> str:
+        try:
+            return data.decode(self.encoding)
+        except UnicodeDecodeError as e:
+            raise ToolError(f"Ran into {e} while trying to read {self.path}") from None
+
+    def read_lines(self, first: int, last: int) -> str:
+        """Lines `first` to `last` (1-based, inclusive; -1 for the end of file)."""
+        with self.path.open("rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            start = self._line_offset(mm, first)
+            if last == -1 or last >= self.line_count:
+                end = self.size
+            else:
+                end = self._line_offset(mm, last + 1) - 1
+            return self._decode(mm[start:end])
+
+    def split_at_line(self, line: int) -> Tuple[str, str]:
+        """The file's text before and from the start of 1-based `line`."""
+        with self.path.open("rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            offset = self._line_offset(mm, line)
+            return self._decode(mm[:offset]), self._decode(mm[offset:])
+
+    def read_head(self, max_chars: int) -> str:
+        """At most `max_chars` characters from the start of the file."""
+        with self.path.open("rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            # A character takes at most 4 bytes; drop a sequence cut in half.
+            return mm[: max_chars * 4].decode(self.encoding, errors="ignore")[
+                :max_chars
+            ]
+
+
+class _ReverseEdit(NamedTuple):
+    """Turns the text after an edit back into the text before it."""
+
+    start: int  # offset of the edited region
+    new_length: int  # length of the region after the edit
+    old_segment: Optional[bytes]  # compressed region before the edit; None: created
+    new_size: int  # length and checksum of the whole text after the edit, used
+    new_crc: int  # to detect changes made outside the editor
+
+    @property
+    def cost(self) -> int:
+        return len(self.old_segment or b"") + 64
+
+
+class _EditHistory:
+    """
+    Bounded undo history of one editor instance.
+
+    Every edit is stored as a zlib-compressed reverse splice covering only the
+    changed region, so memory grows with the size of the edits rather than with
+    file size times edit count. Each file keeps at most `max_edits_per_file`
+    edits, and once all files together exceed `max_bytes` the oldest edits of
+    the least recently edited files are evicted.
+    """
+
+    def __init__(
+        self,
+        max_edits_per_file: int = MAX_HISTORY_EDITS_PER_FILE,
+        max_bytes: int = MAX_HISTORY_BYTES,
+    ):
+        self.max_edits_per_file = max_edits_per_file
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[Path, List[_ReverseEdit]]" = OrderedDict()
+        self._bytes = 0
+
+    def __contains__(self, path: Path) -> bool:
+        return bool(self._files.get(path))
+
+    def record(self, path: Path, old_text: Optional[str], new_text: str) -> None:
+        """Remember how to undo the change of `path` from old_text to new_text."""
+        encoded = new_text.encode()
+        new_size, new_crc = len(encoded), zlib.crc32(encoded)
+        if old_text is None:
+            entry = _ReverseEdit(0, len(new_text), None, new_size, new_crc)
+        else:
+            prefix = _common_prefix_length(old_text, new_text)
+            suffix = _common_prefix_length(
+                old_text[prefix:][::-1], new_text[prefix:][::-1]
+            )
+            entry = _ReverseEdit(
+                prefix,
+                len(new_text) - prefix - suffix,
+                zlib.compress(old_text[prefix : len(old_text) - suffix].encode()),
+                new_size,
+                new_crc,
+            )
+
+        edits = self._files.setdefault(path, [])
+        self._files.move_to_end(path)
+        edits.append(entry)
+        self._bytes += entry.cost
+        if len(edits) > self.max_edits_per_file:
+            self._bytes -= edits.pop(0).cost
+        while self._bytes > self.max_bytes and len(self._files) > 0:
+            oldest_path, oldest_edits = next(iter(self._files.items()))
+            self._bytes -= oldest_edits.pop(0).cost
+            if not oldest_edits:
+                del self._files[oldest_path]
+
+    def undo(self, path: Path, current_text: str) -> Optional[str]:
+        """
+        Pop the last edit of `path` and return the text before it, or None when
+        the edit created the file.
+        """
+        edits = self._files.get(path)
+        if not edits:
+            raise ToolError(f"No edit history found for {path}.")
+        entry = edits[-1]
+        encoded = current_text.encode()
+        if len(encoded) != entry.new_size or zlib.crc32(encoded) != entry.new_crc:
+            raise ToolError(
+                f"{path} was changed outside of this tool since its last edit, so the edit cannot be undone."
+            )
+
+        edits.pop()
+        self._bytes -= entry.cost
+        if not edits:
+            del self._files[path]
+        if entry.old_segment is None:
+            return None
+        old_segment = zlib.decompress(entry.old_segment).decode()
+        return (
+            current_text[: entry.start]
+            + old_segment
+            + current_text[entry.start + entry.new_length :]
+        )
+
+
+def _merge_region(
+    regions: List[Tuple[int, int]], start: int, end: int, new_length: int
+) -> List[Tuple[int, int]]:
+    """
+    Update the changed character regions of a text after text[start:end] was
+    replaced by `new_length` characters, and add the replacement as a region.
+    """
+    delta = new_length - (end - start)
+    merged_start, merged_end = start, start + new_length
+    updated = []
+    for region_start, region_end in regions:
+        if region_end < start:
+            updated.append((region_start, region_end))
+        elif region_start > end:
+            updated.append((region_start + delta, region_end + delta))
+        else:
+            merged_start = min(merged_start, region_start)
+            merged_end = max(merged_end, region_end + delta)
+    updated.append((merged_start, merged_end))
+    return sorted(updated)
+
+
+def _split_lines(text: str) -> List[str]:
+    """
+    Split text into lines ending with "\n", like the lines of a diff.
+
+    `str.splitlines` also breaks on form feeds, \x1c-\x1e, \x85, \u2028 and
+    \u2029, which would make hunks of files containing them never match.
+    """
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    return lines if lines[-1] else lines[:-1]
+
+
+def _default_file_mode() -> int:
+    """The mode of a newly created regular file under the current umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def _hunk_sides(hunk) -> Tuple[List[str], List[str]]:
+    """The lines a hunk expects in the file and the lines it leaves there."""
+    source: List[str] = []
+    target: List[str] = []
+    last_sides: Tuple[List[str], ...] = ()
+    for line in hunk:
+        if line.is_context:
+            source.append(line.value)
+            target.append(line.value)
+            last_sides = (source, target)
+        elif line.is_removed:
+            source.append(line.value)
+            last_sides = (source,)
+        elif line.is_added:
+            target.append(line.value)
+            last_sides = (target,)
+        elif line.line_type == "\\":
+            # "\ No newline at end of file" applies to the preceding line.
+            for side in last_sides:
+                if side[-1].endswith("\n"):
+                    side[-1] = side[-1][:-1]
+    return source, target
+
+
+def _find_block(
+    lines: List[str], block: List[str], expected: int, lowest: int
+) -> Optional[int]:
+    """Index at or after `lowest` where `block` occurs, preferring the closest to `expected`."""
+    highest = len(lines) - len(block)
+    if highest < lowest:
+        return None
+    expected = min(max(expected, lowest), highest)
+    for distance in range(max(expected - lowest, highest - expected) + 1):
+        for start in (expected - distance, expected + distance):
+            if not lowest <= start <= highest:
+                continue
+            if lines[start : start + len(block)] == block:
+                return start
+    return None
+
+
+def _apply_hunks(
+    path: Path, lines: List[str], patched_file
+) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Apply the hunks of one file of a patch, tolerating shifted line numbers.
+
+    Returns:
+        The new lines and the 1-based (first, last) line range of every hunk.
+    """
+    result: List[str] = []
+    ranges: List[Tuple[int, int]] = []
+    position = 0
+    for number, hunk in enumerate(patched_file, start=1):
+        source, target = _hunk_sides(hunk)
+        # A hunk without source lines inserts after line `source_start`.
+        expected = hunk.source_start if not source else hunk.source_start - 1
+        start = _find_block(lines, source, expected, position)
+        if start is None:
+            raise ToolError(
+                f"Hunk {number} (@@ -{hunk.source_start},{hunk.source_length} +{hunk.target_start},{hunk.target_length} @@) does not match the content of {path}"
+            )
+        result.extend(lines[position:start])
+        first_line = len(result) + 1
+        result.extend(target)
+        ranges.append((first_line, max(first_line, len(result))))
+        position = start + len(source)
+    result.extend(lines[position:])
+    return result, ranges
+
+
 class StrReplaceEditor(BaseTool):
     """A tool for executing bash commands"""
 
@@ -53,8 +436,16 @@ class StrReplaceEditor(BaseTool):
         "type": "object",
         "properties": {
             "command": {
-                "description": "The commands to run. Allowed options are: `view`, `create`, `str_replace`, `insert`, `undo_edit`.",
-                "enum": ["view", "create", "str_replace", "insert", "undo_edit"],
+                "description": "The commands to run. Allowed options are: `view`, `create`, `str_replace`, `insert`, `undo_edit`, `multi_edit`, `apply_patch`.",
+                "enum": [
+                    "view",
+                    "create",
+                    "str_replace",
+                    "insert",
+                    "undo_edit",
+                    "multi_edit",
+                    "apply_patch",
+                ],
                 "type": "string",
             },
             "path": {
@@ -82,11 +473,31 @@ class StrReplaceEditor(BaseTool):
                 "items": {"type": "integer"},
                 "type": "array",
             },
+            "edits": {
+                "description": "Required parameter of `multi_edit` command. The replacements to make, applied in order.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "old_str": {"type": "string"},
+                        "new_str": {"type": "string"},
+                    },
+                    "required": ["old_str"],
+                },
+                "type": "array",
+            },
+            "patch": {
+                "description": "Required parameter of `apply_patch` command. A unified diff (as produced by `diff -u` or `git diff`) to apply.",
+                "type": "string",
+            },
         },
         "required": ["command", "path"],
     }
 
-    _file_history: list = defaultdict(list)
+    _file_history: _EditHistory = PrivateAttr(default_factory=_EditHistory)
+    _line_indexes: "OrderedDict[Path, _LineIndex]" = PrivateAttr(
+        default_factory=OrderedDict
+    )
 
     async def execute(
         self,
@@ -98,6 +509,8 @@ class StrReplaceEditor(BaseTool):
         old_str: str | None = None,
         new_str: str | None = None,
         insert_line: int | None = None,
+        edits: list[dict] | None = None,
+        patch: str | None = None,
         **kwargs,
     ) -> str:
         _path = Path(path)
@@ -108,7 +521,7 @@ class StrReplaceEditor(BaseTool):
             if file_text is None:
                 raise ToolError("Parameter `file_text` is required for command: create")
             self.write_file(_path, file_text)
-            self._file_history[_path].append(file_text)
+            self._file_history.record(_path, None, file_text)
             result = ToolResult(output=f"File created successfully at: {_path}")
         elif command == "str_replace":
             if old_str is None:
@@ -126,6 +539,16 @@ class StrReplaceEditor(BaseTool):
             result = self.insert(_path, insert_line, new_str)
         elif command == "undo_edit":
             result = self.undo_edit(_path)
+        elif command == "multi_edit":
+            if not edits:
+                raise ToolError("Parameter `edits` is required for command: multi_edit")
+            result = self.multi_edit(_path, edits)
+        elif command == "apply_patch":
+            if not patch:
+                raise ToolError(
+                    "Parameter `patch` is required for command: apply_patch"
+                )
+            result = self.apply_patch(_path, patch)
         else:
             raise ToolError(
                 f'Unrecognized command {command}. The allowed commands for the {self.name} tool are: {", ".join(get_args(Command))}'
@@ -153,9 +576,9 @@ class StrReplaceEditor(BaseTool):
             )
         # Check if the path points to a directory
         if path.is_dir():
-            if command != "view":
+            if command not in ("view", "multi_edit", "apply_patch"):
                 raise ToolError(
-                    f"The path {path} is a directory and only the `view` command can be used on directories"
+                    f"The path {path} is a directory and only the `view`, `multi_edit` and `apply_patch` commands can be used on directories"
                 )
 
     async def view(self, path: Path, view_range: list[int] | None = None):
@@ -166,22 +589,26 @@ class StrReplaceEditor(BaseTool):
                     "The `view_range` parameter is not allowed when `path` points to a directory."
                 )
 
-            _, stdout, stderr = await run(
-                rf"find {path} -maxdepth 2 -not -path '*/\.*'"
+            try:
+                listing = "\n".join(_list_directory(path, max_depth=2))
+            except OSError as e:
+                return CLIResult(output="", error=str(e))
+            return CLIResult(
+                output=f"Here's the files and directories up to 2 levels deep in {path}, excluding hidden items:\n{listing}\n"
             )
-            if not stderr:
-                stdout = f"Here's the files and directories up to 2 levels deep in {path}, excluding hidden items:\n{stdout}\n"
-            return CLIResult(output=stdout, error=stderr)
 
-        file_content = self.read_file(path)
+        index = self._get_line_index(path)
         init_line = 1
         if view_range:
             if len(view_range) != 2 or not all(isinstance(i, int) for i in view_range):
                 raise ToolError(
                     "Invalid `view_range`. It should be a list of two integers."
                 )
-            file_lines = file_content.split("\n")
-            n_lines_file = len(file_lines)
+            if index is not None:
+                n_lines_file = index.line_count
+            else:
+                file_lines = self.read_file(path).split("\n")
+                n_lines_file = len(file_lines)
             init_line, final_line = view_range
             if init_line < 1 or init_line > n_lines_file:
                 raise ToolError(
@@ -196,10 +623,17 @@ class StrReplaceEditor(BaseTool):
                     f"Invalid `view_range`: {view_range}. Its second element `{final_line}` should be larger or equal than its first `{init_line}`"
                 )
 
-            if final_line == -1:
+            if index is not None:
+                file_content = index.read_lines(init_line, final_line)
+            elif final_line == -1:
                 file_content = "\n".join(file_lines[init_line - 1 :])
             else:
                 file_content = "\n".join(file_lines[init_line - 1 : final_line])
+        elif index is not None:
+            # Only the head of a large file fits in the response anyway.
+            file_content = index.read_head(MAX_RESPONSE_LEN + 1)
+        else:
+            file_content = self.read_file(path)
 
         return CLIResult(
             output=self._make_output(file_content, str(path), init_line=init_line)
@@ -208,7 +642,8 @@ class StrReplaceEditor(BaseTool):
     def str_replace(self, path: Path, old_str: str, new_str: str | None):
         """Implement the str_replace command, which replaces old_str with new_str in the file content"""
         # Read the file content
-        file_content = self.read_file(path).expandtabs()
+        original_content = self.read_file(path)
+        file_content = original_content.expandtabs()
         old_str = old_str.expandtabs()
         new_str = new_str.expandtabs() if new_str is not None else ""
 
@@ -230,80 +665,330 @@ class StrReplaceEditor(BaseTool):
             )
 
         # Replace old_str with new_str
-        new_file_content = file_content.replace(old_str, new_str)
+        replacement_start = file_content.find(old_str)
+        new_file_content = (
+            file_content[:replacement_start]
+            + new_str
+            + file_content[replacement_start + len(old_str) :]
+        )
 
         # Write the new content to the file
         self.write_file(path, new_file_content)
 
-        # Save the content to history
-        self._file_history[path].append(file_content)
+        # Save the reverse edit to history
+        self._file_history.record(path, original_content, new_file_content)
 
         # Create a snippet of the edited section
-        replacement_line = file_content.split(old_str)[0].count("\n")
-        start_line = max(0, replacement_line - SNIPPET_LINES)
-        end_line = replacement_line + SNIPPET_LINES + new_str.count("\n")
-        snippet = "\n".join(new_file_content.split("\n")[start_line : end_line + 1])
+        snippet, start_line = self._snippet(
+            new_file_content, replacement_start, replacement_start + len(new_str)
+        )
 
         # Prepare the success message
         success_msg = f"The file {path} has been edited. "
-        success_msg += self._make_output(
-            snippet, f"a snippet of {path}", start_line + 1
-        )
+        success_msg += self._make_output(snippet, f"a snippet of {path}", start_line)
         success_msg += "Review the changes and make sure they are as expected. Edit the file again if necessary."
 
         return CLIResult(output=success_msg)
 
     def insert(self, path: Path, insert_line: int, new_str: str):
         """Implement the insert command, which inserts new_str at the specified line in the file content."""
-        file_text = self.read_file(path).expandtabs()
-        new_str = new_str.expandtabs()
-        file_text_lines = file_text.split("\n")
-        n_lines_file = len(file_text_lines)
+        index = self._get_line_index(path)
+        if index is not None:
+            n_lines_file = index.line_count
+        else:
+            original_text = self.read_file(path)
+            n_lines_file = original_text.count("\n") + 1
 
         if insert_line < 0 or insert_line > n_lines_file:
             raise ToolError(
                 f"Invalid `insert_line` parameter: {insert_line}. It should be within the range of lines of the file: {[0, n_lines_file]}"
             )
 
-        new_str_lines = new_str.split("\n")
-        new_file_text_lines = (
-            file_text_lines[:insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line:]
-        )
-        snippet_lines = (
-            file_text_lines[max(0, insert_line - SNIPPET_LINES) : insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line : insert_line + SNIPPET_LINES]
-        )
+        # Split the file at the start of the line following `insert_line`.
+        if insert_line == n_lines_file:
+            text_before = self.read_file(path) if index is not None else original_text
+            text_after = None
+        elif index is not None:
+            text_before, text_after = index.split_at_line(insert_line + 1)
+        else:
+            text_after = original_text.split("\n", insert_line)[-1]
+            text_before = original_text[: len(original_text) - len(text_after)]
 
-        new_file_text = "\n".join(new_file_text_lines)
-        snippet = "\n".join(snippet_lines)
+        new_str = new_str.expandtabs()
+        before = text_before.expandtabs()
+        if text_after is None:
+            original_text = text_before
+            new_file_text = before + "\n" + new_str
+            insert_at = len(before) + 1
+        else:
+            original_text = text_before + text_after
+            new_file_text = before + new_str + "\n" + text_after.expandtabs()
+            insert_at = len(before)
+        snippet, start_line = self._snippet(
+            new_file_text, insert_at, insert_at + len(new_str)
+        )
 
         self.write_file(path, new_file_text)
-        self._file_history[path].append(file_text)
+        self._file_history.record(path, original_text, new_file_text)
 
         success_msg = f"The file {path} has been edited. "
         success_msg += self._make_output(
-            snippet,
-            "a snippet of the edited file",
-            max(1, insert_line - SNIPPET_LINES + 1),
+            snippet, "a snippet of the edited file", start_line
         )
         success_msg += "Review the changes and make sure they are as expected (correct indentation, no duplicate lines, etc). Edit the file again if necessary."
         return CLIResult(output=success_msg)
 
     def undo_edit(self, path: Path):
         """Implement the undo_edit command."""
-        if not self._file_history[path]:
-            raise ToolError(f"No edit history found for {path}.")
+        old_text = self._file_history.undo(path, self.read_file(path))
+        if old_text is None:
+            try:
+                path.unlink()
+            except Exception as e:
+                raise ToolError(f"Ran into {e} while trying to remove {path}") from None
+            notify_file_changed(path)
+            return CLIResult(output=f"Creation of {path} undone, the file was removed.")
 
-        old_text = self._file_history[path].pop()
         self.write_file(path, old_text)
 
         return CLIResult(
             output=f"Last edit to {path} undone successfully. {self._make_output(old_text, str(path))}"
         )
 
+    def multi_edit(self, path: Path, edits: list[dict]):
+        """Implement the multi_edit command: validate every replacement, then write all files at once."""
+        originals: Dict[Path, str] = {}
+        contents: Dict[Path, str] = {}
+        regions: Dict[Path, List[Tuple[int, int]]] = {}
+        errors = []
+        for number, edit in enumerate(edits, start=1):
+            try:
+                if not isinstance(edit, dict) or edit.get("old_str") is None:
+                    raise ToolError("`old_str` is required")
+                edit_path = self._resolve_edit_path(path, edit.get("path"))
+                if edit_path not in contents:
+                    if not edit_path.is_file():
+                        raise ToolError(f"The path {edit_path} is not an existing file")
+                    originals[edit_path] = self.read_file(edit_path)
+                    contents[edit_path] = originals[edit_path].expandtabs()
+                    regions[edit_path] = []
+
+                content = contents[edit_path]
+                old_str = edit["old_str"].expandtabs()
+                new_str = (edit.get("new_str") or "").expandtabs()
+                occurrences = content.count(old_str)
+                if occurrences != 1:
+                    problem = (
+                        "did not appear verbatim"
+                        if occurrences == 0
+                        else f"is not unique ({occurrences} occurrences)"
+                    )
+                    raise ToolError(f"old_str `{old_str}` {problem} in {edit_path}")
+
+                start = content.find(old_str)
+                contents[edit_path] = (
+                    content[:start] + new_str + content[start + len(old_str) :]
+                )
+                regions[edit_path] = _merge_region(
+                    regions[edit_path], start, start + len(old_str), len(new_str)
+                )
+            except ToolError as e:
+                errors.append(f"Edit {number}: {e.message}")
+
+        if errors:
+            raise ToolError("No edits were performed.\n" + "\n".join(errors))
+
+        staged = {p: (originals[p], contents[p]) for p in contents}
+        self._commit_files(staged)
+
+        line_ranges = {}
+        for edit_path, text in contents.items():
+            line_ranges[edit_path] = []
+            for start, end in regions[edit_path]:
+                first_line = text.count("\n", 0, start) + 1
+                line_ranges[edit_path].append(
+                    (first_line, first_line + text.count("\n", start, end))
+                )
+        return CLIResult(
+            output=f"Applied {len(edits)} edits to {len(staged)} files. "
+            + self._batch_snippet(staged, line_ranges)
+        )
+
+    def apply_patch(self, path: Path, patch: str):
+        """Implement the apply_patch command: validate every hunk, then write all files at once."""
+        try:
+            patch_set = PatchSet(patch)
+        except UnidiffParseError as e:
+            raise ToolError(f"Invalid unified diff: {e}") from None
+        if not len(patch_set):
+            raise ToolError("The patch does not contain any file changes")
+
+        staged: Dict[Path, Tuple[Optional[str], Optional[str]]] = {}
+        line_ranges: Dict[Path, List[Tuple[int, int]]] = {}
+        errors = []
+        for patched_file in patch_set:
+            try:
+                file_path = self._resolve_edit_path(path, patched_file.path)
+                if file_path in staged:
+                    raise ToolError(f"{file_path} is patched more than once")
+                if patched_file.is_added_file:
+                    if file_path.exists():
+                        raise ToolError(f"Cannot create {file_path}, it already exists")
+                    original, lines = None, []
+                else:
+                    if not file_path.is_file():
+                        raise ToolError(f"The path {file_path} is not an existing file")
+                    original = self.read_file(file_path)
+                    lines = _split_lines(original)
+
+                if patched_file.is_removed_file:
+                    staged[file_path] = (original, None)
+                    continue
+                new_lines, line_ranges[file_path] = _apply_hunks(
+                    file_path, lines, patched_file
+                )
+                staged[file_path] = (original, "".join(new_lines))
+            except ToolError as e:
+                errors.append(e.message)
+
+        if errors:
+            raise ToolError("The patch was not applied.\n" + "\n".join(errors))
+
+        self._commit_files(staged)
+        return CLIResult(
+            output=f"Applied the patch to {len(staged)} files. "
+            + self._batch_snippet(staged, line_ranges)
+        )
+
+    def _resolve_edit_path(self, base: Path, name: str | None) -> Path:
+        """Resolve a path of a batch edit against the command's `path`."""
+        if not name:
+            if base.is_dir():
+                raise ToolError(f"A file path is required, {base} is a directory")
+            return base
+        edit_path = Path(name)
+        if not edit_path.is_absolute():
+            edit_path = (base if base.is_dir() else base.parent) / edit_path
+        return Path(os.path.normpath(edit_path))
+
+    def _commit_files(
+        self, staged: Dict[Path, Tuple[Optional[str], Optional[str]]]
+    ) -> None:
+        """
+        Write every staged (original, new) text at once: new contents go to
+        temporary files next to their targets which are then renamed over them,
+        and a failure midway restores the files changed so far. A new text of
+        None deletes the file.
+        """
+        temp_files: Dict[Path, str] = {}
+        try:
+            for file_path, (original, new_text) in staged.items():
+                if new_text is None:
+                    continue
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                fd, temp_name = tempfile.mkstemp(
+                    prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent
+                )
+                temp_files[file_path] = temp_name
+                with os.fdopen(fd, "w") as f:
+                    f.write(new_text)
+                if original is not None:
+                    shutil.copymode(file_path, temp_name)
+                else:
+                    # mkstemp creates files readable by their owner only
+                    os.chmod(temp_name, _default_file_mode())
+        except Exception as e:
+            for temp_name in temp_files.values():
+                Path(temp_name).unlink(missing_ok=True)
+            raise ToolError(
+                f"Ran into {e} while preparing the edits, no file was changed"
+            ) from None
+
+        changed: List[Path] = []
+        try:
+            for file_path, (_, new_text) in staged.items():
+                if new_text is None:
+                    file_path.unlink()
+                else:
+                    os.replace(temp_files.pop(file_path), file_path)
+                changed.append(file_path)
+                notify_file_changed(file_path)
+        except Exception as e:
+            for temp_name in temp_files.values():
+                Path(temp_name).unlink(missing_ok=True)
+            for file_path in changed:
+                original = staged[file_path][0]
+                if original is None:
+                    file_path.unlink(missing_ok=True)
+                else:
+                    file_path.write_text(original)
+            raise ToolError(
+                f"Ran into {e} while writing the edits, the changed files were restored"
+            ) from None
+
+        for file_path, (original, new_text) in staged.items():
+            # Deletions cannot be undone with undo_edit.
+            if new_text is not None:
+                self._file_history.record(file_path, original, new_text)
+
+    def _batch_snippet(
+        self,
+        staged: Dict[Path, Tuple[Optional[str], Optional[str]]],
+        line_ranges: Dict[Path, List[Tuple[int, int]]],
+    ) -> str:
+        """One compact snippet of every changed region of every file."""
+        output = ["Here's the result of running `cat -n` on the changed regions:"]
+        for file_path, (original, new_text) in staged.items():
+            if new_text is None:
+                output.append(f"--- {file_path} (deleted)")
+                continue
+            output.append(f"--- {file_path}{' (created)' if original is None else ''}")
+            lines = new_text.split("\n")
+            blocks: List[List[int]] = []
+            for first, last in line_ranges.get(file_path, []):
+                first = max(1, first - BATCH_SNIPPET_LINES)
+                last = min(len(lines), last + BATCH_SNIPPET_LINES)
+                if blocks and first <= blocks[-1][1] + 1:
+                    blocks[-1][1] = max(blocks[-1][1], last)
+                else:
+                    blocks.append([first, last])
+            for i, (first, last) in enumerate(blocks):
+                if i:
+                    output.append("   ...")
+                output.extend(
+                    f"{number:6}\t{lines[number - 1]}"
+                    for number in range(first, last + 1)
+                )
+        output.append(
+            "Review the changes and make sure they are as expected. Edit the files again if necessary."
+        )
+        return maybe_truncate("\n".join(output) + "\n")
+
+    def _snippet(self, text: str, start: int, end: int) -> Tuple[str, int]:
+        """The edited region text[start:end] with context lines, and its first line number."""
+        region_start, region_end = _expand_to_lines(
+            text, start, end, SNIPPET_LINES, SNIPPET_LINES
+        )
+        return text[region_start:region_end], text.count("\n", 0, region_start) + 1
+
+    def _get_line_index(self, path: Path) -> Optional[_LineIndex]:
+        """Return a current line index for a large file, or None to read it whole."""
+        try:
+            stat = path.stat()
+            if stat.st_size < LINE_INDEX_MIN_BYTES:
+                return None
+            index = self._line_indexes.get(path)
+            if index is None or not index.is_current(stat):
+                index = _LineIndex(path)
+                self._line_indexes[path] = index
+                while len(self._line_indexes) > MAX_LINE_INDEXES:
+                    self._line_indexes.popitem(last=False)
+        except OSError:
+            # Let the regular read report the problem.
+            return None
+        self._line_indexes.move_to_end(path)
+        return index if index.usable else None
+
     def read_file(self, path: Path):
         """Read the content of a file from a given path; raise a ToolError if an error occurs."""
         try:
@@ -317,6 +1002,7 @@ class StrReplaceEditor(BaseTool):
             path.write_text(file)
         except Exception as e:
             raise ToolError(f"Ran into {e} while trying to write to {path}") from None
+        notify_file_changed(path)
 
     def _make_output(
         self,
@@ -0,0 +1,373 @@
+"""Python symbol table of a workspace, built with `ast` and refreshed per file."""
+
+import ast
+import asyncio
+import os
+from collections import defaultdict
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, List, Literal, NamedTuple, Optional, Set, get_args
+
+from app.exceptions import ToolError
+from app.tool.base import BaseTool, CLIResult
+from app.tool.workspace import WorkspaceIndex, get_workspace_index
+
+
+Command = Literal["definition", "callers", "outline"]
+
+MAX_LINE_CHARS = 200
+
+
+class _Symbol(NamedTuple):
+    kind: str  # "class", "function" or "method", maybe "async"
+    qualname: str
+    lineno: int
+    end_lineno: int
+    signature: str
+    depth: int
+
+
+class _Import(NamedTuple):
+    module: str
+    name: Optional[str]  # None for `import module`
+    alias: Optional[str]
+    lineno: int
+
+    def __str__(self) -> str:
+        alias = f" as {self.alias}" if self.alias else ""
+        if self.name is None:
+            return f"import {self.module}{alias}"
+        return f"from {self.module} import {self.name}{alias}"
+
+
+class _Call(NamedTuple):
+    name: str
+    lineno: int
+    caller: str  # qualified name of the enclosing definition or "<module>"
+
+
+class _ModuleSymbols(NamedTuple):
+    module: str
+    symbols: List[_Symbol]
+    imports: List[_Import]
+    calls: List[_Call]
+    error: Optional[str] = None
+
+
+def _called_name(func: ast.expr) -> Optional[str]:
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return None
+
+
+class _SymbolCollector(ast.NodeVisitor):
+    def __init__(self):
+        self.symbols: List[_Symbol] = []
+        self.imports: List[_Import] = []
+        self.calls: List[_Call] = []
+        self._scope: List[ast.AST] = []
+        self._names: List[str] = []
+
+    def _define(self, node, kind: str, signature: str) -> None:
+        qualname = ".".join(self._names + [node.name])
+        self.symbols.append(
+            _Symbol(
+                kind,
+                qualname,
+                node.lineno,
+                node.end_lineno or node.lineno,
+                signature,
+                len(self._names),
+            )
+        )
+        self._scope.append(node)
+        self._names.append(node.name)
+        self.generic_visit(node)
+        self._scope.pop()
+        self._names.pop()
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        bases = ", ".join(ast.unparse(base) for base in node.bases)
+        self._define(node, "class", f"({bases})" if bases else "")
+
+    def visit_FunctionDef(self, node) -> None:
+        in_class = bool(self._scope) and isinstance(self._scope[-1], ast.ClassDef)
+        signature = f"({ast.unparse(node.args)})"
+        if node.returns is not None:
+            signature += f" -> {ast.unparse(node.returns)}"
+        kind = "method" if in_class else "function"
+        if isinstance(node, ast.AsyncFunctionDef):
+            kind = f"async {kind}"
+        self._define(node, kind, signature)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self.imports.append(_Import(alias.name, None, alias.asname, node.lineno))
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        module = "." * node.level + (node.module or "")
+        for alias in node.names:
+            self.imports.append(_Import(module, alias.name, alias.asname, node.lineno))
+
+    def visit_Call(self, node: ast.Call) -> None:
+        name = _called_name(node.func)
+        if name:
+            caller = ".".join(self._names) or "<module>"
+            self.calls.append(_Call(name, node.lineno, caller))
+        self.generic_visit(node)
+
+
+def _module_name(root: Path, path: str) -> str:
+    parts = list(Path(os.path.relpath(path, root)).with_suffix("").parts)
+    if parts and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts) or Path(path).stem
+
+
+def parse_module(root: Path, path: str) -> _ModuleSymbols:
+    """Collect the symbols of one Python file. Raises OSError if unreadable."""
+    with open(path, "rb") as f:
+        source = f.read()
+    module = _module_name(root, path)
+    try:
+        tree = ast.parse(source, filename=path)
+    except (SyntaxError, ValueError) as e:
+        return _ModuleSymbols(module, [], [], [], error=str(e))
+    collector = _SymbolCollector()
+    collector.visit(tree)
+    return _ModuleSymbols(module, collector.symbols, collector.imports, collector.calls)
+
+
+def _matches(symbol: str, module: str, qualname: str) -> bool:
+    """Whether `symbol` (a name or dotted suffix) designates `module.qualname`."""
+    full = f"{module}.{qualname}"
+    return qualname == symbol or full == symbol or full.endswith("." + symbol)
+
+
+class _SymbolIndex(WorkspaceIndex):
+    """
+    Definitions, imports and call sites of the Python files under one root,
+    with reverse maps from a simple name to the files defining or calling it.
+    """
+
+    def __init__(self, root: Path):
+        super().__init__(root)
+        self._modules: Dict[str, _ModuleSymbols] = {}
+        self._defined_in: Dict[str, Set[str]] = defaultdict(set)
+        self._called_in: Dict[str, Set[str]] = defaultdict(set)
+        self._imported_in: Dict[str, Set[str]] = defaultdict(set)
+
+    def accepts(self, path: str) -> bool:
+        return path.endswith((".py", ".pyi"))
+
+    @staticmethod
+    def _imported_names(symbols: _ModuleSymbols) -> Set[str]:
+        return {(imp.name or imp.module).rsplit(".", 1)[-1] for imp in symbols.imports}
+
+    def update_file(self, path: str, stat: os.stat_result) -> None:
+        symbols = parse_module(self.root, path)
+        if path in self._modules:
+            self.remove_file(path)
+        self._modules[path] = symbols
+        for symbol in symbols.symbols:
+            self._defined_in[symbol.qualname.rsplit(".", 1)[-1]].add(path)
+        for call in symbols.calls:
+            self._called_in[call.name].add(path)
+        for name in self._imported_names(symbols):
+            self._imported_in[name].add(path)
+
+    def remove_file(self, path: str) -> None:
+        symbols = self._modules.pop(path, None)
+        if symbols is None:
+            return
+        for reverse_map, names in (
+            (
+                self._defined_in,
+                {s.qualname.rsplit(".", 1)[-1] for s in symbols.symbols},
+            ),
+            (self._called_in, {call.name for call in symbols.calls}),
+            (self._imported_in, self._imported_names(symbols)),
+        ):
+            for name in names:
+                reverse_map[name].discard(path)
+                if not reverse_map[name]:
+                    del reverse_map[name]
+
+    def definitions(self, symbol: str, scope: Optional[Path] = None) -> List[str]:
+        """Definitions of `symbol` in the files under `scope` (default: root)."""
+        scope = scope or self.root
+        with self.lock:
+            self.refresh()
+            name = symbol.rsplit(".", 1)[-1]
+            results = []
+            for path in self._in_scope(self._defined_in.get(name, ()), scope):
+                module = self._modules[path]
+                for s in module.symbols:
+                    if _matches(symbol, module.module, s.qualname):
+                        results.append(
+                            f"{os.path.relpath(path, scope)}:{s.lineno}-{s.end_lineno}: "
+                            f"{s.kind} {module.module}.{s.qualname}{s.signature}"
+                        )
+            return results
+
+    def callers(self, symbol: str, scope: Optional[Path] = None) -> List[str]:
+        """Call sites and imports of `symbol` under `scope` (default: root)."""
+        scope = scope or self.root
+        with self.lock:
+            self.refresh()
+            name = symbol.rsplit(".", 1)[-1]
+            found = []
+            for path in self._in_scope(self._called_in.get(name, ()), scope):
+                calls = [c for c in self._modules[path].calls if c.name == name]
+                found.append((path, calls))
+            imports = []
+            for path in self._in_scope(self._imported_in.get(name, ()), scope):
+                for imp in self._modules[path].imports:
+                    if (imp.name or imp.module).rsplit(".", 1)[-1] == name:
+                        imports.append(
+                            f"{os.path.relpath(path, scope)}:{imp.lineno}: {imp}"
+                        )
+
+        results = []
+        for path, calls in found:
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    lines = f.read().split("\n")
+            except OSError:
+                lines = []
+            for call in calls:
+                text = (
+                    lines[call.lineno - 1].strip() if call.lineno <= len(lines) else ""
+                )
+                results.append(
+                    f"{os.path.relpath(path, scope)}:{call.lineno}: in {call.caller}: "
+                    f"{text[:MAX_LINE_CHARS]}"
+                )
+        return results + imports
+
+    @staticmethod
+    def _in_scope(paths: Set[str], scope: Path) -> List[str]:
+        prefix = str(scope) + os.sep
+        return sorted(path for path in paths if path.startswith(prefix))
+
+
+def _package_root(path: Path) -> Path:
+    """The directory a file's dotted module name is relative to."""
+    root = path.parent
+    while (root / "__init__.py").exists() and root.parent != root:
+        root = root.parent
+    return root
+
+
+def outline(root: Path, path: Path) -> str:
+    """The imports and (nested) definitions of one file, with line ranges."""
+    symbols = parse_module(root, str(path))
+    if symbols.error:
+        return f"{path} could not be parsed: {symbols.error}"
+    lines = [f"Outline of {path} (module {symbols.module}):"]
+    for (lineno, module, is_from), group in groupby(
+        symbols.imports, key=lambda imp: (imp.lineno, imp.module, imp.name is not None)
+    ):
+        if is_from:
+            names = ", ".join(
+                imp.name + (f" as {imp.alias}" if imp.alias else "") for imp in group
+            )
+            lines.append(f"{lineno} from {module} import {names}")
+        else:
+            lines.extend(f"{lineno} {imp}" for imp in group)
+    for s in symbols.symbols:
+        name = s.qualname.rsplit(".", 1)[-1]
+        lines.append(
+            f"{'    ' * s.depth}{s.lineno}-{s.end_lineno} {s.kind} {name}{s.signature}"
+        )
+    if not symbols.symbols:
+        lines.append("(no classes or functions)")
+    return "\n".join(lines)
+
+
+class PythonSymbols(BaseTool):
+    name: str = "python_symbols"
+    description: str = """Navigate Python code through a symbol table of the workspace, kept up to date as files change.
+* `definition`: where is `symbol` defined? `symbol` can be a name (`run`), a qualified name (`Bash.execute`) or a dotted module path (`app.tool.bash.Bash`).
+* `callers`: who calls `symbol`, and which files import it? Calls are matched by name, so methods with the same name in different classes are listed together.
+* `outline`: the imports, classes, functions and methods of the file at `path`, with their line ranges and signatures.
+"""
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "command": {
+                "description": "The query to run. Allowed options are: `definition`, `callers`, `outline`.",
+                "enum": list(get_args(Command)),
+                "type": "string",
+            },
+            "symbol": {
+                "description": "Required parameter of `definition` and `callers` commands, the name to look up.",
+                "type": "string",
+            },
+            "path": {
+                "description": "Absolute path of the workspace directory to search for `definition` and `callers` (defaults to the current working directory), or of the file to outline for `outline`.",
+                "type": "string",
+            },
+            "max_results": {
+                "description": "Optional maximum number of results of `definition` and `callers` commands. Default is 50.",
+                "type": "integer",
+            },
+        },
+        "required": ["command"],
+    }
+
+    async def execute(
+        self,
+        command: Command,
+        symbol: Optional[str] = None,
+        path: Optional[str] = None,
+        max_results: int = 50,
+        **kwargs,
+    ) -> CLIResult:
+        """
+        Run a symbol table query.
+
+        Args:
+            command (str): One of `definition`, `callers` or `outline`.
+            symbol (str, optional): Name to look up for `definition`/`callers`.
+            path (str, optional): Workspace directory, or the file to outline.
+            max_results (int): Maximum number of results returned.
+
+        Returns:
+            CLIResult: The query results.
+        """
+        target = Path(path) if path else Path.cwd()
+        if command == "outline":
+            if not path or not target.is_file():
+                raise ToolError(
+                    "Parameter `path` must be an existing file for `outline`"
+                )
+            try:
+                text = await asyncio.to_thread(outline, _package_root(target), target)
+            except OSError as e:
+                raise ToolError(f"Ran into {e} while trying to read {target}") from None
+            return CLIResult(output=text)
+
+        if command not in ("definition", "callers"):
+            raise ToolError(
+                f"Unrecognized command {command}. The allowed commands for the {self.name} tool are: {', '.join(get_args(Command))}"
+            )
+        if not symbol:
+            raise ToolError(f"Parameter `symbol` is required for command: {command}")
+        if not target.is_dir():
+            raise ToolError(f"The path {target} is not a directory")
+
+        index = get_workspace_index(_SymbolIndex, target)
+        query = index.definitions if command == "definition" else index.callers
+        results = await asyncio.to_thread(query, symbol, target.resolve())
+        if not results:
+            what = "definition" if command == "definition" else "callers or imports"
+            return CLIResult(output=f"No {what} of `{symbol}` found in {target}.")
+        header = f"{len(results)} results for `{symbol}` in {target}"
+        if len(results) > max_results:
+            header += f", showing the first {max_results}"
+        return CLIResult(output=header + ":\n" + "\n".join(results[:max_results]))
@@ -1,83 +1,477 @@
 import asyncio
+import itertools
 import os
 import shlex
-from typing import Optional
+import shutil
+import signal
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import Field
 
 from app.tool.base import BaseTool, CLIResult
 
 
+# Environment variables that describe the shell itself rather than the session.
+_SHELL_ENV_VARS = {"_", "SHLVL", "PWD", "OLDPWD", "_TERMINAL_STATE_FILE"}
+
+
+# Reserved words opening a compound command, with the word closing it
+_OPENERS = {"do": "done", "if": "fi", "case": "esac", "{": "}"}
+_CLOSERS = {closer: opener for opener, closer in _OPENERS.items()}
+# Loop heads, open until their `do`
+_LOOPS = {"for", "select", "while", "until"}
+# Reserved words after which another command, so another reserved word, starts
+_PREFIX_WORDS = {"do", "then", "else", "elif", "if", "while", "until", "!", "{", "time"}
+_WORD_BREAKS = " \t\n;&|()<>"
+
+
+def _close(stack: List[str], opener: str) -> None:
+    """Pop the innermost `opener` and anything left open inside it."""
+    if opener in stack:
+        del stack[len(stack) - 1 - stack[::-1].index(opener) :]
+
+
+def _quoted_end(command: str, i: int) -> int:
+    """Index just past the quoted string (', " or `) starting at `i`."""
+    quote, j = command[i], i + 1
+    while j < len(command) and command[j] != quote:
+        j += 2 if command[j] == "\\" and quote != "'" else 1
+    return min(j + 1, len(command))
+
+
+def _heredoc_end(command: str, i: int, delimiter: str, strip_tabs: bool) -> int:
+    """Index of the end of the delimiter line of a heredoc body starting at `i`."""
+    while i < len(command):
+        end = command.find("\n", i)
+        end = len(command) if end == -1 else end
+        line = command[i:end]
+        if (line.lstrip("\t") if strip_tabs else line) == delimiter:
+            return end
+        i = end + 1
+    return len(command)
+
+
+def split_background(command: str) -> List[Tuple[str, bool]]:
+    """
+    Split a command line on top-level background operators (`&`).
+
+    `&` inside subshells, command substitutions, brace groups, loops and other
+    compound commands, heredocs, quotes or comments is left to bash, as are
+    `&&`, `|&`, `&>` and redirections such as `2>&1`. As in bash, `a; b &`
+    only sends `b` to the background.
+
+    Returns:
+        The commands as (command, in background) pairs, in the order to run them.
+    """
+    parts: List[Tuple[str, bool]] = []
+    current: List[str] = []
+    list_start = 0  # start of the last top-level list in `current`
+    stack: List[str] = []  # open "(", "${" and compound command reserved words
+    heredocs: List[Tuple[str, bool]] = []  # pending (delimiter, strip tabs)
+    word: List[str] = []
+    command_start = True
+
+    def end_word():
+        nonlocal command_start
+        text = "".join(word)
+        word.clear()
+        if not text:
+            return
+        if command_start and text == "do" and stack and stack[-1] in _LOOPS:
+            stack[-1] = text
+        elif command_start and (text in _OPENERS or text in _LOOPS):
+            stack.append(text)
+        elif command_start and text in _CLOSERS:
+            _close(stack, _CLOSERS[text])
+        command_start = command_start and text in _PREFIX_WORDS
+
+    i = 0
+    while i < len(command):
+        char = command[i]
+        pair = command[i : i + 2]
+        if char not in _WORD_BREAKS:
+            if char == "#" and not word:
+                end = command.find("\n", i)
+                end = len(command) if end == -1 else end
+            elif char == "\\":
+                end = i + 2
+            elif char in "'\"`":
+                end = _quoted_end(command, i)
+            elif pair == "$(":
+                stack.append("(")
+                word.append(pair)
+                current.append(pair)
+                end_word()
+                command_start = True
+                i += 2
+                continue
+            elif pair == "${":
+                stack.append("${")
+                end = i + 2
+            else:
+                if char == "}" and stack and stack[-1] == "${":
+                    stack.pop()
+                end = i + 1
+            if char != "#" or word:
+                word.append(command[i:end])
+            current.append(command[i:end])
+            i = end
+            continue
+
+        end_word()
+        end = i + 1
+        if char == "\n" and heredocs:
+            # Skip the heredoc bodies; the newline ending the last one
+            # is then handled as any other.
+            for delimiter, strip_tabs in heredocs:
+                end = _heredoc_end(command, end, delimiter, strip_tabs) + 1
+            heredocs.clear()
+            end -= 1
+        elif char == "\n" or (char == ";" and pair != ";;"):
+            current.append(char)
+            if not stack:
+                list_start = len(current)
+            command_start = True
+            i += 1
+            continue
+        elif char in ";|" or pair == "&&":
+            # `;;`, `;;&`, `||`, `|&`: no background operator
+            end = i + 2 if pair in (";;", "||", "|&", "&&") else i + 1
+            command_start = True
+        elif char == "&" and (command[i - 1 : i] in ("<", ">") or pair == "&>"):
+            pass  # a redirection
+        elif char == "&":
+            command_start = True
+            if not stack:
+                foreground = "".join(current[: max(list_start - 1, 0)]).strip()
+                background = "".join(current[list_start:]).strip()
+                parts.extend(
+                    (text, in_background)
+                    for text, in_background in ((foreground, False), (background, True))
+                    if text
+                )
+                current, list_start = [], 0
+                i += 1
+                continue
+        elif char == "(":
+            stack.append("(")
+            command_start = True
+        elif char == ")":
+            # In a case statement, `)` ends a pattern
+            if not (stack and stack[-1] == "case"):
+                _close(stack, "(")
+            command_start = True
+        elif pair == "<<" and command[i : i + 3] != "<<<":
+            end = i + 2 + (command[i + 2 : i + 3] == "-")
+            while end < len(command) and command[end] in " \t":
+                end += 1
+            delimiter_start = end
+            while end < len(command) and command[end] not in _WORD_BREAKS:
+                if command[end] in "'\"":
+                    end = _quoted_end(command, end)
+                else:
+                    end += 1
+            delimiter = command[delimiter_start:end]
+            heredocs.append(
+                (
+                    "".join(c for c in delimiter if c not in "'\"\\"),
+                    command[i + 2 : i + 3] == "-",
+                )
+            )
+        current.append(command[i:end])
+        i = end
+
+    end_word()
+    foreground = "".join(current).strip()
+    if foreground:
+        parts.append((foreground, False))
+    return parts
+
+
+class _BackgroundJob:
+    """A command started in the background by a terminal."""
+
+    def __init__(
+        self,
+        job_id: int,
+        command: str,
+        process: asyncio.subprocess.Process,
+        log_path: str,
+    ):
+        self.id = job_id
+        self.command = command
+        self.process = process
+        self.log_path = log_path
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._waiter = asyncio.create_task(self._wait())
+
+    async def _wait(self):
+        await self.process.wait()
+        self.finished_at = time.time()
+
+    @property
+    def running(self) -> bool:
+        return self.process.returncode is None
+
+    def describe(self) -> str:
+        if self.running:
+            state = f"running for {time.time() - self.started_at:.0f}s"
+        else:
+            state = f"exited with code {self.process.returncode}"
+        return f"[{self.id}] pid {self.process.pid} {state}: {self.command}"
+
+    def read_output(self, max_chars: int) -> str:
+        try:
+            with open(self.log_path, "r", errors="replace") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - max_chars))
+                return f.read()
+        except OSError:
+            return ""
+
+    async def kill(self):
+        if self.running:
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            try:
+                await asyncio.wait_for(asyncio.shield(self._waiter), timeout=5)
+            except asyncio.TimeoutError:
+                try:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        await self._waiter
+
+
 class Terminal(BaseTool):
     name: str = "execute_command"
     description: str = """Request to execute a CLI command on the system.
 Use this when you need to perform system operations or run specific commands to accomplish any step in the user's task.
 You must tailor your command to the user's system and provide a clear explanation of what the command does.
 Prefer to execute complex CLI commands over creating executable scripts, as they are more flexible and easier to run.
-Commands will be executed in the current working directory.
-Note: You MUST append a `sleep 0.05` to the end of the command for commands that will complete in under 50ms, as this will circumvent a known issue with the terminal tool where it will sometimes not return the output when the command completes too quickly.
+Commands will be executed in the current working directory. Changes to the working directory and exported environment variables persist between calls.
+Commands ending with `&` are started as background jobs; use the `jobs`, `job_output` and `kill_job` actions to inspect and stop them.
 """
     parameters: dict = {
         "type": "object",
         "properties": {
             "command": {
                 "type": "string",
-                "description": "(required) The CLI command to execute. This should be valid for the current operating system. Ensure the command is properly formatted and does not contain any harmful instructions.",
-            }
+                "description": "(required for `run`) The CLI command to execute. This should be valid for the current operating system. Ensure the command is properly formatted and does not contain any harmful instructions.",
+            },
+            "action": {
+                "type": "string",
+                "enum": ["run", "jobs", "job_output", "kill_job"],
+                "description": "(optional) `run` (default) executes `command`; `jobs` lists background jobs; `job_output` shows the latest output of `job_id`; `kill_job` stops `job_id`.",
+            },
+            "job_id": {
+                "type": "integer",
+                "description": "(optional) Background job id for the `job_output` and `kill_job` actions.",
+            },
         },
-        "required": ["command"],
+        "required": [],
     }
-    process: Optional[asyncio.subprocess.Process] = None
-    current_path: str = os.getcwd()
-    lock: asyncio.Lock = asyncio.Lock()
+    current_path: str = Field(default_factory=os.getcwd)
+    env: Dict[str, str] = Field(default_factory=lambda: dict(os.environ))
+    timeout: float = 120.0  # seconds
+    max_finished_jobs: int = 20
+    max_job_output: int = 16000
 
-    async def execute(self, command: str) -> CLIResult:
+    _processes: Optional[set] = None
+    _jobs: Optional[Dict[int, _BackgroundJob]] = None
+    _job_ids: Optional[itertools.count] = None
+    _job_dir: Optional[str] = None
+
+    async def execute(
+        self,
+        command: Optional[str] = None,
+        action: str = "run",
+        job_id: Optional[int] = None,
+    ) -> CLIResult:
         """
         Execute a terminal command asynchronously with persistent context.
 
         Args:
             command (str): The terminal command to execute.
+            action (str): One of run, jobs, job_output or kill_job.
+            job_id (int): The background job targeted by job_output and kill_job.
 
         Returns:
             str: The output, and error of the command execution.
         """
-        # Split the command by & to handle multiple commands
-        commands = [cmd.strip() for cmd in command.split('&') if cmd.strip()]
-        final_output = CLIResult(output="", error="")
+        self._reap_jobs()
+
+        if action == "jobs":
+            return self._list_jobs()
+        if action in ("job_output", "kill_job"):
+            job = (self._jobs or {}).get(job_id)
+            if job is None:
+                return CLIResult(output="", error=f"No background job with id {job_id}")
+            if action == "kill_job":
+                await job.kill()
+                return CLIResult(output=job.describe(), error="")
+            output = f"{job.describe()}\n{job.read_output(self.max_job_output)}"
+            return CLIResult(output=output.rstrip(), error="")
+        if action != "run":
+            return CLIResult(output="", error=f"Unknown action: {action}")
+        if not command:
+            return CLIResult(output="", error="Parameter `command` is required")
 
-        for cmd in commands:
-            sanitized_command = self._sanitize_command(cmd)
+        sanitized_command = self._sanitize_command(command)
+        outputs, errors = [], []
+        for cmd, in_background in split_background(sanitized_command):
+            if in_background:
+                job = await self._start_job(cmd)
+                outputs.append(f"Started background job {job.describe()}")
+                continue
 
-            # Handle 'cd' command internally
-            if sanitized_command.lstrip().startswith("cd "):
-                result = await self._handle_cd_command(sanitized_command)
+            # Handle a bare 'cd' command internally
+            if cmd.startswith("cd ") and not any(
+                op in cmd for op in (";", "&", "|", "`", "$(", "\n")
+            ):
+                result = await self._handle_cd_command(cmd)
             else:
-                async with self.lock:
-                    try:
-                        self.process = await asyncio.create_subprocess_shell(
-                            sanitized_command,
-                            stdout=asyncio.subprocess.PIPE,
-                            stderr=asyncio.subprocess.PIPE,
-                            cwd=self.current_path,
-                        )
-                        stdout, stderr = await self.process.communicate()
-                        result = CLIResult(
-                            output=stdout.decode().strip(),
-                            error=stderr.decode().strip()
-                        )
-                    except Exception as e:
-                        result = CLIResult(output="", error=str(e))
-                    finally:
-                        self.process = None
-
-            # Combine outputs
+                result = await self._run_foreground(cmd)
             if result.output:
-                final_output.output += (result.output + "\n") if final_output.output else result.output
+                outputs.append(result.output)
             if result.error:
-                final_output.error += (result.error + "\n") if final_output.error else result.error
+                errors.append(result.error)
+
+        return CLIResult(
+            output="\n".join(outputs).rstrip(), error="\n".join(errors).rstrip()
+        )
+
+    async def _run_foreground(self, command: str) -> CLIResult:
+        """Run a command in its own shell and capture the resulting cwd and env."""
+        state_fd, state_file = tempfile.mkstemp(prefix="terminal_state_")
+        os.close(state_fd)
+        script = (
+            f"{command}\n"
+            "__terminal_status=$?\n"
+            '{ pwd; env -0; } > "$_TERMINAL_STATE_FILE"\n'
+            "exit $__terminal_status\n"
+        )
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "/bin/bash",
+                "-c",
+                script,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self.current_path,
+                env={**self.env, "_TERMINAL_STATE_FILE": state_file},
+                start_new_session=True,
+            )
+            self._track(process)
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(), timeout=self.timeout
+            )
+            self._load_state(state_file)
+            return CLIResult(
+                output=stdout.decode(errors="replace").strip(),
+                error=stderr.decode(errors="replace").strip(),
+            )
+        except asyncio.TimeoutError:
+            await self._kill(process)
+            return CLIResult(
+                output="",
+                error=f"Command timed out after {self.timeout} seconds and was killed. Run long commands in the background with a trailing `&`.",
+            )
+        except Exception as e:
+            return CLIResult(output="", error=str(e))
+        finally:
+            if process is not None:
+                self._processes.discard(process)
+            os.unlink(state_file)
+
+    def _load_state(self, state_file: str) -> None:
+        """Adopt the working directory and environment left by the last command."""
+        with open(state_file, "rb") as f:
+            data = f.read().decode(errors="replace")
+        if "\n" not in data:
+            # The command exited before reaching the state trailer.
+            return
+        path, env_block = data.split("\n", 1)
+        if os.path.isdir(path):
+            self.current_path = path
+        env = {}
+        for entry in env_block.split("\0"):
+            key, sep, value = entry.partition("=")
+            if sep and key not in _SHELL_ENV_VARS:
+                env[key] = value
+        if env:
+            self.env = env
+
+    async def _start_job(self, command: str) -> _BackgroundJob:
+        """Start a command in the background with its output sent to a log file."""
+        if self._jobs is None:
+            self._jobs = {}
+            self._job_ids = itertools.count(1)
+        if self._job_dir is None:
+            self._job_dir = tempfile.mkdtemp(prefix="terminal_jobs_")
+
+        job_id = next(self._job_ids)
+        log_path = os.path.join(self._job_dir, f"job_{job_id}.log")
+        with open(log_path, "wb") as log:
+            process = await asyncio.create_subprocess_exec(
+                "/bin/bash",
+                "-c",
+                command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=log,
+                stderr=asyncio.subprocess.STDOUT,
+                cwd=self.current_path,
+                env=self.env,
+                start_new_session=True,
+            )
+        job = _BackgroundJob(job_id, command, process, log_path)
+        self._jobs[job_id] = job
+        return job
+
+    def _reap_jobs(self) -> None:
+        """Forget the oldest finished jobs beyond `max_finished_jobs`."""
+        if not self._jobs:
+            return
+        finished = sorted(
+            (job for job in self._jobs.values() if not job.running),
+            key=lambda job: job.finished_at or job.started_at,
+        )
+        for job in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job.id]
+            try:
+                os.unlink(job.log_path)
+            except OSError:
+                pass
+
+    def _list_jobs(self) -> CLIResult:
+        if not self._jobs:
+            return CLIResult(output="No background jobs", error="")
+        return CLIResult(
+            output="\n".join(job.describe() for job in self._jobs.values()), error=""
+        )
 
-        # Remove trailing newlines
-        final_output.output = final_output.output.rstrip()
-        final_output.error = final_output.error.rstrip()
-        return final_output
+    def _track(self, process: asyncio.subprocess.Process) -> None:
+        if self._processes is None:
+            self._processes = set()
+        self._processes.add(process)
+
+    @staticmethod
+    async def _kill(process: Optional[asyncio.subprocess.Process]) -> None:
+        """Kill a foreground process group and reap it."""
+        if process is None or process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
 
     async def execute_in_env(self, env_name: str, command: str) -> CLIResult:
         """
@@ -161,17 +555,19 @@ Note: You MUST append a `sleep 0.05` to the end of the command for commands that
         return command
 
     async def close(self):
-        """Close the persistent shell process if it exists."""
-        async with self.lock:
-            if self.process:
-                self.process.terminate()
-                try:
-                    await asyncio.wait_for(self.process.wait(), timeout=5)
-                except asyncio.TimeoutError:
-                    self.process.kill()
-                    await self.process.wait()
-                finally:
-                    self.process = None
+        """Kill all foreground commands and background jobs of this terminal."""
+        for process in list(self._processes or ()):
+            await self._kill(process)
+        for job in list((self._jobs or {}).values()):
+            await job.kill()
+        self._jobs = None
+        if self._job_dir is not None:
+            shutil.rmtree(self._job_dir, ignore_errors=True)
+            self._job_dir = None
+
+    async def cleanup(self):
+        """Release the terminal's processes when its session ends."""
+        await self.close()
 
     async def __aenter__(self):
         """Enter the asynchronous context manager."""
@@ -1,22 +1,63 @@
 """Collection classes for managing multiple tools."""
-from typing import Any, Dict, List
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
 
 from app.exceptions import ToolError
+from app.logger import logger
 from app.tool.base import BaseTool, ToolFailure, ToolResult
 
 
+@lru_cache(maxsize=1)
+def _token_counter() -> Callable[[str], int]:
+    """Count tokens with tiktoken when available, else estimate from length."""
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text))
+    except Exception as e:  # not installed, or its data cannot be downloaded
+        logger.debug(f"tiktoken unavailable ({e}), estimating token counts")
+        return lambda text: (len(text) + 3) // 4
+
+
+def _canonical(param: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of a tool param with every object's keys in sorted order."""
+    return json.loads(json.dumps(param, sort_keys=True))
+
+
 class ToolCollection:
     """A collection of defined tools."""
 
     def __init__(self, *tools: BaseTool):
         self.tools = tools
         self.tool_map = {tool.name: tool for tool in tools}
+        self._params: Optional[List[Dict[str, Any]]] = None
 
     def __iter__(self):
         return iter(self.tools)
 
     def to_params(self) -> List[Dict[str, Any]]:
-        return [tool.to_param() for tool in self.tools]
+        """
+        The tool params sent to the LLM, built once per set of tools.
+
+        They are sorted by tool name with canonical key order, so the same
+        tools always serialize to the same bytes, whatever order they were
+        added in. This keeps the request prefix stable for provider prompt
+        caching. The returned list is shared and must not be modified.
+        """
+        if self._params is None:
+            params = [_canonical(tool.to_param()) for tool in self.tools]
+            self._params = sorted(params, key=lambda p: p["function"]["name"])
+        return self._params
+
+    def schema_tokens(self) -> Dict[str, int]:
+        """The approximate size in tokens of each tool's serialized param."""
+        count = _token_counter()
+        return {
+            param["function"]["name"]: count(json.dumps(param))
+            for param in self.to_params()
+        }
 
     async def execute(
         self, *, name: str, tool_input: Dict[str, Any] = None
@@ -41,12 +82,21 @@ class ToolCollection:
                 results.append(ToolFailure(error=e.message))
         return results
 
+    async def cleanup(self) -> None:
+        """Release resources held by every tool in the collection."""
+        for tool in self.tools:
+            try:
+                await tool.cleanup()
+            except Exception as e:
+                logger.warning(f"Error cleaning up tool {tool.name}: {e}")
+
     def get_tool(self, name: str) -> BaseTool:
         return self.tool_map.get(name)
 
     def add_tool(self, tool: BaseTool):
         self.tools += (tool,)
         self.tool_map[tool.name] = tool
+        self._params = None
         return self
 
     def add_tools(self, *tools: BaseTool):
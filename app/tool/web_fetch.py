@@ -0,0 +1,417 @@
+import asyncio
+import ipaddress
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Literal, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import html2text
+import httpx
+from pydantic import BaseModel
+
+from app.config import config
+from app.logger import logger
+from app.tool.base import BaseTool, ToolResult
+from app.tool.browser_pool import get_browser_pool
+
+
+_WEB_FETCH_DESCRIPTION = """Fetch a web page over HTTP and return its readable content as markdown or plain text.
+Use this tool to read articles, documentation and other mostly static pages; it is much faster than the browser.
+Pages that need JavaScript to render are automatically loaded in a browser instead.
+Use browser_use only when you need to interact with a page (click, type, scroll, screenshots).
+file:// URLs returned by the offline search backend are read from the local document directory.
+"""
+
+_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+# Markers of client-rendered pages whose HTML carries no real content.
+_JS_APP_MARKERS = re.compile(
+    r'id=["\'](root|app|__next|__nuxt)["\']|enable javascript|requires javascript',
+    re.IGNORECASE,
+)
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+_MAX_REDIRECTS = 10
+
+
+class FetchedPage(BaseModel):
+    """A fetched and extracted page, as stored in the fetch cache."""
+
+    url: str
+    status: int
+    content_type: str = ""
+    title: str = ""
+    html: str = ""
+    content: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fresh_until: float = 0.0
+    via_browser: bool = False
+
+
+class _FetchCache:
+    """
+    A small LRU cache of fetched pages keyed by URL, bounded by entry count
+    and by the total length of the pages' HTML and extracted content.
+    """
+
+    def __init__(self, max_entries: int = 256, max_chars: int = 64_000_000):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[str, FetchedPage]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_chars = 0
+
+    def get(self, url: str) -> Optional[FetchedPage]:
+        page = self._entries.get(url)
+        if page is not None:
+            self._entries.move_to_end(url)
+        return page
+
+    def put(self, page: FetchedPage) -> None:
+        self._pop(page.url)
+        size = len(page.html) + len(page.content)
+        if size > self.max_chars:
+            return
+        self._entries[page.url] = page
+        self._sizes[page.url] = size
+        self._total_chars += size
+        while (
+            len(self._entries) > self.max_entries or self._total_chars > self.max_chars
+        ):
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, url: str) -> None:
+        if self._entries.pop(url, None) is not None:
+            self._total_chars -= self._sizes.pop(url)
+
+
+_client: Optional[httpx.AsyncClient] = None
+_cache = _FetchCache()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled HTTP client (keep-alive, compression)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            headers={"User-Agent": _USER_AGENT, "Accept-Encoding": "gzip, deflate"},
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def check_public_url(url: str) -> None:
+    """
+    Raise ValueError unless `url` is an http(s) URL whose host resolves only to
+    public addresses, so the fetcher cannot be pointed at loopback, private or
+    link-local services such as the cloud metadata endpoint.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        raise ValueError("only http(s) URLs are supported")
+    if not parsed.hostname:
+        raise ValueError(f"no host in URL {url}")
+
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80)
+        )
+    except OSError as e:
+        raise ValueError(f"cannot resolve {parsed.hostname}: {e}") from None
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(
+                f"{parsed.hostname} resolves to the non-public address {address}"
+            )
+
+
+def html_to_markdown(html: str, plain_text: bool = False) -> str:
+    """Convert HTML to readable markdown, or to plain text without links."""
+    converter = html2text.HTML2Text()
+    converter.body_width = 0
+    converter.ignore_images = True
+    converter.ignore_links = plain_text
+    converter.ignore_emphasis = plain_text
+    return re.sub(r"\n{3,}", "\n\n", converter.handle(html)).strip()
+
+
+def _extract_title(html: str) -> str:
+    match = re.search(r"<title[^>]*>(.*?)</title>", html, re.IGNORECASE | re.DOTALL)
+    return re.sub(r"\s+", " ", match.group(1)).strip() if match else ""
+
+
+def _fresh_until(headers: httpx.Headers) -> float:
+    cache_control = headers.get("cache-control", "")
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    return time.time() + int(match.group(1)) if match else 0.0
+
+
+class WebFetch(BaseTool):
+    name: str = "web_fetch"
+    description: str = _WEB_FETCH_DESCRIPTION
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "url": {
+                "type": "string",
+                "description": "(required) The http(s) URL to fetch.",
+            },
+            "format": {
+                "type": "string",
+                "enum": ["markdown", "text"],
+                "description": "(optional) 'markdown' keeps links and structure, 'text' returns plain text. Default is markdown.",
+            },
+            "max_length": {
+                "type": "integer",
+                "description": "(optional) Maximum number of characters to return. Default is 20000.",
+            },
+        },
+        "required": ["url"],
+    }
+
+    # Extracted text shorter than this on a page that looks client-rendered
+    # triggers the browser fallback.
+    min_content_chars: int = 200
+    browser_fallback: bool = True
+    max_html_bytes: int = 5_000_000
+    # Whether URLs may point at loopback, private or link-local addresses
+    allow_private_addresses: bool = False
+
+    async def execute(
+        self,
+        url: str,
+        format: Literal["markdown", "text"] = "markdown",
+        max_length: int = 20000,
+    ) -> ToolResult:
+        """
+        Fetch a URL and return its readable content.
+
+        Args:
+            url (str): The http(s) URL to fetch.
+            format (str): 'markdown' or 'text'.
+            max_length (int): Maximum number of characters to return.
+
+        Returns:
+            ToolResult: The page title and content, or an error.
+        """
+        try:
+            page = await self.fetch(url)
+        except Exception as e:
+            return ToolResult(error=f"Failed to fetch {url}: {e}")
+
+        if page.status >= 400:
+            return ToolResult(error=f"Fetching {url} returned HTTP {page.status}")
+
+        content = page.content
+        if format == "text" and page.html:
+            content = await asyncio.to_thread(
+                html_to_markdown, page.html, plain_text=True
+            )
+        if len(content) > max_length:
+            content = content[:max_length] + "\n\n<content truncated>"
+
+        header = f"URL: {page.url}\n"
+        if page.title:
+            header += f"Title: {page.title}\n"
+        return ToolResult(output=f"{header}\n{content}")
+
+    async def fetch(self, url: str) -> FetchedPage:
+        """
+        Fetch a page through the shared cache, revalidating stale entries with
+        ETag/Last-Modified and falling back to the browser for JS-rendered pages.
+        """
+        if url.startswith("file://"):
+            return await self._read_local(url)
+        if not url.startswith(("http://", "https://")):
+            raise ValueError("only http(s) URLs are supported")
+
+        # Only pages fetched with the address checks are cached, so a fresh
+        # entry needs no new DNS lookup.
+        cached = _cache.get(url)
+        if cached is not None and cached.fresh_until > time.time():
+            return cached
+        if not self.allow_private_addresses:
+            await check_public_url(url)
+
+        headers: Dict[str, str] = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        response = await self._get(url, headers)
+        try:
+            if response.status_code == 304 and cached is not None:
+                cached.fresh_until = _fresh_until(response.headers)
+                _cache.put(cached)
+                return cached
+            page = await self._extract(url, response)
+        finally:
+            await response.aclose()
+
+        if self.browser_fallback and self._needs_browser(page):
+            try:
+                page = await self._fetch_with_browser(page)
+            except Exception as e:
+                logger.warning(f"Browser fallback for {url} failed: {e}")
+
+        if page.status < 400 and not self.allow_private_addresses:
+            _cache.put(page)
+        return page
+
+    async def _get(self, url: str, headers: Dict[str, str]) -> httpx.Response:
+        """
+        GET `url` as a streamed response, following redirects only to URLs that
+        pass the same checks. The caller must close the returned response.
+        """
+        client = get_http_client()
+        request = client.build_request("GET", url, headers=headers)
+        for _ in range(_MAX_REDIRECTS + 1):
+            response = await client.send(request, follow_redirects=False, stream=True)
+            if not response.is_redirect or response.next_request is None:
+                return response
+            request = response.next_request
+            await response.aclose()
+            if not self.allow_private_addresses:
+                await check_public_url(str(request.url))
+        raise ValueError(f"more than {_MAX_REDIRECTS} redirects")
+
+    async def _read_text(self, response: httpx.Response) -> str:
+        """Read and decode at most `max_html_bytes` of a streamed response body."""
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_html_bytes:
+                break
+        body = b"".join(chunks)[: self.max_html_bytes]
+        return body.decode(response.charset_encoding or "utf-8", errors="replace")
+
+    async def _extract(self, url: str, response: httpx.Response) -> FetchedPage:
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        page = FetchedPage(
+            url=url,
+            status=response.status_code,
+            content_type=content_type,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            fresh_until=_fresh_until(response.headers),
+        )
+        if response.status_code >= 400:
+            return page
+
+        if "html" in content_type or not content_type:
+            page.html = await self._read_text(response)
+            page.title = _extract_title(page.html)
+            page.content = await asyncio.to_thread(html_to_markdown, page.html)
+        elif content_type.startswith("text/") or content_type.endswith(("json", "xml")):
+            page.content = await self._read_text(response)
+        else:
+            size = response.headers.get("content-length", "an unknown number of")
+            page.content = (
+                f"[{content_type} content of {size} bytes; not shown as text]"
+            )
+        return page
+
+    async def _read_local(self, url: str) -> FetchedPage:
+        """Read a document of the local search backend's directory."""
+        documents_dir = config.search_config.documents_dir
+        path = Path(url2pathname(urlparse(url).path)).resolve()
+        if not documents_dir or not path.is_relative_to(
+            Path(documents_dir).expanduser().resolve()
+        ):
+            raise ValueError("file:// URLs must point into search.documents_dir")
+        if not path.is_file():
+            return FetchedPage(url=url, status=404)
+
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        if path.suffix.lower() in (".html", ".htm"):
+            return FetchedPage(
+                url=url,
+                status=200,
+                content_type="text/html",
+                html=text,
+                title=_extract_title(text),
+                content=await asyncio.to_thread(html_to_markdown, text),
+            )
+        return FetchedPage(
+            url=url,
+            status=200,
+            content_type="text/plain",
+            title=path.name,
+            content=text,
+        )
+
+    def _needs_browser(self, page: FetchedPage) -> bool:
+        if not page.html or page.status >= 400:
+            return False
+        if len(page.content) >= self.min_content_chars:
+            return False
+        return bool(_JS_APP_MARKERS.search(page.html)) or "<script" in page.html
+
+    async def _fetch_with_browser(self, page: FetchedPage) -> FetchedPage:
+        """
+        Render the page in a pooled browser context and extract it again.
+
+        The browser follows redirects on its own, so unless private addresses
+        are allowed every main frame navigation and the final URL are checked
+        before the content is used.
+        """
+        lease = await get_browser_pool().lease()
+        hops = []
+
+        def record_navigation(request):
+            if request.is_navigation_request() and request.frame.parent_frame is None:
+                hops.append(request.url)
+
+        try:
+            session = await lease.context.get_session()
+            session.context.on("request", record_navigation)
+            await lease.context.navigate_to(page.url)
+            html = await lease.context.get_page_html()
+            final_url = (await lease.context.get_current_page()).url
+            session.context.remove_listener("request", record_navigation)
+        finally:
+            await lease.release()
+
+        if not self.allow_private_addresses:
+            for hop in dict.fromkeys([*hops, final_url]):
+                await check_public_url(hop)
+
+        content = await asyncio.to_thread(html_to_markdown, html)
+        return page.model_copy(
+            update={
+                "html": html,
+                "title": _extract_title(html) or page.title,
+                "content": content,
+                "via_browser": True,
+                # The rendered result cannot be revalidated with the server,
+                # so keep it for a few minutes instead.
+                "etag": None,
+                "last_modified": None,
+                "fresh_until": max(page.fresh_until, time.time() + 300),
+            }
+        )
@@ -0,0 +1,256 @@
+import asyncio
+import time
+from typing import List, Optional
+
+from pydantic import Field
+
+from app.llm import LLM
+from app.logger import logger
+from app.schema import Message
+from app.tool.base import BaseTool, ToolResult
+from app.tool.google_search import GoogleSearch
+from app.tool.web_fetch import FetchedPage, WebFetch
+
+
+_WEB_RESEARCH_DESCRIPTION = """Research a question on the web in a single step.
+Given a search query and/or a list of URLs, the tool fetches the top pages concurrently, extracts the passages relevant to the question and returns one digest with numbered citations to the sources.
+Use this instead of searching and then opening pages one at a time.
+"""
+
+_MAP_PROMPT = """You extract information for a research question from one excerpt of a web page.
+Return concise bullet points with the facts, figures and quotes from the excerpt that help answer the question.
+Do not add knowledge that is not in the excerpt. If the excerpt contains nothing relevant, answer exactly NONE."""
+
+_REDUCE_PROMPT = """You write research digests from notes taken on several web sources.
+Answer the question using only the notes. Cite every claim with the number of its source in square brackets, e.g. [2].
+Point out where sources disagree and say what the notes do not cover. Be concise and well structured."""
+
+
+class _RateLimiter:
+    """Caps concurrent LLM calls and spaces out their start times."""
+
+    def __init__(self, max_concurrency: int, min_interval: float):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._last_start = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        async with self._lock:
+            wait = self._last_start + self._min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_start = time.monotonic()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._semaphore.release()
+
+
+def chunk_text(text: str, chunk_chars: int) -> List[str]:
+    """Split text into chunks of at most `chunk_chars`, on paragraph boundaries."""
+    chunks, current = [], ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current.strip():
+        chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+class WebResearch(BaseTool):
+    name: str = "web_research"
+    description: str = _WEB_RESEARCH_DESCRIPTION
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "question": {
+                "type": "string",
+                "description": "(required) The question the digest should answer.",
+            },
+            "query": {
+                "type": "string",
+                "description": "(optional) Search query used to find pages. Defaults to the question when no URLs are given.",
+            },
+            "urls": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "(optional) URLs to read in addition to (or instead of) search results.",
+            },
+            "max_pages": {
+                "type": "integer",
+                "description": "(optional) Maximum number of pages to read. Default is 5, at most 10.",
+                "minimum": 1,
+                "maximum": 10,
+            },
+        },
+        "required": ["question"],
+    }
+
+    llm: LLM = Field(default_factory=lambda: LLM.for_role("summarizer"))
+    search_tool: GoogleSearch = Field(default_factory=GoogleSearch)
+    fetch_tool: WebFetch = Field(default_factory=WebFetch)
+
+    chunk_chars: int = 6000
+    max_pages_limit: int = 10
+    max_chunks_per_page: int = 4
+    max_note_chars: int = 3000
+    # Notes longer than this in total are reduced in batches, then merged
+    max_reduce_chars: int = 24000
+    max_concurrency: int = 4
+    min_call_interval: float = 0.2  # seconds between LLM call starts
+
+    async def execute(
+        self,
+        question: str,
+        query: Optional[str] = None,
+        urls: Optional[List[str]] = None,
+        max_pages: int = 5,
+    ) -> ToolResult:
+        """
+        Fetch pages concurrently, summarize their chunks in parallel and reduce
+        the notes into a single cited digest.
+
+        Args:
+            question (str): The question the digest should answer.
+            query (str, optional): Search query used to find pages.
+            urls (List[str], optional): URLs to read directly.
+            max_pages (int): Maximum number of pages to read.
+
+        Returns:
+            ToolResult: The digest followed by the numbered list of sources.
+        """
+        max_pages = max(1, min(max_pages, self.max_pages_limit))
+        urls = list(urls or [])
+        if query or not urls:
+            try:
+                found = await self.search_tool.execute(
+                    query=query or question, num_results=max_pages
+                )
+                urls.extend(u for u in found if u not in urls)
+            except Exception as e:
+                if not urls:
+                    return ToolResult(error=f"Search failed: {e}")
+                logger.warning(f"Search failed, using given URLs only: {e}")
+        urls = urls[:max_pages]
+        if not urls:
+            return ToolResult(error="No pages found to research")
+
+        pages = await asyncio.gather(
+            *(self.fetch_tool.fetch(url) for url in urls), return_exceptions=True
+        )
+        sources = [
+            page
+            for page in pages
+            if isinstance(page, FetchedPage) and page.status < 400 and page.content
+        ]
+        if not sources:
+            return ToolResult(error="None of the pages could be fetched")
+
+        limiter = _RateLimiter(self.max_concurrency, self.min_call_interval)
+        tasks = [
+            self._summarize_chunk(limiter, question, number, page, chunk)
+            for number, page in enumerate(sources, start=1)
+            for chunk in chunk_text(page.content, self.chunk_chars)[
+                : self.max_chunks_per_page
+            ]
+        ]
+        notes = [note for note in await asyncio.gather(*tasks) if note]
+
+        source_list = "\n".join(
+            f"[{number}] {page.title or page.url} - {page.url}"
+            for number, page in enumerate(sources, start=1)
+        )
+        if not notes:
+            return ToolResult(
+                output=f"The sources contain nothing relevant to: {question}"
+                f"\n\nSources:\n{source_list}"
+            )
+
+        digest = await self._reduce(limiter, question, notes)
+        return ToolResult(output=f"{digest}\n\nSources:\n{source_list}")
+
+    async def _summarize_chunk(
+        self,
+        limiter: _RateLimiter,
+        question: str,
+        number: int,
+        page: FetchedPage,
+        chunk: str,
+    ) -> Optional[str]:
+        """Map step: extract the notes relevant to the question from one chunk."""
+        prompt = (
+            f"Question: {question}\n\nSource [{number}]: {page.title or page.url}\n\n"
+            f"Excerpt:\n{chunk}"
+        )
+        try:
+            async with limiter:
+                note = await self.llm.ask(
+                    messages=[Message.user_message(prompt)],
+                    system_msgs=[Message.system_message(_MAP_PROMPT)],
+                    stream=False,
+                )
+        except Exception as e:
+            logger.warning(f"Summarizing a chunk of {page.url} failed: {e}")
+            return None
+        note = note.strip()
+        if not note or note.upper().startswith("NONE"):
+            return None
+        return f"Notes from source [{number}]:\n{note[: self.max_note_chars]}"
+
+    def _batch_notes(self, notes: List[str]) -> List[List[str]]:
+        """Group notes into batches of at most `max_reduce_chars` each."""
+        batches: List[List[str]] = [[]]
+        size = 0
+        for note in notes:
+            if batches[-1] and size + len(note) > self.max_reduce_chars:
+                batches.append([])
+                size = 0
+            batches[-1].append(note)
+            size += len(note) + 2
+        return batches
+
+    async def _reduce(
+        self, limiter: _RateLimiter, question: str, notes: List[str]
+    ) -> str:
+        """
+        Reduce step: merge all notes into one digest with citations. Notes that
+        do not fit one prompt are first merged batch by batch into shorter
+        partial digests.
+        """
+        batches = self._batch_notes(notes)
+        while len(batches) > 1:
+            partials = await asyncio.gather(
+                *(self._reduce_batch(limiter, question, batch) for batch in batches)
+            )
+            # Bounded like notes, so each round leaves fewer batches
+            notes = [partial[: self.max_note_chars] for partial in partials]
+            merged = self._batch_notes(notes)
+            batches = merged if len(merged) < len(batches) else [notes]
+        return await self._reduce_batch(limiter, question, batches[0])
+
+    async def _reduce_batch(
+        self, limiter: _RateLimiter, question: str, notes: List[str]
+    ) -> str:
+        """Merge one batch of notes into a digest with citations."""
+        prompt = f"Question: {question}\n\n" + "\n\n".join(notes)
+        try:
+            async with limiter:
+                return await self.llm.ask(
+                    messages=[Message.user_message(prompt)],
+                    system_msgs=[Message.system_message(_REDUCE_PROMPT)],
+                    stream=False,
+                )
+        except Exception as e:
+            logger.warning(f"Reducing research notes failed: {e}")
+            return "Could not write a digest; raw notes follow.\n\n" + "\n\n".join(
+                notes
+            )
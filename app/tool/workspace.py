@@ -0,0 +1,186 @@
+"""Indexes over the files of a workspace that are kept up to date incrementally."""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple, Type, TypeVar
+
+from app.logger import logger
+
+
+# Hidden directories (.git, .venv, ...) are always skipped as well.
+SKIPPED_DIRS = {"__pycache__", "node_modules", "venv"}
+
+# Between full rescans only the files reported through `notify_file_changed`
+# are re-indexed, so changes made outside the editor show up within this delay.
+RESCAN_INTERVAL = 5.0
+# Least recently used indexes beyond this are dropped.
+MAX_INDEXES = 8
+
+
+def _is_walked(root: Path, path: Path) -> bool:
+    """Whether `walk_workspace(root)` descends into `path` (a path under root)."""
+    return not any(
+        part.startswith(".") or part in SKIPPED_DIRS
+        for part in path.relative_to(root).parts
+    )
+
+
+def walk_workspace(root: Path) -> Dict[str, os.stat_result]:
+    """Stat every non-hidden file under `root`, skipping vendored/build dirs."""
+    found = {}
+    stack = [str(root)]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIPPED_DIRS:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    found[entry.path] = entry.stat()
+            except OSError:
+                continue
+    return found
+
+
+class WorkspaceIndex(ABC):
+    """
+    Base class of the per-directory indexes used by the code navigation tools.
+
+    `refresh()` re-indexes the files reported through `notify_file_changed`
+    and, at most every `RESCAN_INTERVAL` seconds, walks the tree for files
+    whose mtime or size changed (edits can land within the filesystem's mtime
+    granularity, hence the explicit notifications). Hold `lock` around a
+    refresh and the reads that depend on it.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.lock = threading.Lock()
+        self._dirty_lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._stats: Dict[str, Tuple[int, int]] = {}
+        self._last_scan: Optional[float] = None
+
+    def accepts(self, path: str) -> bool:
+        """Whether the index covers this file."""
+        return True
+
+    @abstractmethod
+    def update_file(self, path: str, stat: os.stat_result) -> None:
+        """(Re-)index a new or changed file. May raise OSError."""
+
+    @abstractmethod
+    def remove_file(self, path: str) -> None:
+        """Forget a file that no longer exists."""
+
+    def mark_changed(self, path: str) -> None:
+        with self._dirty_lock:
+            self._dirty.add(path)
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the files on disk."""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+
+        now = time.monotonic()
+        if self._last_scan is not None and now - self._last_scan < RESCAN_INTERVAL:
+            self._refresh_files(dirty)
+            return
+        self._last_scan = now
+
+        current = {
+            path: stat
+            for path, stat in walk_workspace(self.root).items()
+            if self.accepts(path)
+        }
+        updated = 0
+        for path, stat in current.items():
+            key = (stat.st_mtime_ns, stat.st_size)
+            if path in dirty or self._stats.get(path) != key:
+                updated += self._update(path, stat)
+        for path in [path for path in self._stats if path not in current]:
+            self.remove_file(path)
+            del self._stats[path]
+        if updated:
+            logger.debug(
+                f"{type(self).__name__}: re-indexed {updated} files under {self.root}"
+            )
+
+    def _refresh_files(self, paths: Set[str]) -> None:
+        """Re-index just `paths`, e.g. the files changed since the last refresh."""
+        for path in paths:
+            if not self.accepts(path) or not _is_walked(self.root, Path(path)):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None and os.path.isfile(path):
+                self._update(path, stat)
+            elif path in self._stats:
+                self.remove_file(path)
+                del self._stats[path]
+
+    def _update(self, path: str, stat: os.stat_result) -> bool:
+        try:
+            self.update_file(path, stat)
+        except OSError:
+            with self._dirty_lock:
+                self._dirty.add(path)  # retried on the next refresh
+            return False
+        self._stats[path] = (stat.st_mtime_ns, stat.st_size)
+        return True
+
+
+IndexT = TypeVar("IndexT", bound=WorkspaceIndex)
+
+_indexes: "OrderedDict[Tuple[type, Path], WorkspaceIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_workspace_index(index_class: Type[IndexT], root: Path) -> IndexT:
+    """
+    Return the process-wide index covering a directory, creating it if needed.
+
+    An existing index of an enclosing directory is reused, so the returned
+    index's root may be a parent of `root`; query it with `root` as the scope.
+    """
+    root = root.resolve()
+    with _indexes_lock:
+        for (cls, indexed_root), index in _indexes.items():
+            if cls is index_class and (
+                indexed_root == root
+                or (indexed_root in root.parents and _is_walked(indexed_root, root))
+            ):
+                _indexes.move_to_end((cls, indexed_root))
+                return index
+
+        # Indexes of subdirectories are superseded by the new one
+        for key in [
+            key for key in _indexes if key[0] is index_class and root in key[1].parents
+        ]:
+            del _indexes[key]
+        index = _indexes[(index_class, root)] = index_class(root)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+        return index
+
+
+def notify_file_changed(path: Path) -> None:
+    """Tell the indexes covering `path` that it changed (e.g. after an edit)."""
+    resolved = Path(path).resolve()
+    with _indexes_lock:
+        indexes = list(_indexes.items())
+    for (_, root), index in indexes:
+        if root in resolved.parents:
+            index.mark_changed(str(resolved))
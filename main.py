@@ -19,6 +19,13 @@ from app.flow.base import FlowType
 from app.agent.manus import Manus
 from app.logger import logger
 from app.config import config
+from app.llm import LLM
+from app.tool.bash import close_session_pool
+from app.tool.browser_pool import get_browser_pool
+from app.tool.browser_use_tool import BrowserUseTool
+from app.tool.planning import PlanningTool
+from app.tool.plan_store import create_plan_store
+from app.tool.web_fetch import close_http_client
 from web.tool_manager import ToolManager
 
 # Create FastAPI app
@@ -30,6 +37,15 @@ async def startup_event():
     # Start the session cleanup task
     session_manager.start_cleanup_task()
 
+# Shutdown event to release shared resources
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Close the shells, browsers and HTTP connections shared by all sessions
+    await close_session_pool()
+    await get_browser_pool().close()
+    await close_http_client()
+    await LLM.close_all()
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -80,18 +96,36 @@ class Session:
         for agent in self.agents.values():
             tool_manager.wrap_agent_tools(agent)
         
-        # Create flow using your existing FlowFactory
-        flow_type = FlowType.PLANNING
+        # Plans are scoped to the session (and persisted with the sqlite backend)
+        self.plan_store = create_plan_store(session_id)
+        
+        # Create flow using your existing FlowFactory; the router answers
+        # simple requests directly and plans the others
+        flow_type = (
+            FlowType.ROUTER if config.router_config.enabled else FlowType.PLANNING
+        )
         
         self.flow = FlowFactory.create_flow(
             flow_type=flow_type,
             agents=self.agents,
-            primary_agent_key="manus"
+            primary_agent_key="manus",
+            planning_tool=PlanningTool(store=self.plan_store),
         )
         
         # Message history for the session
         self.messages = []
 
+    async def cleanup(self):
+        """Release per-session tool resources (kernels, shells, browsers, screenshots)"""
+        for agent in self.agents.values():
+            tools = getattr(agent, "available_tools", None)
+            if tools is not None:
+                await tools.cleanup()
+                for tool in tools:
+                    if isinstance(tool, BrowserUseTool):
+                        tool.remove_artifacts()
+        self.plan_store.close()
+
 class SessionManager:
     def __init__(self, session_timeout_minutes: int = 30):
         self.sessions: Dict[str, Session] = {}
@@ -129,7 +163,11 @@ class SessionManager:
                 
                 for sid in expired_sessions:
                     logger.info(f"Removing inactive session: {sid}")
-                    del self.sessions[sid]
+                    session = self.sessions.pop(sid)
+                    try:
+                        await session.cleanup()
+                    except Exception as e:
+                        logger.error(f"Error cleaning up session {sid}: {e}")
 
 # Initialize session manager
 session_manager = SessionManager()
@@ -0,0 +1,135 @@
+import asyncio
+
+from app.config import LLMSettings
+from app.llm import LLM, to_anthropic_request
+
+
+EPHEMERAL = {"type": "ephemeral"}
+
+TOOL = {
+    "type": "function",
+    "function": {
+        "name": "bash",
+        "description": "Run a command",
+        "parameters": {"type": "object", "properties": {"command": {}}},
+    },
+}
+
+
+def tool_call(call_id, arguments):
+    return {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": "bash", "arguments": arguments},
+    }
+
+
+def test_system_messages_and_tools_are_mapped():
+    request = to_anthropic_request(
+        [
+            {"role": "system", "content": "You are helpful."},
+            {"role": "user", "content": "Hi"},
+        ],
+        [TOOL],
+    )
+
+    assert request["system"] == [
+        {"type": "text", "text": "You are helpful.", "cache_control": EPHEMERAL}
+    ]
+    assert request["tools"] == [
+        {
+            "name": "bash",
+            "description": "Run a command",
+            "input_schema": {"type": "object", "properties": {"command": {}}},
+            "cache_control": EPHEMERAL,
+        }
+    ]
+    assert request["messages"] == [
+        {
+            "role": "user",
+            "content": [{"type": "text", "text": "Hi", "cache_control": EPHEMERAL}],
+        }
+    ]
+
+
+def test_tool_calls_and_results_alternate_roles():
+    request = to_anthropic_request(
+        [
+            {"role": "user", "content": "List files"},
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [tool_call("a", '{"command": "ls"}'), tool_call("b", "")],
+            },
+            {"role": "tool", "tool_call_id": "a", "content": "x.py"},
+            {"role": "tool", "tool_call_id": "b", "content": ""},
+        ]
+    )
+
+    assert [m["role"] for m in request["messages"]] == ["user", "assistant", "user"]
+    assistant, results = request["messages"][1:]
+    assert [block["input"] for block in assistant["content"]] == [
+        {"command": "ls"},
+        {},
+    ]
+    assert [block["tool_use_id"] for block in results["content"]] == ["a", "b"]
+    assert results["content"][1]["content"] == [{"type": "text", "text": "(no output)"}]
+    assert "system" not in request and "tools" not in request
+
+
+def test_only_the_last_two_user_turns_are_cache_breakpoints():
+    messages = []
+    for turn in range(3):
+        messages.append({"role": "user", "content": f"question {turn}"})
+        messages.append({"role": "assistant", "content": f"answer {turn}"})
+    messages.append({"role": "user", "content": "question 3"})
+
+    request = to_anthropic_request(messages)
+
+    marked = [
+        block["text"]
+        for message in request["messages"]
+        for block in message["content"]
+        if "cache_control" in block
+    ]
+    assert marked == ["question 2", "question 3"]
+
+
+def test_images_become_base64_blocks():
+    request = to_anthropic_request(
+        [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "What is this?"},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": "data:image/jpeg;base64,AAAA"},
+                    },
+                ],
+            }
+        ]
+    )
+
+    assert request["messages"][0]["content"][1]["source"] == {
+        "type": "base64",
+        "media_type": "image/jpeg",
+        "data": "AAAA",
+    }
+
+
+def test_close_all_closes_the_http_clients(monkeypatch):
+    monkeypatch.setattr(LLM, "_instances", {})
+    settings = LLMSettings(
+        model="claude",
+        base_url="",
+        api_key="key",
+        api_type="anthropic",
+        api_version="",
+    )
+    llm = LLM("anthropic", llm_config={"anthropic": settings})
+
+    asyncio.run(LLM.close_all())
+
+    assert llm.client._http.is_closed
+    assert LLM._instances == {}
@@ -0,0 +1,43 @@
+import asyncio
+
+from app.tool.bash import _BashSession, _BashSessionPool
+
+
+def test_reset_restores_the_initial_directory(tmp_path):
+    async def scenario():
+        session = _BashSession(cwd=str(tmp_path))
+        await session.start()
+        await session.run("cd / && export DIRTY=1")
+        assert await session.reset()
+        result = await session.run('pwd; echo "${DIRTY:-clean}"')
+        await session.close()
+        return result.output
+
+    assert asyncio.run(scenario()) == f"{tmp_path}\nclean"
+
+
+def test_reset_fails_when_the_initial_directory_is_gone(tmp_path):
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+
+    async def scenario():
+        session = _BashSession(cwd=str(workdir))
+        await session.start()
+        workdir.rmdir()
+        healthy = await session.reset()
+        await session.close()
+        return healthy
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_close_kills_the_idle_shells():
+    async def scenario():
+        pool = _BashSessionPool(size=2)
+        session = await pool.acquire()
+        await pool.release(session)
+        await pool.close()
+        return session
+
+    session = asyncio.run(scenario())
+    assert session._process.returncode is not None
@@ -0,0 +1,75 @@
+import asyncio
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+from app.tool import code_search, workspace
+from app.tool.code_search import CodeSearch
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes(monkeypatch):
+    monkeypatch.setattr(workspace, "_indexes", OrderedDict())
+
+
+def search(tmp_path, query, **kwargs):
+    result = asyncio.run(CodeSearch().execute(query, path=str(tmp_path), **kwargs))
+    return result.output
+
+
+def test_matches_are_reported_once_per_line(tmp_path):
+    (tmp_path / "a.py").write_text("foo = foo\nbar\nfoo()\n")
+
+    output = search(tmp_path, "foo")
+
+    assert output.splitlines()[1:] == ["a.py:1: foo = foo", "a.py:3: foo()"]
+    assert output.startswith("2 matches")
+
+
+def test_pattern_spanning_lines_reports_its_first_line(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\ndef foo():\n    bar()\n")
+
+    output = search(tmp_path, r"foo\(\):\n\s+bar", regex=True)
+
+    assert output.splitlines()[1:] == ["a.py:2: def foo():"]
+
+
+def test_index_over_budget_falls_back_to_scanning(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_search, "MAX_INDEXED_FILES", 2)
+    for name in "abc":
+        (tmp_path / f"{name}.py").write_text(f"value_{name} = 1\n")
+    (tmp_path / "data.bin").write_bytes(b"\0value_a")
+
+    output = search(tmp_path, "value_a")
+
+    index = workspace.get_workspace_index(code_search._TrigramIndex, tmp_path)
+    assert index.over_budget and not index._postings
+    assert output.splitlines()[1:] == ["a.py:1: value_a = 1"]
+
+
+def test_removed_files_are_not_candidates(tmp_path):
+    index = code_search._TrigramIndex(tmp_path)
+    path = tmp_path / "a.py"
+    path.write_text("needle\n")
+    index.update_file(str(path), path.stat())
+    path.write_text("other\n")
+    index.update_file(str(path), path.stat())
+
+    assert index.candidates(["needle"]) == []
+    assert index.candidates(["other"]) == [str(path)]
+    index.remove_file(str(path))
+    assert index.candidates(["other"]) == []
+
+
+def test_root_scope_matches_every_file(tmp_path):
+    (tmp_path / "a.py").write_text("needle\n")
+    index = code_search._TrigramIndex(tmp_path)
+
+    matches, total, _ = index.search(
+        re.compile("needle"), ["needle"], None, 10, Path("/")
+    )
+
+    assert total == 1
+    assert matches == [f"{str(tmp_path / 'a.py').lstrip('/')}:1: needle"]
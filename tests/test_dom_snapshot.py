@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from app.tool.dom_snapshot import DomSnapshot, _describe_renumbering, diff_snapshots
+
+
+def node(xpath):
+    return SimpleNamespace(xpath=xpath)
+
+
+def test_elements_are_keyed_by_xpath_or_description():
+    snapshot = DomSnapshot(
+        "https://example.com",
+        "[1]<a>Home</a>\nWelcome\n[2]<button>OK</button>\n[3]<button>OK</button>",
+        {1: node("/html/body/a")},
+    )
+
+    assert snapshot.elements == {
+        "/html/body/a": (1, "<a>Home</a>"),
+        "<button>OK</button>": (2, "<button>OK</button>"),
+        "<button>OK</button>#2": (3, "<button>OK</button>"),
+    }
+    assert snapshot.texts == {"Welcome": 1}
+
+
+def test_elements_matched_by_xpath_are_renumbered_not_replaced():
+    old = DomSnapshot(
+        "u", "[1]<a>One</a>\n[2]<a>Two</a>", {1: node("a1"), 2: node("a2")}
+    )
+    new = DomSnapshot(
+        "u",
+        "[1]<input>\n[2]<a>One</a>\n[3]<a>Two!</a>",
+        {1: node("input"), 2: node("a1"), 3: node("a2")},
+    )
+
+    assert diff_snapshots(old, new).splitlines() == [
+        "Added elements:",
+        "[1]<input>",
+        "Changed elements:",
+        "[3]<a>Two!</a> (was: <a>Two</a>)",
+        "Renumbered elements:",
+        "[1] is now [2]",
+    ]
+
+
+def test_elements_without_xpath_are_matched_by_description():
+    old = DomSnapshot("u", "[1]<b>x</b>\n[2]<b>x</b>\n[3]<i>gone</i>\nold text")
+    new = DomSnapshot("u", "[1]<b>x</b>\nnew text")
+
+    assert diff_snapshots(old, new).splitlines() == [
+        "Removed elements (old indexes):",
+        "[2]<b>x</b>",
+        "[3]<i>gone</i>",
+        "Added text:",
+        "new text",
+        "Removed text:",
+        "old text",
+    ]
+
+
+def test_renumbering_collapses_runs_with_the_same_offset():
+    pairs = [(5, 6), (3, 4), (4, 5), (7, 1), (9, 8), (10, 9)]
+
+    assert _describe_renumbering(pairs) == [
+        "[3]..[5] are now [4]..[6]",
+        "[7] is now [1]",
+        "[9]..[10] are now [8]..[9]",
+    ]
+
+
+def test_identical_snapshots_have_no_changes():
+    tree = "[1]<a>Home</a>\ntext"
+
+    assert diff_snapshots(DomSnapshot("u", tree), DomSnapshot("u", tree)) == (
+        "No changes since the last state."
+    )
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.config import LLMSettings
+from app.llm import HEDGE_MIN_SAMPLES, LLM
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setattr(LLM, "_instances", {})
+    settings = LLMSettings(
+        model="primary-model",
+        base_url="http://localhost",
+        api_key="key",
+        api_type="openai",
+        api_version="",
+        hedge_percentile=90,
+        hedge_max_rate=0.5,
+    )
+    return LLM("hedged", llm_config={"hedged": settings})
+
+
+def warm_up(llm, kind, latency=0.01):
+    for _ in range(HEDGE_MIN_SAMPLES):
+        llm._latency[kind].record(latency, hedged=False)
+
+
+def make_request(durations, outcomes=None):
+    """A request whose n-th call sleeps durations[n] and returns or raises."""
+    calls = []
+
+    async def request(llm):
+        index = len(calls)
+        calls.append("started")
+        try:
+            await asyncio.sleep(durations[index])
+        except asyncio.CancelledError:
+            calls[index] = "cancelled"
+            raise
+        calls[index] = "finished"
+        outcome = (outcomes or {}).get(index, index)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return request, calls
+
+
+def test_no_hedging_without_enough_samples(llm):
+    request, calls = make_request([0.05])
+
+    assert asyncio.run(llm._hedged("ask", request)) == 0
+    assert calls == ["finished"]
+
+
+def test_slow_request_is_hedged_and_cancelled(llm):
+    warm_up(llm, "ask")
+    request, calls = make_request([5.0, 0.01])
+
+    assert asyncio.run(llm._hedged("ask", request)) == 1
+    assert calls == ["cancelled", "finished"]
+    assert llm._latency["ask"].hedge_rate() > 0
+
+
+def test_failed_hedge_waits_for_the_primary(llm):
+    warm_up(llm, "ask")
+    request, calls = make_request([0.1, 0.01], {1: RuntimeError("hedge failed")})
+
+    assert asyncio.run(llm._hedged("ask", request)) == 0
+    assert calls == ["finished", "finished"]
+
+
+def test_hedge_rate_cap(llm):
+    warm_up(llm, "ask")
+    for _ in range(HEDGE_MIN_SAMPLES):
+        llm._latency["ask"].record(0.01, hedged=True)
+    request, calls = make_request([0.05, 0.01])
+
+    assert asyncio.run(llm._hedged("ask", request)) == 0
+    assert calls == ["finished"]
+
+
+def test_kinds_of_requests_are_tracked_separately(llm):
+    warm_up(llm, "ask")
+    request, calls = make_request([0.05, 0.01])
+
+    # Fast plain completions do not make a slower tool call look like a straggler
+    assert asyncio.run(llm._hedged("ask_tool", request)) == 0
+    assert calls == ["finished"]
+    assert len(llm._latency["ask"].latencies) == HEDGE_MIN_SAMPLES
+
+
+def test_unknown_hedge_llm_is_ignored(monkeypatch):
+    monkeypatch.setattr(LLM, "_instances", {})
+    settings = LLMSettings(
+        model="model",
+        base_url="http://localhost",
+        api_key="key",
+        api_type="openai",
+        api_version="",
+        hedge_llm="missing",
+    )
+
+    assert LLM("hedged", llm_config={"hedged": settings}).hedge_llm is None
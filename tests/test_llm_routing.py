@@ -0,0 +1,114 @@
+import asyncio
+
+import httpx
+import pytest
+from openai import APIConnectionError, AuthenticationError, BadRequestError
+from tenacity import Future, RetryError
+
+from app.config import LLMRoleSettings, LLMSettings, config
+from app.llm import LLM
+
+
+REQUEST = httpx.Request("POST", "http://localhost/chat/completions")
+
+
+def status_error(error_class, status):
+    response = httpx.Response(status, request=REQUEST)
+    return error_class("error", response=response, body=None)
+
+
+def retry_error(error):
+    attempt = Future(6)
+    attempt.set_exception(error)
+    return RetryError(attempt)
+
+
+def make_settings(model, **kwargs):
+    return LLMSettings(
+        model=model,
+        base_url="http://localhost",
+        api_key="key",
+        api_type="openai",
+        api_version="",
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    monkeypatch.setattr(LLM, "_instances", {})
+    primary = LLM("primary", llm_config={"primary": make_settings("big")})
+    backup = LLM("backup", llm_config={"backup": make_settings("small")})
+    primary.fallbacks = [backup]
+    return primary
+
+
+def call_failing_primary(chain, error):
+    called = []
+
+    async def call(llm):
+        called.append(llm.model)
+        if llm is chain:
+            raise error
+        return "answer"
+
+    return asyncio.run(chain._with_fallbacks(call)), called
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        APIConnectionError(request=REQUEST),
+        retry_error(APIConnectionError(request=REQUEST)),
+    ],
+)
+def test_unavailable_model_falls_back(chain, error):
+    assert call_failing_primary(chain, error) == ("answer", ["big", "small"])
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        status_error(BadRequestError, 400),
+        status_error(AuthenticationError, 401),
+        retry_error(status_error(BadRequestError, 400)),
+    ],
+)
+def test_caller_and_config_errors_are_not_retried_on_fallbacks(chain, error):
+    with pytest.raises(type(error)):
+        call_failing_primary(chain, error)
+
+
+def test_last_llm_of_the_chain_raises(chain):
+    async def call(llm):
+        raise APIConnectionError(request=REQUEST)
+
+    with pytest.raises(APIConnectionError):
+        asyncio.run(chain._with_fallbacks(call))
+
+
+def test_role_builds_a_fallback_chain_with_overrides(monkeypatch):
+    monkeypatch.setattr(LLM, "_instances", {})
+    monkeypatch.setitem(config.llm, "fast", make_settings("fast-model"))
+    monkeypatch.setitem(
+        config.llm_roles,
+        "planner",
+        LLMRoleSettings(llm=["fast", "missing", "default"], max_tokens=123),
+    )
+
+    llm = LLM.for_role("planner")
+
+    assert [llm.model, *(f.model for f in llm.fallbacks)] == [
+        "fast-model",
+        config.llm["default"].model,
+    ]
+    assert llm.max_tokens == 123 and llm.fallbacks[0].max_tokens == 123
+    assert config.llm["fast"].max_tokens != 123
+
+
+def test_role_without_configuration_uses_the_default_llm(monkeypatch):
+    monkeypatch.setattr(LLM, "_instances", {})
+
+    llm = LLM.for_role("unconfigured")
+
+    assert llm.model == config.llm["default"].model and llm.fallbacks == []
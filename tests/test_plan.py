@@ -0,0 +1,122 @@
+from collections import Counter
+
+from app.schema import Plan, PlanStepStatus
+
+
+COMPLETED = PlanStepStatus.COMPLETED.value
+IN_PROGRESS = PlanStepStatus.IN_PROGRESS.value
+NOT_STARTED = PlanStepStatus.NOT_STARTED.value
+SKIPPED = PlanStepStatus.SKIPPED.value
+FAILED = PlanStepStatus.FAILED.value
+
+
+def make_plan(steps=("a", "b", "c", "d"), **kwargs):
+    return Plan(plan_id="p", title="Test", steps=list(steps), **kwargs)
+
+
+def assert_consistent(plan):
+    """The cached counters and lines agree with a plan built from scratch."""
+    fresh = Plan(**plan.model_dump())
+    assert plan._counts - Counter() == Counter(plan.step_statuses)
+    assert plan.next_active_step() == fresh.next_active_step()
+    assert plan.render() == fresh.render()
+
+
+def test_statuses_and_notes_are_padded_to_the_steps():
+    plan = make_plan(step_statuses=[COMPLETED])
+
+    assert plan.step_statuses == [COMPLETED, NOT_STARTED, NOT_STARTED, NOT_STARTED]
+    assert plan.step_notes == ["", "", "", ""]
+    assert plan.count(NOT_STARTED) == 3
+    assert plan.next_active_step() == 1
+
+
+def test_counters_follow_status_changes():
+    plan = make_plan()
+
+    plan.set_status(0, COMPLETED)
+    plan.set_status(1, SKIPPED)
+    plan.set_status(2, IN_PROGRESS)
+
+    assert plan.effective_completed == 2
+    assert plan.count(IN_PROGRESS, NOT_STARTED) == 2
+    assert plan.next_active_step() == 2
+    assert plan.progress() == "2/4 steps effectively completed (50.0%)"
+    assert_consistent(plan)
+
+
+def test_next_active_step_moves_back_when_a_step_is_reopened():
+    plan = make_plan()
+    for i in range(4):
+        plan.set_status(i, COMPLETED)
+    assert plan.next_active_step() is None
+
+    plan.set_status(1, NOT_STARTED)
+
+    assert plan.next_active_step() == 1
+    assert_consistent(plan)
+
+
+def test_only_changed_lines_are_rendered_again():
+    plan = make_plan()
+    plan.render()
+    lines = list(plan._lines)
+
+    plan.set_status(1, COMPLETED)
+    plan.set_notes(2, "half way")
+
+    assert plan._lines[0] is lines[0] and plan._lines[3] is lines[3]
+    assert plan._lines[1] is None and plan._lines[2] is None
+    assert "1. [✓] b\n" in plan.render()
+    assert "   Notes: half way\n" in plan.render()
+    assert_consistent(plan)
+
+
+def test_set_steps_keeps_the_state_of_unchanged_steps():
+    plan = make_plan()
+    plan.set_status(0, COMPLETED)
+    plan.set_status(1, COMPLETED)
+    plan.set_notes(1, "done")
+
+    plan.set_steps(["a", "x", "c"])
+
+    assert plan.step_statuses == [COMPLETED, NOT_STARTED, NOT_STARTED]
+    assert plan.step_notes == ["", "", ""]
+    assert plan.effective_completed == 1
+    assert_consistent(plan)
+
+
+def test_steps_without_dependencies_run_in_order():
+    plan = make_plan()
+    assert plan.ready_steps() == [0]
+
+    plan.set_status(0, COMPLETED)
+
+    assert plan.ready_steps() == [1]
+
+
+def test_ready_steps_follow_dependencies():
+    plan = make_plan(step_dependencies=[[], [], [0, 1], [0]])
+    assert plan.ready_steps() == [0, 1]
+
+    plan.set_status(0, COMPLETED)
+    assert plan.ready_steps() == [1, 3]
+
+    plan.set_status(1, FAILED)
+    assert plan.ready_steps() == [2, 3]
+
+
+def test_dependencies_on_later_or_unknown_steps_are_dropped():
+    plan = make_plan(step_dependencies=[[1], [1, 7, -1], [0, 0]])
+
+    assert plan.step_dependencies == [[], [], [0], []]
+    assert plan.ready_steps() == [0, 1, 3]
+    assert "2. [ ] c (after 0)\n" in plan.render()
+
+
+def test_set_steps_keeps_dependencies_of_unchanged_steps():
+    plan = make_plan(step_dependencies=[[], [], [0], [1]])
+
+    plan.set_steps(["a", "b", "x", "d", "e"])
+
+    assert plan.step_dependencies == [[], [], [1], [1], [3]]
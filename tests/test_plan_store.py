@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import pytest
+
+from app.config import PlanningSettings
+from app.schema import Plan
+from app.tool.plan_store import (
+    InMemoryPlanStore,
+    SQLitePlanStore,
+    create_plan_store,
+)
+from app.tool.planning import PlanningTool
+
+
+def make_plan(plan_id, steps=("a", "b")):
+    return Plan(plan_id=plan_id, title=f"Plan {plan_id}", steps=list(steps))
+
+
+def sqlite_settings(tmp_path, **kwargs):
+    return PlanningSettings(
+        backend="sqlite", sqlite_path=str(tmp_path / "plans.sqlite3"), **kwargs
+    )
+
+
+def test_sqlite_store_round_trips_plans(tmp_path):
+    settings = sqlite_settings(tmp_path)
+    store = create_plan_store("session", settings)
+    plan = make_plan("p1")
+    plan.set_status(0, "completed")
+    store.put("p1", plan)
+    store.close()
+
+    store = create_plan_store("session", settings)
+    loaded = store.get("p1")
+
+    assert isinstance(store, SQLitePlanStore)
+    assert loaded.model_dump() == plan.model_dump()
+    assert loaded.render() == plan.render()
+    assert list(store) == ["p1"]
+    assert store.delete("p1") and not store.delete("p1")
+    store.close()
+
+
+def test_sqlite_sessions_only_see_their_own_plans(tmp_path):
+    settings = sqlite_settings(tmp_path)
+    first = create_plan_store("first", settings)
+    second = create_plan_store("second", settings)
+
+    first.put("p", make_plan("p", steps=["first"]))
+    second.put("p", make_plan("p", steps=["second"]))
+    second.put("q", make_plan("q"))
+
+    assert first.get("p").steps == ["first"]
+    assert second.get("p").steps == ["second"]
+    assert "q" not in first and list(second) == ["p", "q"]
+    assert second.delete("p") and first.get("p") is not None
+    first.close()
+    second.close()
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_max_plans_drops_the_least_recently_written(tmp_path, backend):
+    store = create_plan_store(
+        "session",
+        PlanningSettings(
+            backend=backend, sqlite_path=str(tmp_path / "plans.sqlite3"), max_plans=2
+        ),
+    )
+    for plan_id in ("a", "b", "c"):
+        store.put(plan_id, make_plan(plan_id))
+        time.sleep(0.01)
+    store.put("b", make_plan("b"))
+    time.sleep(0.01)
+    store.put("d", make_plan("d"))
+
+    assert list(store) == ["b", "d"]
+    store.close()
+
+
+def test_expired_plans_are_purged(tmp_path, monkeypatch):
+    settings = sqlite_settings(tmp_path, retention_seconds=60)
+    abandoned = create_plan_store("abandoned", settings)
+    active = create_plan_store("active", settings)
+    memory = InMemoryPlanStore(retention_seconds=60)
+    abandoned.put("old", make_plan("old"))
+    memory.put("old", make_plan("old"))
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    active.put("new", make_plan("new"))
+
+    assert abandoned.get("old") is None and memory.get("old") is None
+    rows = active._conn.execute("SELECT session_id, plan_id FROM plans").fetchall()
+    assert rows == [("active", "new")]
+    abandoned.close()
+    active.close()
+
+
+def test_store_without_session_is_private_and_in_memory(tmp_path):
+    store = create_plan_store(settings=sqlite_settings(tmp_path))
+
+    assert isinstance(store, InMemoryPlanStore)
+    assert not (tmp_path / "plans.sqlite3").exists()
+
+
+def test_planning_tool_closes_only_the_store_it_created(tmp_path):
+    shared = create_plan_store("session", sqlite_settings(tmp_path))
+    tool = PlanningTool(store=shared)
+    asyncio.run(tool.execute(command="create", plan_id="p", title="T", steps=["a"]))
+
+    asyncio.run(tool.cleanup())
+
+    assert shared.get("p") is not None
+    assert isinstance(PlanningTool().store, InMemoryPlanStore)
+    shared.close()
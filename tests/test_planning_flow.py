@@ -0,0 +1,67 @@
+import asyncio
+import re
+
+from app.agent.base import BaseAgent
+from app.flow.planning import PlanningFlow
+from app.schema import Message
+
+
+# (step index, system prompt, messages in memory) of every executor step
+calls = []
+
+
+class _Executor(BaseAgent):
+    name: str = "executor"
+    max_steps: int = 1
+
+    async def step(self) -> str:
+        prompt = self.memory.messages[-1].content
+        step = int(re.search(r"working on step (\d+)", prompt).group(1))
+        calls.append((step, self.system_prompt, len(self.memory.messages)))
+        await asyncio.sleep(0.05)
+        return "[STATUS: completed]"
+
+
+def run_plan(flow, steps, dependencies):
+    async def run():
+        await flow.planning_tool.execute(
+            command="create",
+            plan_id=flow.active_plan_id,
+            title="Test",
+            steps=steps,
+            step_dependencies=dependencies,
+        )
+
+        async def finalize():
+            return "done"
+
+        flow._finalize_plan = finalize
+        return await flow.execute("")
+
+    return asyncio.run(run())
+
+
+def test_concurrent_steps_use_copies_of_the_configured_executor():
+    calls.clear()
+    executor = _Executor(system_prompt="configured")
+    flow = PlanningFlow(executor, max_concurrent_steps=3)
+
+    run_plan(flow, ["a", "b", "c"], [[], [], []])
+
+    # Every copy has the executor's prompt and starts with an empty memory
+    assert sorted(calls) == [(i, "configured", 1) for i in range(3)]
+    plan = flow.planning_tool.store.get(flow.active_plan_id)
+    assert plan.step_statuses == ["completed"] * 3
+
+
+def test_clone_shares_configuration_but_not_state():
+    executor = _Executor(system_prompt="configured", max_steps=7)
+    executor.memory.add_message(Message.user_message("earlier step"))
+
+    clone = PlanningFlow._clone_executor(executor)
+
+    assert clone is not executor
+    assert clone.llm is executor.llm
+    assert (clone.system_prompt, clone.max_steps) == ("configured", 7)
+    assert clone.memory.messages == []
+    assert len(executor.memory.messages) == 1
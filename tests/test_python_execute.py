@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.tool import python_execute
+from app.tool.python_execute import PythonExecute
+
+
+def run_calls(tool, *calls):
+    """Run (code, kwargs) calls in order on one kernel, then stop it."""
+
+    async def scenario():
+        try:
+            return [await tool.execute(code, **kwargs) for code, kwargs in calls]
+        finally:
+            await tool.cleanup()
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def tool():
+    return PythonExecute(stateful=True, memory_limit_mb=0, max_output_chars=1000)
+
+
+def test_variables_persist_across_calls(tool):
+    results = run_calls(tool, ("x = 41", {}), ("x += 1\nprint(x)", {}))
+
+    assert results[1] == {"observation": "42\n", "success": True}
+
+
+def test_reset_clears_the_namespace(tool):
+    results = run_calls(tool, ("x = 1", {}), ("", {"reset": True}), ("print(x)", {}))
+
+    assert results[1]["observation"] == "Namespace reset."
+    assert not results[2]["success"]
+    assert "NameError" in results[2]["observation"]
+
+
+def test_timeout_interrupts_and_keeps_the_namespace(tool):
+    results = run_calls(
+        tool,
+        ("x = 1", {}),
+        ("while True: pass", {"timeout": 1}),
+        ("print(x)", {}),
+    )
+
+    assert results[1]["observation"] == "Execution timeout after 1 seconds"
+    assert results[2] == {"observation": "1\n", "success": True}
+
+
+def test_timeout_restarts_a_kernel_that_ignores_interrupts(tool, monkeypatch):
+    monkeypatch.setattr(python_execute._PythonKernel, "_interrupt_grace", 0.5)
+    code = "import signal, time\nsignal.signal(signal.SIGINT, signal.SIG_IGN)\ntime.sleep(60)"
+
+    results = run_calls(tool, ("x = 1", {}), (code, {"timeout": 1}), ("print(2)", {}))
+
+    assert "kernel state was lost" in results[1]["observation"]
+    assert results[2] == {"observation": "2\n", "success": True}
+
+
+def test_large_output_is_truncated(tool):
+    results = run_calls(tool, ('print("a" * 100000)', {}), ("print(1)", {}))
+
+    assert results[0]["success"]
+    assert results[0]["observation"] == "a" * 1000 + "\n<output truncated>"
+    assert results[1]["observation"] == "1\n"
+
+
+def test_response_over_the_line_limit_restarts_the_kernel(tool, monkeypatch):
+    monkeypatch.setattr(python_execute, "_KERNEL_LINE_LIMIT", 1024)
+    tool.max_output_chars = 100000
+
+    results = run_calls(tool, ('print("a" * 100000)', {}), ("print(1)", {}))
+
+    assert not results[0]["success"]
+    assert "too large" in results[0]["observation"]
+    assert results[1] == {"observation": "1\n", "success": True}
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import stat
+
+import pytest
+
+from app.exceptions import ToolError
+from app.tool.str_replace_editor import StrReplaceEditor, _EditHistory
+
+
+def run(editor: StrReplaceEditor, **kwargs) -> str:
+    return asyncio.run(editor.execute(**kwargs))
+
+
+def test_multi_edit_applies_all_edits_or_none(tmp_path):
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("x = 1\ny = 2\n")
+    b.write_text("z = 3\n")
+    editor = StrReplaceEditor()
+
+    run(
+        editor,
+        command="multi_edit",
+        path=str(tmp_path),
+        edits=[
+            {"path": "a.py", "old_str": "x = 1", "new_str": "x = 10"},
+            {"path": "a.py", "old_str": "y = 2", "new_str": "y = 20"},
+            {"path": "b.py", "old_str": "z = 3", "new_str": "z = 30"},
+        ],
+    )
+    assert a.read_text() == "x = 10\ny = 20\n"
+    assert b.read_text() == "z = 30\n"
+
+    with pytest.raises(ToolError, match="Edit 2"):
+        run(
+            editor,
+            command="multi_edit",
+            path=str(tmp_path),
+            edits=[
+                {"path": "a.py", "old_str": "x = 10", "new_str": "x = 100"},
+                {"path": "b.py", "old_str": "missing", "new_str": ""},
+            ],
+        )
+    assert a.read_text() == "x = 10\ny = 20\n"
+
+
+PATCH = """\
+--- a/mod.py
++++ b/mod.py
+@@ -1,3 +1,3 @@
+ def f():
+-    return 1
++    return 2
+ \x0c
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1 @@
++created = True
+"""
+
+
+def test_apply_patch_matches_lines_with_form_feeds(tmp_path):
+    target = tmp_path / "mod.py"
+    target.write_text("def f():\n    return 1\n\x0c\n")
+
+    run(StrReplaceEditor(), command="apply_patch", path=str(tmp_path), patch=PATCH)
+
+    assert target.read_text() == "def f():\n    return 2\n\x0c\n"
+    assert (tmp_path / "new.py").read_text() == "created = True\n"
+
+
+def test_apply_patch_rejects_mismatch_without_writing(tmp_path):
+    target = tmp_path / "mod.py"
+    target.write_text("def f():\n    return 3\n\x0c\n")
+
+    with pytest.raises(ToolError, match="Hunk 1"):
+        run(StrReplaceEditor(), command="apply_patch", path=str(tmp_path), patch=PATCH)
+    assert target.read_text() == "def f():\n    return 3\n\x0c\n"
+    assert not (tmp_path / "new.py").exists()
+
+
+def test_files_created_by_a_batch_get_the_default_mode(tmp_path):
+    target = tmp_path / "mod.py"
+    target.write_text("def f():\n    return 1\n\x0c\n")
+    umask = os.umask(0o022)
+    try:
+        run(StrReplaceEditor(), command="apply_patch", path=str(tmp_path), patch=PATCH)
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE((tmp_path / "new.py").stat().st_mode) == 0o644
+
+
+def test_undo_edit_restores_previous_versions(tmp_path):
+    target = tmp_path / "f.txt"
+    editor = StrReplaceEditor()
+    run(editor, command="create", path=str(target), file_text="one\ntwo\n")
+    run(editor, command="str_replace", path=str(target), old_str="two", new_str="2")
+    run(editor, command="insert", path=str(target), insert_line=0, new_str="zero")
+
+    run(editor, command="undo_edit", path=str(target))
+    assert target.read_text() == "one\n2\n"
+    run(editor, command="undo_edit", path=str(target))
+    assert target.read_text() == "one\ntwo\n"
+
+
+def test_edit_history_refuses_undo_after_outside_change():
+    history = _EditHistory()
+    history.record("f", "abc", "abXc")
+    with pytest.raises(ToolError, match="changed outside"):
+        history.undo("f", "abYc")
+    assert history.undo("f", "abXc") == "abc"
+    assert "f" not in history
+
+
+def test_edit_history_drops_oldest_edits_beyond_the_limit():
+    history = _EditHistory(max_edits_per_file=2)
+    for old, new in (("a", "b"), ("b", "c"), ("c", "d")):
+        history.record("f", old, new)
+    assert history.undo("f", "d") == "c"
+    assert history.undo("f", "c") == "b"
+    with pytest.raises(ToolError, match="No edit history"):
+        history.undo("f", "b")
@@ -0,0 +1,81 @@
+import pytest
+
+from app.tool.terminal import split_background
+
+
+def bg(command):
+    return (command, True)
+
+
+def fg(command):
+    return (command, False)
+
+
+@pytest.mark.parametrize(
+    "command, expected",
+    [
+        ("ls", [fg("ls")]),
+        ("sleep 5 &", [bg("sleep 5")]),
+        ("server & client", [bg("server"), fg("client")]),
+        ("a & b & c", [bg("a"), bg("b"), fg("c")]),
+        ("make && make install", [fg("make && make install")]),
+        ("cmd 2>&1 | tee log", [fg("cmd 2>&1 | tee log")]),
+        ("cmd &> log", [fg("cmd &> log")]),
+        ("cmd |& grep x", [fg("cmd |& grep x")]),
+        ("cmd >&2", [fg("cmd >&2")]),
+        ("echo 'a & b'", [fg("echo 'a & b'")]),
+        ('echo "a \\" & b"', [fg('echo "a \\" & b"')]),
+        ("echo a \\& b", [fg("echo a \\& b")]),
+        ("serve & ", [bg("serve")]),
+        (" & ls", [fg("ls")]),
+    ],
+)
+def test_split_background(command, expected):
+    assert split_background(command) == expected
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "for i in 1 2; do sleep 1 & done; wait",
+        "while true; do sleep 1 & wait; done",
+        "if true; then sleep 1 & fi; wait",
+        "(sleep 1 &); echo hi",
+        "echo $(sleep 1 & echo x)",
+        "echo ${x:-a & b}",
+        "{ a & }",
+        "{ a & }; b",
+        "echo `sleep 1 & echo x`",
+        "case $x in a) sleep 1 & ;; esac",
+        "echo $(case $x in a) b & ;; esac)",
+        "cat <<EOF\na & b\nEOF",
+        "cat <<-'EOF'\n\ta & b\n\tEOF",
+        "echo hi # a & b",
+    ],
+)
+def test_background_operators_inside_groups_are_left_to_bash(command):
+    assert split_background(command) == [fg(command)]
+
+
+def test_only_the_last_command_of_a_list_goes_to_the_background():
+    assert split_background("a; b &") == [fg("a"), bg("b")]
+    assert split_background("cd dir\nserve & curl x") == [
+        fg("cd dir"),
+        bg("serve"),
+        fg("curl x"),
+    ]
+    assert split_background("a && b &") == [bg("a && b")]
+
+
+def test_commands_after_a_heredoc_are_split():
+    command = "cat <<EOF > f\na & b\nEOF\nserve &"
+
+    assert split_background(command) == [fg("cat <<EOF > f\na & b\nEOF"), bg("serve")]
+
+
+def test_reserved_words_only_count_as_commands():
+    assert split_background("echo do & b") == [bg("echo do"), fg("b")]
+    assert split_background("for i in 1; do echo done; done & b") == [
+        bg("for i in 1; do echo done; done"),
+        fg("b"),
+    ]
@@ -0,0 +1,57 @@
+import json
+
+from app.tool.base import BaseTool, ToolResult
+from app.tool.tool_collection import ToolCollection
+
+
+class _Tool(BaseTool):
+    async def execute(self, **kwargs) -> ToolResult:
+        return ToolResult(output=self.name)
+
+
+def make_tool(name, properties):
+    return _Tool(
+        name=name,
+        description=f"The {name} tool",
+        parameters={"type": "object", "properties": properties},
+    )
+
+
+def serialized(collection):
+    return json.dumps(collection.to_params())
+
+
+def test_params_do_not_depend_on_tool_or_key_order():
+    alpha = {"b": {"type": "string"}, "a": {"type": "integer"}}
+    beta = {"x": {"type": "string"}}
+    reordered = dict(reversed(list(alpha.items())))
+
+    first = ToolCollection(make_tool("beta", beta), make_tool("alpha", alpha))
+    second = ToolCollection(make_tool("alpha", reordered)).add_tool(
+        make_tool("beta", beta)
+    )
+
+    assert serialized(first) == serialized(second)
+    assert [p["function"]["name"] for p in first.to_params()] == ["alpha", "beta"]
+
+
+def test_params_are_cached_until_a_tool_is_added():
+    collection = ToolCollection(make_tool("beta", {}))
+    params = collection.to_params()
+    assert collection.to_params() is params
+
+    collection.add_tool(make_tool("alpha", {}))
+
+    assert [p["function"]["name"] for p in collection.to_params()] == [
+        "alpha",
+        "beta",
+    ]
+
+
+def test_schema_tokens_cover_every_tool():
+    collection = ToolCollection(make_tool("alpha", {}), make_tool("beta", {}))
+
+    tokens = collection.schema_tokens()
+
+    assert set(tokens) == {"alpha", "beta"}
+    assert all(count > 0 for count in tokens.values())
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.tool import web_fetch
+from app.tool.web_fetch import FetchedPage, WebFetch, check_public_url
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1/",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.1.2.3/",
+        "http://[::1]/",
+        "http://[::ffff:192.168.0.1]/",
+        "ftp://93.184.216.34/",
+    ],
+)
+def test_non_public_urls_are_rejected(url):
+    with pytest.raises(ValueError):
+        asyncio.run(check_public_url(url))
+
+
+def test_public_url_is_accepted():
+    asyncio.run(check_public_url("https://93.184.216.34/page"))
+
+
+def test_redirect_to_private_address_is_not_followed(monkeypatch):
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(
+            302, headers={"Location": "http://169.254.169.254/latest/meta-data/"}
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(web_fetch, "get_http_client", lambda: client)
+
+    result = asyncio.run(WebFetch().execute(url="http://93.184.216.34/"))
+
+    assert "non-public address 169.254.169.254" in result.error
+    assert requested == ["http://93.184.216.34/"]
+
+
+def test_fetch_cache_is_bounded_by_total_size():
+    cache = web_fetch._FetchCache(max_entries=10, max_chars=100)
+    for name in "abc":
+        cache.put(FetchedPage(url=name, status=200, html="x" * 30, content="y" * 10))
+
+    cache.put(FetchedPage(url="d", status=200, content="z" * 40))
+
+    assert [url for url in "abcd" if cache.get(url)] == ["c", "d"]
+    cache.put(FetchedPage(url="huge", status=200, content="z" * 101))
+    assert cache.get("huge") is None and cache.get("c") is not None
+
+
+def test_response_body_is_read_only_up_to_max_html_bytes(monkeypatch):
+    chunks_sent = []
+
+    async def endless_body():
+        while True:
+            chunks_sent.append(1)
+            yield b"<p>" + b"x" * 1000 + b"</p>"
+
+    def handler(request):
+        return httpx.Response(
+            200, headers={"Content-Type": "text/html"}, content=endless_body()
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(web_fetch, "get_http_client", lambda: client)
+
+    tool = WebFetch(max_html_bytes=10_000, browser_fallback=False)
+    page = asyncio.run(tool.fetch("http://93.184.216.34/endless"))
+
+    assert len(page.html) == 10_000
+    assert len(chunks_sent) < 20
+
+
+def test_fresh_cache_hit_skips_the_address_check(monkeypatch):
+    async def resolving_check(url):
+        raise AssertionError("resolved a cached URL")
+
+    url = "http://93.184.216.34/cached"
+    web_fetch._cache.put(
+        FetchedPage(url=url, status=200, content="hi", fresh_until=time.time() + 60)
+    )
+    monkeypatch.setattr(web_fetch, "check_public_url", resolving_check)
+
+    assert asyncio.run(WebFetch().fetch(url)).content == "hi"
+
+
+class _FakeRequest:
+    def __init__(self, url):
+        self.url = url
+        self.frame = SimpleNamespace(parent_frame=None)
+
+    def is_navigation_request(self):
+        return True
+
+
+class _FakeBrowserContext:
+    """Navigates through `hops`, notifying the request listeners of each."""
+
+    def __init__(self, hops):
+        self.hops = hops
+        self.listeners = []
+        self.context = self
+
+    def on(self, event, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, event, listener):
+        self.listeners.remove(listener)
+
+    async def get_session(self):
+        return self
+
+    async def navigate_to(self, url):
+        for hop in self.hops:
+            for listener in self.listeners:
+                listener(_FakeRequest(hop))
+
+    async def get_page_html(self):
+        return "<p>" + "rendered " * 50 + "</p>"
+
+    async def get_current_page(self):
+        return SimpleNamespace(url=self.hops[-1])
+
+
+def fetch_with_fake_browser(monkeypatch, hops):
+    lease = SimpleNamespace(context=_FakeBrowserContext(hops))
+
+    async def release():
+        lease.released = True
+
+    lease.release = release
+
+    async def lease_context():
+        return lease
+
+    pool = SimpleNamespace(lease=lease_context)
+    monkeypatch.setattr(web_fetch, "get_browser_pool", lambda: pool)
+    page = FetchedPage(url=hops[0], status=200, html="<div id='root'></div>")
+    return asyncio.run(WebFetch()._fetch_with_browser(page)), lease
+
+
+def test_browser_fallback_returns_public_pages(monkeypatch):
+    page, lease = fetch_with_fake_browser(
+        monkeypatch, ["http://93.184.216.34/", "http://93.184.216.35/app"]
+    )
+
+    assert page.via_browser and "rendered" in page.content
+    assert lease.released
+
+
+def test_browser_fallback_refuses_redirects_to_private_addresses(monkeypatch):
+    with pytest.raises(ValueError, match="non-public address 169.254.169.254"):
+        fetch_with_fake_browser(
+            monkeypatch,
+            ["http://93.184.216.34/", "http://169.254.169.254/latest/meta-data/"],
+        )
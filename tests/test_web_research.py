@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.config import LLMSettings
+from app.llm import LLM
+from app.tool.google_search import GoogleSearch
+from app.tool.web_fetch import FetchedPage, WebFetch
+from app.tool.web_research import WebResearch
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """The reduce prompts sent to the LLM."""
+    sent = []
+
+    async def ask(self, messages, system_msgs=None, stream=True, **kwargs):
+        if "digests" not in system_msgs[0].content:
+            return "x" * 50
+        sent.append(messages[0].content)
+        return "digest"
+
+    async def search(self, query, num_results=10):
+        return [f"https://example.com/{i}" for i in range(num_results)]
+
+    async def fetch(self, url):
+        return FetchedPage(url=url, status=200, content="page text")
+
+    monkeypatch.setattr(LLM, "ask", ask)
+    monkeypatch.setattr(GoogleSearch, "execute", search)
+    monkeypatch.setattr(WebFetch, "fetch", fetch)
+    return sent
+
+
+@pytest.fixture
+def tool(monkeypatch):
+    monkeypatch.setattr(LLM, "_instances", {})
+    settings = LLMSettings(
+        model="summary-model",
+        base_url="http://localhost",
+        api_key="key",
+        api_type="openai",
+        api_version="",
+    )
+    llm = LLM("summarizer", llm_config={"summarizer": settings})
+    return WebResearch(llm=llm, min_call_interval=0)
+
+
+def test_max_pages_is_clamped(tool, prompts):
+    result = asyncio.run(tool.execute(question="q", max_pages=1000))
+
+    assert result.output.count("\n[") == tool.max_pages_limit
+    assert tool.parameters["properties"]["max_pages"]["maximum"] == 10
+
+
+def test_notes_that_do_not_fit_one_prompt_are_reduced_in_batches(tool, prompts):
+    tool.max_reduce_chars = 200
+
+    result = asyncio.run(tool.execute(question="q", max_pages=10))
+
+    assert result.output.startswith("digest")
+    assert len(prompts) > 1
+    assert all(len(prompt) <= tool.max_reduce_chars + 20 for prompt in prompts)
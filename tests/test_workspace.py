@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+import pytest
+
+from app.tool import workspace
+from app.tool.workspace import (
+    WorkspaceIndex,
+    get_workspace_index,
+    notify_file_changed,
+)
+
+
+class _FileIndex(WorkspaceIndex):
+    def __init__(self, root):
+        super().__init__(root)
+        self.files = set()
+
+    def update_file(self, path, stat):
+        self.files.add(path)
+
+    def remove_file(self, path):
+        self.files.discard(path)
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes(monkeypatch):
+    monkeypatch.setattr(workspace, "_indexes", OrderedDict())
+
+
+def test_subdirectory_reuses_enclosing_index(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / ".hidden").mkdir()
+
+    index = get_workspace_index(_FileIndex, tmp_path)
+
+    assert get_workspace_index(_FileIndex, tmp_path / "sub") is index
+    # The enclosing index does not walk hidden directories
+    assert get_workspace_index(_FileIndex, tmp_path / ".hidden") is not index
+
+
+def test_parent_index_supersedes_subdirectory_indexes(tmp_path):
+    (tmp_path / "sub").mkdir()
+    get_workspace_index(_FileIndex, tmp_path / "sub")
+
+    get_workspace_index(_FileIndex, tmp_path)
+
+    assert list(workspace._indexes) == [(_FileIndex, tmp_path.resolve())]
+
+
+def test_least_recently_used_indexes_are_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace, "MAX_INDEXES", 2)
+    roots = [tmp_path / name for name in "abc"]
+    for root in roots:
+        root.mkdir()
+    first = get_workspace_index(_FileIndex, roots[0])
+    get_workspace_index(_FileIndex, roots[1])
+    get_workspace_index(_FileIndex, roots[0])  # now most recently used
+
+    get_workspace_index(_FileIndex, roots[2])
+
+    assert [root for _, root in workspace._indexes] == [
+        roots[0].resolve(),
+        roots[2].resolve(),
+    ]
+    assert get_workspace_index(_FileIndex, roots[0]) is first
+
+
+def test_refresh_between_rescans_only_reads_notified_files(tmp_path):
+    index = get_workspace_index(_FileIndex, tmp_path)
+    index.refresh()
+    notified, unnoticed = tmp_path / "notified.txt", tmp_path / "unnoticed.txt"
+    notified.write_text("a")
+    unnoticed.write_text("b")
+
+    notify_file_changed(notified)
+    index.refresh()
+    assert index.files == {str(notified)}
+
+    notified.unlink()
+    notify_file_changed(notified)
+    index.refresh()
+    assert index.files == set()
+
+    index._last_scan -= workspace.RESCAN_INTERVAL
+    index.refresh()
+    assert index.files == {str(unnoticed)}
@@ -35,20 +35,27 @@ class ToolManager:
         """
         from app.tool import (
             PlanningTool, CreateChatCompletion, Terminate,
-            StrReplaceEditor, GoogleSearch
+            StrReplaceEditor, CodeSearch, PythonSymbols
         )
+        from app.tool.google_search import GoogleSearch
+        from app.tool.web_fetch import WebFetch
+        from app.tool.web_research import WebResearch
         
         # Safe tools for any environment 
         safe_tools = [
             PlanningTool(),
             CreateChatCompletion(),
             GoogleSearch(),
+            WebFetch(),
+            WebResearch(),
             Terminate()
         ]
         
         # Add file editor with restricted paths
         editor = StrReplaceEditor()
         safe_tools.append(editor)
+        safe_tools.append(CodeSearch())
+        safe_tools.append(PythonSymbols())
         
         # Development environments can have more powerful tools
         if self.environment == "development":